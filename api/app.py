@@ -1,51 +1,713 @@
+import csv
+import datetime
 import flask
+import io
+import itertools
 import json
-import numpy as np
+import math
+import os
 import pandas as pd
+import shutil
+import tempfile
 
+import plan_output
+from ingestion import MAX_REPORTED_ERRORS, UPLOAD_COLUMNS, UploadError, iter_upload_chunks, normalize_upload, read_upload
+from job_manager import JobManager
+from plan_output import FULFILLMENT_PLAN_COLUMNS
+from result_cache import ResultCache, cache_key
+from scenario_registry import ScenarioRegistry
+from scheduler import config
+from scheduler.model.what_if_scenario import WhatIfScenario
 from scheduler.order_scheduler import OrderScheduler
+from scheduler.partitioned_scheduler import plan_partitioned_fulfillment
+from scheduler.what_if_planner import plan_what_if_scenarios
 
 app = flask.Flask(__name__)
 
+# The number of rows read from an upload at a time by the streaming endpoint.
+STREAM_CHUNK_SIZE = 100000
+# The planning scenarios that are kept in memory between the requests.
+scenario_registry = ScenarioRegistry()
+# The number of processes that run planning jobs, `None` for the number of CPUs.
+JOB_MAX_WORKERS = None
+# The number of planning jobs that could wait for a process.
+JOB_MAX_QUEUED_JOBS = 16
+# The largest total size of the results that the finished jobs keep in memory.
+JOB_MAX_FINISHED_BYTES = 256 * 2 ** 20
+# The planning jobs, which run in a local process pool.
+job_manager = JobManager(JOB_MAX_WORKERS, JOB_MAX_QUEUED_JOBS, max_finished_bytes=JOB_MAX_FINISHED_BYTES)
+# The largest total size of the batch responses that are cached in memory.
+RESULT_CACHE_MAX_MEMORY_BYTES = 256 * 2 ** 20
+# The directory where the batch responses are cached on disk, `None` to only
+# cache them in memory.
+RESULT_CACHE_DIRECTORY = None
+# The largest total size of the batch responses that are cached on disk.
+RESULT_CACHE_MAX_DISK_BYTES = 2 ** 30
+# The version of the cached batch responses, which is part of their keys and
+# is bumped whenever a change of the planning or the output formats changes
+# the responses, so that the responses cached on disk by a previous release are
+# not served.
+RESULT_CACHE_VERSION = 1
+# The batch responses by the content of their uploads and options.
+result_cache = ResultCache(RESULT_CACHE_MAX_MEMORY_BYTES, RESULT_CACHE_DIRECTORY, RESULT_CACHE_MAX_DISK_BYTES)
+
+@app.errorhandler(UploadError)
+def handle_upload_error(error):
+    """ Report the invalid values of an upload by row.
+    """
+    return flask.jsonify({'message': 'Unexpected file format', **error.to_dict()}), 400
+
 @app.route('/batchfulfillmentplan', methods=['GET', 'POST'])
 def get_batch_fulfillment_plan():
+    """ Get the fulfillment plans of the uploads as a JSON document.
+
+    If the `workers` query argument is given, the independent components of
+    the sourcing rules are planned in that many processes. If the `stats`
+    query argument is `true`, the statistics of the planning are returned
+    alongside the plans, which is not available with `workers`. If the
+    `lookahead` query argument is given, the orders are planned in lookahead
+    mode with a horizon of that many days, see also `OrderScheduler`. The
+    output format is chosen by the `format` query argument or the `Accept`
+    header, see also `plan_output`. The responses without statistics are
+    cached by the content of the uploads and the options, see `result_cache`.
+    """
     files = flask.request.files
     if 'orders' not in files or 'sourcing_rules' not in files or 'supply_plans' not in files:
         flask.abort(400, 'Unexpected file attachments.')
+    max_workers = flask.request.args.get('workers', type=int)
+    if max_workers is not None and max_workers < 1:
+        flask.abort(400, 'Unexpected worker count')
+    lookahead_days, with_stats, output_format = _read_batch_plan_options(flask.request)
+    if with_stats and max_workers is not None:
+        flask.abort(400, 'Statistics are not available with workers')
+    compress = flask.request.accept_encodings['gzip'] > 0
+    order_df, sourcing_rule_df, supply_plan_df = _read_batch_uploads(files)
     try:
-        response = _prepare_batch_fulfillment_plan_response(
-            order_df=pd.read_csv(files['orders']),
-            sourcing_rule_df=pd.read_csv(files['sourcing_rules']),
-            supply_plan_df=pd.read_csv(files['supply_plans'])
-        )
+        # the statistics are measured on each run, and the workers serialize the same bytes as the serial run
+        response_key = None if with_stats else cache_key([order_df, sourcing_rule_df, supply_plan_df], {
+            'version': RESULT_CACHE_VERSION,
+            'lookahead_days': lookahead_days if lookahead_days is not None else config.LOOKAHEAD_HORIZON_DAYS,
+            'output_format': output_format,
+            'compress': compress and output_format == 'csv',
+            'supply_distribution_rates': config.SUPPLY_DISTRIBUTION_RATES,
+            'supply_history_window_days': config.SUPPLY_HISTORY_WINDOW_DAYS
+        })
+        response = result_cache.get(response_key) if response_key is not None else None
+        if response is None:
+            response = _prepare_batch_fulfillment_plan_response(
+                order_df=order_df,
+                sourcing_rule_df=sourcing_rule_df,
+                supply_plan_df=supply_plan_df,
+                max_workers=max_workers,
+                with_stats=with_stats,
+                lookahead_days=lookahead_days,
+                output_format=output_format,
+                compress=compress
+            )
+            if response_key is not None:
+                result_cache.put(response_key, response.encode() if isinstance(response, str) else response)
+    except AssertionError:
+        flask.abort(400, 'Unexpected file format')
+    if output_format == 'json':
         return response
+    headers = {'Content-Encoding': 'gzip'} if output_format == 'csv' and compress else {}
+    return flask.Response(response, mimetype=plan_output.OUTPUT_MIMETYPES[output_format], headers=headers)
+
+@app.route('/streamfulfillmentplan', methods=['POST'])
+def get_streamed_fulfillment_plan():
+    """ Stream the fulfillment plans day by day.
+
+    The orders and supply plans must be sorted by date, they are read in chunks
+    of `STREAM_CHUNK_SIZE` rows, so that the memory is bounded by the data of a
+    single day. The plans are streamed as NDJSON, or as CSV if the `format`
+    query argument is `csv`. The errors in the first chunks are reported with
+    status 400, later ones end the stream with an error record, see
+    `_iter_ndjson_lines` and `_iter_csv_lines`.
+    """
+    files = flask.request.files
+    if 'orders' not in files or 'sourcing_rules' not in files or 'supply_plans' not in files:
+        flask.abort(400, 'Unexpected file attachments.')
+    output_format = flask.request.args.get('format', 'ndjson')
+    if output_format not in ['ndjson', 'csv']:
+        flask.abort(400, 'Unexpected output format')
+    try:
+        daily_plans = _iter_daily_fulfillment_plans(
+            _build_order_scheduler(read_upload(files['sourcing_rules'], 'sourcing_rules')),
+            _iter_daily_quantities(_detach_upload(files['orders']), 'orders'),
+            _iter_daily_quantities(_detach_upload(files['supply_plans']), 'supply_plans')
+        )
+        # plan the first day before responding, so that malformed uploads are
+        # still reported with a status code
+        daily_plans = itertools.chain([next(daily_plans, [])], daily_plans)
     except AssertionError:
         flask.abort(400, 'Unexpected file format')
+    if output_format == 'csv':
+        return flask.Response(flask.stream_with_context(_iter_csv_lines(daily_plans)), mimetype='text/csv')
+    return flask.Response(flask.stream_with_context(_iter_ndjson_lines(daily_plans)), mimetype='application/x-ndjson')
+
+@app.route('/scenarios', methods=['POST'])
+def create_scenario():
+    """ Create a planning scenario from the uploaded sourcing rules.
+
+    The scenario keeps an `OrderScheduler` in memory, orders and supply plans
+    are claimed to it incrementally with `/scenarios/<scenario_id>/claims`.
+    """
+    files = flask.request.files
+    if 'sourcing_rules' not in files:
+        flask.abort(400, 'Unexpected file attachments.')
+    sourcing_rule_df = read_upload(files['sourcing_rules'], 'sourcing_rules')
+    scenario = scenario_registry.create_scenario(_sourcing_rule_tuples(sourcing_rule_df))
+    return flask.jsonify(_scenario_to_dict(scenario)), 201
+
+@app.route('/scenarios/<scenario_id>', methods=['GET', 'DELETE'])
+def manage_scenario(scenario_id):
+    """ Get the state of a planning scenario, or remove it.
+    """
+    if flask.request.method == 'DELETE':
+        if not scenario_registry.remove_scenario(scenario_id):
+            flask.abort(404, 'Unknown scenario')
+        return '', 204
+    scenario = scenario_registry.get_scenario(scenario_id)
+    if scenario is None:
+        flask.abort(404, 'Unknown scenario')
+    return flask.jsonify(_scenario_to_dict(scenario))
+
+@app.route('/scenarios/<scenario_id>/claims', methods=['POST'])
+def claim_scenario_updates(scenario_id):
+    """ Claim a batch of orders and supply plans to a planning scenario, and
+        get the fulfillment plans of the newly planned dates.
+
+    The batch is either uploaded as `orders`, `supply_plans` and optionally
+    `sourcing_rules` CSV files, or posted as a JSON object with lists of rows
+    under the same keys. The dates are planned until the `until` query argument,
+    or the last date of the batch by default. Claims must be later than the
+    last planned date of the scenario.
+    """
+    scenario = scenario_registry.get_scenario(scenario_id)
+    if scenario is None:
+        flask.abort(404, 'Unknown scenario')
+    until_date = flask.request.args.get('until')
+    try:
+        sourcing_rule_df = _read_scenario_update(flask.request, 'sourcing_rules')
+        order_df = _read_scenario_update(flask.request, 'orders')
+        supply_plan_df = _read_scenario_update(flask.request, 'supply_plans')
+        daily_plans = scenario.claim_and_plan(
+            sourcing_rules=_sourcing_rule_tuples(sourcing_rule_df),
+            daily_orders=_aggregate_daily_quantities(order_df, ['customer', 'product']),
+            daily_supply_plans=_aggregate_daily_quantities(supply_plan_df, ['site', 'product']),
+            until_date=pd.to_datetime(until_date) if until_date is not None else None
+        )
+    except (AssertionError, ValueError):
+        flask.abort(400, 'Unexpected claims')
+    response = {
+        **_scenario_to_dict(scenario),
+        'planned_dates': [date for date, _ in daily_plans],
+        'fulfillment_plans': [_fulfillment_plan_to_dict(plan) for _, plans in daily_plans for plan in plans]
+    }
+    return flask.Response(json.dumps(response, indent=4, sort_keys=True, default=str), mimetype='application/json')
+
+@app.route('/scenarios/<scenario_id>/whatif', methods=['POST'])
+def plan_what_if_scenarios_of_scenario(scenario_id):
+    """ Compare what-if scenarios that branch off a planning scenario.
+
+    The JSON body has a list of `scenarios`, each with a `name`, and optionally
+    `supply_factors` rows of `site`, `product`, `start_date`, `end_date` and
+    `factor`, and extra `orders` and `supply_plans` rows. Each of them and a
+    baseline is planned on a fork of the planning scenario until the `until`
+    query argument, in up to `workers` processes, and the planning scenario
+    itself is left unchanged. The KPIs of the scenarios and their deltas
+    against the baseline are returned.
+    """
+    scenario = scenario_registry.get_scenario(scenario_id)
+    if scenario is None:
+        flask.abort(404, 'Unknown scenario')
+    max_workers = flask.request.args.get('workers', type=int)
+    if max_workers is not None and max_workers < 1:
+        flask.abort(400, 'Unexpected worker count')
+    try:
+        end_date = pd.to_datetime(flask.request.args['until'])
+        body = flask.request.get_json(silent=True) or {}
+        scenario_dicts = body.get('scenarios', []) if isinstance(body, dict) else None
+        if not isinstance(scenario_dicts, list):
+            flask.abort(400, 'Unexpected scenarios')
+        what_if_scenarios = [_what_if_scenario_from_dict(scenario_dict, index) for index, scenario_dict in enumerate(scenario_dicts)]
+        with scenario.lock:
+            results = plan_what_if_scenarios(scenario.order_scheduler, what_if_scenarios, end_date, max_workers)
+    except (AssertionError, KeyError, TypeError, ValueError):
+        flask.abort(400, 'Unexpected scenarios')
+    return flask.Response(json.dumps({'scenarios': results}, indent=4, sort_keys=True, default=str), mimetype='application/json')
+
+@app.route('/jobs', methods=['POST'])
+def submit_fulfillment_plan_job():
+    """ Queue the planning of the uploads as a job, and get its `job_id`.
+
+    The uploads and the `lookahead`, `stats` and `format` query arguments are
+    the same as `/batchfulfillmentplan`, the uploads are validated before the
+    job is queued. The job runs in a local process pool, its progress is
+    polled with `/jobs/<job_id>` and its result is fetched with
+    `/jobs/<job_id>/result`. If too many jobs are queued or running, the job
+    is rejected with status 429.
+    """
+    files = flask.request.files
+    if 'orders' not in files or 'sourcing_rules' not in files or 'supply_plans' not in files:
+        flask.abort(400, 'Unexpected file attachments.')
+    lookahead_days, with_stats, output_format = _read_batch_plan_options(flask.request)
+    order_df, sourcing_rule_df, supply_plan_df = _read_batch_uploads(files)
+    job = job_manager.submit_job(_plan_fulfillment_job, order_df, sourcing_rule_df, supply_plan_df, with_stats, lookahead_days, output_format)
+    if job is None:
+        flask.abort(429, 'Too many jobs')
+    return flask.jsonify(_job_to_dict(job)), 202, {'Location': flask.url_for('manage_job', job_id=job.job_id)}
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def manage_job(job_id):
+    """ Get the status and the progress of a planning job, or cancel and
+        remove it.
+    """
+    if flask.request.method == 'DELETE':
+        if not job_manager.remove_job(job_id):
+            flask.abort(404, 'Unknown job')
+        return '', 204
+    job = job_manager.get_job(job_id)
+    if job is None:
+        flask.abort(404, 'Unknown job')
+    return flask.jsonify(_job_to_dict(job))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """ Get the fulfillment plans of a succeeded planning job, in the output
+        format that it was submitted with.
+    """
+    job = job_manager.get_job(job_id)
+    if job is None:
+        flask.abort(404, 'Unknown job')
+    if job.status != 'succeeded':
+        flask.abort(409, 'Job has not succeeded')
+    mimetype, response = job.future.result()
+    return flask.Response(response, mimetype=mimetype)
+
+@app.route('/resultcache', methods=['GET'])
+def get_result_cache_stats():
+    """ Get the hit and miss counters and the sizes of the result cache of
+        `/batchfulfillmentplan`.
+    """
+    return flask.jsonify(result_cache.stats())
+
+def _read_batch_uploads(files):
+    """ Read the uploads of a batch planning into normalized `DataFrame`
+        objects, see also `ingestion.read_upload`.
+
+    Args:
+        files: The uploaded files of the request.
+
+    Returns:
+        A tuple of the orders, the sourcing rules and the supply plans.
+    """
+    return tuple(read_upload(files[key], key) for key in ['orders', 'sourcing_rules', 'supply_plans'])
+
+def _read_batch_plan_options(request):
+    """ Read the `lookahead`, `stats` and `format` query arguments of a batch
+        planning, abort the request if they are unexpected.
+
+    Args:
+        request: The Flask request.
+
+    Returns:
+        A tuple of the lookahead horizon, whether to return the statistics and
+        the output format.
+    """
+    lookahead_days = request.args.get('lookahead', type=int)
+    if lookahead_days is not None and lookahead_days < 1:
+        flask.abort(400, 'Unexpected lookahead horizon')
+    with_stats = request.args.get('stats', 'false') == 'true'
+    format_name = request.args.get('format')
+    output_format = plan_output.negotiate_output_format(format_name, request.accept_mimetypes)
+    if output_format is None and format_name is None:
+        flask.abort(406, 'No acceptable output format')
+    if output_format is None:
+        flask.abort(400, 'Unexpected output format')
+    if not plan_output.output_format_available(output_format):
+        flask.abort(406, 'Output format requires pyarrow')
+    if with_stats and output_format == 'csv':
+        flask.abort(400, 'Statistics are not available as CSV')
+    return lookahead_days, with_stats, output_format
+
+def _plan_fulfillment_job(progress, order_df, sourcing_rule_df, supply_plan_df, with_stats, lookahead_days, output_format):
+    """ Plan the uploads of a job in a worker process of `job_manager`.
+
+    Returns:
+        A tuple of the mimetype and the uncompressed response of the output
+        format.
+    """
+    response = _prepare_batch_fulfillment_plan_response(
+        order_df, sourcing_rule_df, supply_plan_df, with_stats=with_stats, lookahead_days=lookahead_days,
+        output_format=output_format, compress=False, progress=progress
+    )
+    return plan_output.OUTPUT_MIMETYPES[output_format], response
+
+def _job_to_dict(job):
+    """ Describe the status and the progress of a planning job.
+
+    Args:
+        job: The `PlanningJob` object.
+    """
+    planned_day_count, total_day_count = job_manager.get_progress(job)
+    status = job.status
+    return {
+        'job_id': job.job_id,
+        'status': status,
+        'planned_day_count': planned_day_count,
+        'total_day_count': total_day_count,
+        'error': str(job.future.exception()) if status == 'failed' else None
+    }
+
+def _prepare_batch_fulfillment_plan_response(order_df, sourcing_rule_df, supply_plan_df, max_workers=None, with_stats=False, lookahead_days=None, output_format='json', compress=True, progress=None):
+    order_df = normalize_upload(order_df, 'orders')
+    sourcing_rule_df = normalize_upload(sourcing_rule_df, 'sourcing_rules')
+    supply_plan_df = normalize_upload(supply_plan_df, 'supply_plans')
+    daily_orders = _aggregate_daily_quantities(order_df, ['customer', 'product'])
+    daily_supply_plans = _aggregate_daily_quantities(supply_plan_df, ['site', 'product'])
+    metadata = {}
+    if max_workers is None:
+        order_scheduler = _build_order_scheduler(sourcing_rule_df, lookahead_days)
+        stats = order_scheduler.enable_stats() if with_stats else None
+        for date, columns in daily_orders.items():
+            order_scheduler.claim_daily_orders(date, *columns)
+        for date, columns in daily_supply_plans.items():
+            order_scheduler.claim_daily_supply_plans(date, *columns)
+        dates = [*daily_orders.keys(), *daily_supply_plans.keys()]
+        plan_buffer = order_scheduler.create_plan_buffer()
+        if progress is not None:
+            # plan day by day to report the progress of a job
+            dates = sorted(set(dates))
+            progress.start(len(dates))
+            for date in dates:
+                order_scheduler.run_until(date, plan_buffer)
+                progress.advance()
+        elif len(dates) != 0:
+            order_scheduler.run_until(max(dates), plan_buffer)
+        metadata['backlog'] = order_scheduler.backlog_summary()
+        if stats is not None:
+            metadata['stats'] = stats.to_dict()
+    else:
+        # the names are interned in the order of the serial scheduler, so that the dictionary encoded formats are identical
+        plan_buffer = _build_order_scheduler(sourcing_rule_df).create_plan_buffer()
+        partitioned_plans, metadata['backlog'] = plan_partitioned_fulfillment(
+            _sourcing_rule_tuples(sourcing_rule_df), sorted(daily_orders.items()), sorted(daily_supply_plans.items()), max_workers,
+            with_backlog=True, lookahead_days=lookahead_days
+        )
+        for _, daily_plans in partitioned_plans:
+            plan_buffer.extend(daily_plans)
+    return plan_output.serialize_fulfillment_plans(plan_buffer, output_format, metadata, compress)
+
+def _fulfillment_plan_to_dict(plan):
+    """ Convert a fulfillment plan tuple to a dictionary keyed by
+        `FULFILLMENT_PLAN_COLUMNS`.
+
+    Args:
+        plan: A fulfillment plan tuple returned by `OrderScheduler`.
+    """
+    return dict(zip(FULFILLMENT_PLAN_COLUMNS, plan))
+
+def _build_order_scheduler(sourcing_rule_df, lookahead_days=None):
+    """ Create an `OrderScheduler` with the sourcing rules.
+
+    Args:
+        sourcing_rule_df: A `DataFrame` of the sourcing rules.
+        lookahead_days: The lookahead horizon of the scheduler, see also
+            `OrderScheduler`.
+    """
+    order_scheduler = OrderScheduler(lookahead_days)
+    for customer, site, product in _sourcing_rule_tuples(sourcing_rule_df):
+        order_scheduler.add_sourcing_rule(customer, site, product)
+    return order_scheduler
+
+def _sourcing_rule_tuples(sourcing_rule_df):
+    """ Get the `(customer, site, product)` tuples of the sourcing rules.
+
+    Args:
+        sourcing_rule_df: A `DataFrame` of the sourcing rules.
+    """
+    return [*zip(sourcing_rule_df['customer'].tolist(), sourcing_rule_df['site'].tolist(), sourcing_rule_df['product'].tolist())]
+
+def _scenario_to_dict(scenario):
+    """ Describe the state of a planning scenario.
+
+    Args:
+        scenario: The `PlanningScenario` object.
+    """
+    order_scheduler = scenario.order_scheduler
+    current_date = order_scheduler.current_date
+    next_claim_date = order_scheduler.next_claim_date()
+    return {
+        'scenario_id': scenario.scenario_id,
+        'current_date': str(current_date) if current_date != datetime.datetime.min else None,
+        'next_claim_date': str(next_claim_date) if next_claim_date is not None else None
+    }
+
+def _what_if_scenario_from_dict(scenario_dict, index):
+    """ Create a `WhatIfScenario` from its JSON representation.
+
+    Args:
+        scenario_dict: A dictionary with the `name` of the scenario, and lists
+            of `supply_factors`, `orders` and `supply_plans` rows.
+        index: The index of the scenario in the request, which names the rows
+            of the errors, like `scenarios[0].orders`.
+
+    Raises:
+        UploadError: If a row of the scenario is invalid.
+    """
+    if not isinstance(scenario_dict, dict) or not isinstance(scenario_dict.get('name'), str):
+        flask.abort(400, 'Unexpected scenario name')
+    location = 'scenarios[{}].'.format(index)
+    order_df = _read_json_rows(scenario_dict.get('orders', []), 'orders', location + 'orders')
+    supply_plan_df = _read_json_rows(scenario_dict.get('supply_plans', []), 'supply_plans', location + 'supply_plans')
+    return WhatIfScenario(
+        name=scenario_dict['name'],
+        supply_factors=_read_supply_factors(scenario_dict.get('supply_factors', []), location + 'supply_factors'),
+        orders=[*order_df[['customer', 'product', 'quantity', 'date']].itertuples(index=False, name=None)],
+        supply_plans=[*supply_plan_df[['site', 'product', 'quantity', 'date']].itertuples(index=False, name=None)]
+    )
+
+def _read_supply_factors(rows, upload_name):
+    """ Read the `supply_factors` rows of a what-if scenario.
+
+    The `site`, `start_date`, `end_date` and `factor` of a row are required and
+    the `product` is optional. The `factor` is a finite non-negative number.
+
+    Args:
+        rows: The list of the rows.
+        upload_name: The name of the rows in the errors.
+
+    Returns:
+        A list of `(site, product, start_date, end_date, factor)` tuples, see
+        also `WhatIfScenario`.
+
+    Raises:
+        UploadError: If a row is invalid, with the errors by row like the ones
+            of the uploads.
+    """
+    if not isinstance(rows, list):
+        flask.abort(400, 'Unexpected {} rows'.format(upload_name))
+    supply_factors, errors = [], []
+    for row_number, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            errors.append({'row': row_number, 'column': None, 'message': 'is not an object'})
+            continue
+        site, product, start_date, end_date, factor = [row.get(column) for column in ['site', 'product', 'start_date', 'end_date', 'factor']]
+        start_date, end_date = _parse_json_date(start_date), _parse_json_date(end_date)
+        factor = _parse_json_factor(factor)
+        for column, value, message in [
+            ('site', site, 'is missing'),
+            ('start_date', start_date, 'is not a date'),
+            ('end_date', end_date, 'is not a date'),
+            ('factor', factor, 'is not a finite non-negative number')
+        ]:
+            if value is None:
+                errors.append({'row': row_number, 'column': column, 'message': message if row.get(column) is not None else 'is missing'})
+        supply_factors.append((str(site), str(product) if product is not None else None, start_date, end_date, factor))
+    if len(errors) != 0:
+        raise UploadError(upload_name, errors[:MAX_REPORTED_ERRORS], len(errors))
+    return supply_factors
+
+def _parse_json_date(value):
+    """ Parse a date of a JSON row, `None` if it is not a date.
+    """
+    try:
+        date = pd.to_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        return None
+    return date if not pd.isna(date) else None
+
+def _parse_json_factor(value):
+    """ Parse a factor of a JSON row, `None` if it is not a finite
+        non-negative number.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value) if math.isfinite(value) and value >= 0 else None
+
+def _read_json_rows(rows, key, upload_name):
+    """ Read a list of JSON rows as a normalized `DataFrame`, see also
+        `ingestion.normalize_upload`.
+
+    Args:
+        rows: The list of the rows.
+        key: The kind of the rows, a key of `UPLOAD_COLUMNS`.
+        upload_name: The name of the rows in the errors.
+
+    Raises:
+        UploadError: If a row is invalid.
+    """
+    if not isinstance(rows, list):
+        flask.abort(400, 'Unexpected {} rows'.format(upload_name))
+    try:
+        return normalize_upload(pd.DataFrame(rows) if len(rows) != 0 else pd.DataFrame(columns=UPLOAD_COLUMNS[key]), key)
+    except UploadError as error:
+        raise UploadError(upload_name, error.errors, error.error_count)
+
+def _read_scenario_update(request, key):
+    """ Read a part of a scenario update as a normalized `DataFrame`, see
+        also `ingestion.read_upload`.
+
+    Args:
+        request: The Flask request with either CSV files or a JSON body.
+        key: The file name or the JSON key of the part, a key of
+            `UPLOAD_COLUMNS`.
+
+    Returns:
+        A `DataFrame` of the part, which is empty if the part is absent.
+    """
+    if key in request.files:
+        return read_upload(request.files[key], key)
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        flask.abort(400, 'Unexpected claims')
+    return _read_json_rows(body.get(key, []), key, key)
+
+def _iter_daily_fulfillment_plans(order_scheduler, daily_orders, daily_supply_plans):
+    """ Plan the fulfillment day by day.
+
+    Args:
+        order_scheduler: The `OrderScheduler` with the sourcing rules.
+        daily_orders: An iterator of `(date, columns)` tuples in ascending date
+            order, where `columns` are the customer names, product names and
+            quantities of the orders on that date.
+        daily_supply_plans: An iterator of `(date, columns)` tuples in ascending
+            date order, where `columns` are the site names, product names and
+            quantities of the supply plans on that date.
+
+    Yields:
+        The list of fulfillment plan tuples of each date that has orders or
+        supply plans.
+    """
+    order_item, supply_item = next(daily_orders, None), next(daily_supply_plans, None)
+    while order_item is not None or supply_item is not None:
+        date = min(item[0] for item in [order_item, supply_item] if item is not None)
+        if order_item is not None and order_item[0] == date:
+            order_scheduler.claim_daily_orders(date, *order_item[1])
+            order_item = next(daily_orders, None)
+        if supply_item is not None and supply_item[0] == date:
+            order_scheduler.claim_daily_supply_plans(date, *supply_item[1])
+            supply_item = next(daily_supply_plans, None)
+        yield order_scheduler.plan_fulfillment(date)
+
+def _detach_upload(file_storage):
+    """ Copy an uploaded file to a temporary file.
+
+    Flask closes the uploaded files once the view returns, while a streamed
+    response keeps reading them afterwards.
+
+    Args:
+        file_storage: The uploaded `FileStorage` object.
+    """
+    upload = tempfile.TemporaryFile()
+    shutil.copyfileobj(file_storage.stream, upload)
+    upload.seek(0)
+    return upload
+
+def _iter_daily_quantities(upload, upload_name):
+    """ Aggregate the daily quantities of a date-sorted CSV file read in chunks.
+
+    The file is read `STREAM_CHUNK_SIZE` rows at a time and closed when all
+    rows are read. The rows of the last date in a chunk are held back until the
+    next chunk, since that date may continue there.
+
+    Args:
+        upload: A CSV file object of the orders or the supply plans.
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+
+    Yields:
+        `(date, columns)` tuples in ascending date order, see also
+        `_aggregate_daily_quantities`.
+    """
+    key_columns = [column for column in UPLOAD_COLUMNS[upload_name] if column not in ['date', 'quantity']]
+    with upload:
+        pending_df = None
+        for chunk in iter_upload_chunks(upload, upload_name, STREAM_CHUNK_SIZE):
+            if len(chunk) == 0:
+                continue
+            if pending_df is not None:
+                chunk = pd.concat([pending_df, chunk])
+            assert chunk['date'].is_monotonic_increasing, 'please sort the uploads by date'
+            is_last_date = (chunk['date'] == chunk['date'].iloc[-1]).to_numpy()
+            daily_quantities = _aggregate_daily_quantities(chunk[~is_last_date], key_columns)
+            for date in sorted(daily_quantities.keys()):
+                yield date, daily_quantities[date]
+            pending_df = chunk[is_last_date]
+        if pending_df is not None:
+            yield from _aggregate_daily_quantities(pending_df, key_columns).items()
+
+def _iter_ndjson_lines(daily_plans):
+    """ Serialize the daily fulfillment plans to NDJSON lines.
+
+    If the uploads turn out to be invalid once the response has started, the
+    stream ends with an `{"error": ...}` line, see `_stream_error_to_dict`.
+
+    Args:
+        daily_plans: An iterator of the daily lists of fulfillment plan tuples.
+    """
+    try:
+        for plans in daily_plans:
+            if len(plans) != 0:
+                yield ''.join(json.dumps(_fulfillment_plan_to_dict(plan), sort_keys=True, default=str) + '\n' for plan in plans)
+    except (AssertionError, UploadError) as error:
+        yield json.dumps({'error': _stream_error_to_dict(error)}, sort_keys=True) + '\n'
+
+def _iter_csv_lines(daily_plans):
+    """ Serialize the daily fulfillment plans to CSV lines with a header.
+
+    If the uploads turn out to be invalid once the response has started, the
+    stream ends with a `# error: ` comment line of the JSON error, see
+    `_stream_error_to_dict`.
+
+    Args:
+        daily_plans: An iterator of the daily lists of fulfillment plan tuples.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(FULFILLMENT_PLAN_COLUMNS)
+    try:
+        for plans in daily_plans:
+            writer.writerows(plans)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except (AssertionError, UploadError) as error:
+        yield buffer.getvalue() + '# error: ' + json.dumps(_stream_error_to_dict(error), sort_keys=True) + '\n'
+
+def _stream_error_to_dict(error):
+    """ Describe an error of the uploads that is raised while streaming.
+
+    Args:
+        error: An `UploadError`, or an `AssertionError` of the scheduler, e.g.
+            of uploads that are not sorted by date.
+    """
+    if isinstance(error, UploadError):
+        return {'message': 'Unexpected file format', **error.to_dict()}
+    return {'message': str(error) or 'Unexpected file format'}
+
+def _aggregate_daily_quantities(df, key_columns):
+    """ Sum up the quantities of the rows with the same date and keys.
+
+    The rows are grouped with a single pass, the order of the keys within a
+    date follows their first appearance in `df`.
+
+    Args:
+        df: A `DataFrame` with a `date` column, a `quantity` column and the key
+            columns.
+        key_columns: The names of the key columns.
 
-def _prepare_batch_fulfillment_plan_response(order_df, sourcing_rule_df, supply_plan_df):
-    df_legal = lambda df, titles: set([*df.columns]) == set(titles)  and len(np.where(pd.isnull(df))[0]) == 0
-    assert df_legal(order_df, ['customer', 'product', 'date', 'quantity']) and df_legal(sourcing_rule_df, ['site', 'product', 'customer']) and df_legal(supply_plan_df, ['site', 'product', 'date', 'quantity'])
-    order_df['date'], supply_plan_df['date'] = pd.to_datetime(order_df['date']), pd.to_datetime(supply_plan_df['date'])
-    order_df, supply_plan_df = order_df.sort_values(by=['date']), supply_plan_df.sort_values(by=['date'])
-    order_scheduler = OrderScheduler()
-    for _, row in sourcing_rule_df.iterrows():
-        order_scheduler.add_sourcing_rule(row['customer'], row['site'], row['product'])
-    fulfillment_plans = []
-    for date in sorted(set(order_df['date']).union(set(supply_plan_df['date']))):
-        order_daily_df, supply_daily_df = order_df[order_df['date'] == date] , supply_plan_df[supply_plan_df['date'] == date]
-        for _, row in order_daily_df.iterrows():
-            order_scheduler.claim_order(row['customer'], row['product'], row['quantity'], row['date'])
-        for _, row in supply_daily_df.iterrows():
-            order_scheduler.claim_supply_plan(row['site'], row['product'], row['quantity'], row['date'])
-        fulfillment_plans += order_scheduler.plan_fulfillment(date)
-    return json.dumps({'fulfillment_plans': [{
-        'customer': plan[0],
-        'product': plan[1],
-        'order_date': plan[2],
-        'site': plan[3],
-        'fulfillment_date': plan[4],
-        'quantity': plan[5]
-    } for plan in fulfillment_plans]}, indent=4, sort_keys=True, default=str)
+    Returns:
+        A dictionary that maps dates to a tuple of lists, which are the values
+        of the key columns and the quantities of that date.
+    """
+    df = df.sort_values(by=['date'], kind='stable').groupby(['date', *key_columns], sort=False, observed=True, as_index=False)['quantity'].sum()
+    columns = [df[column].to_numpy() for column in [*key_columns, 'quantity']]
+    return {
+        date: tuple(column[indices].tolist() for column in columns)
+        for date, indices in df.groupby('date', sort=False).indices.items()
+    }
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
+    # the reloader of the debug mode would run a second job pool, opt in with FLASK_DEBUG=1
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', threaded=True)
@@ -0,0 +1,55 @@
+""" Memory benchmark of the order book kept by `OrderQueueManager`.
+
+Orders are enqueued into a manager while `tracemalloc` traces the allocations,
+the traced memory is reported as bytes per queued order. Dates and quantities
+are shared between orders, so the figure covers the order book structures.
+
+Run from the `api/` directory:
+
+    python -m benchmark.order_memory_benchmark
+"""
+import argparse
+import datetime
+import tracemalloc
+
+from scheduler.manager.order_queue_manager import OrderQueueManager
+from scheduler.model.customer_order import CustomerOrder
+
+
+def measure_bytes_per_order(order_count, origin_count, origins_per_order):
+    """ Measure the memory used by each queued order.
+
+    Args:
+        order_count: The number of orders to enqueue.
+        origin_count: The number of origins in the manager.
+        origins_per_order: The number of origins that every order could be
+            fulfilled by.
+
+    Returns:
+        The traced memory divided by `order_count`.
+    """
+    sut = OrderQueueManager()
+    for origin_id in range(origin_count):
+        sut.add_origin(origin_id)
+    order_date = datetime.datetime(2020, 1, 1)
+    tracemalloc.start()
+    orders = []
+    for order_id in range(order_count):
+        order = CustomerOrder(order_id % 100, 0, 10, order_date, order_id)
+        order.fulfillment_origin_ids = tuple((order_id + offset) % origin_count for offset in range(origins_per_order))
+        orders.append(order)
+    sut.enqueue_daily_order(orders)
+    del orders
+    traced_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return traced_memory / order_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--order-count', type=int, default=100000)
+    parser.add_argument('--origin-count', type=int, default=100)
+    args = parser.parse_args()
+    for origins_per_order in [1, 2, 3]:
+        bytes_per_order = measure_bytes_per_order(args.order_count, args.origin_count, origins_per_order)
+        print('{} origin(s) per order: {:>8.1f} bytes/order'.format(origins_per_order, bytes_per_order))
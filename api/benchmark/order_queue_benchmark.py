@@ -0,0 +1,59 @@
+""" Microbenchmark of `OrderQueueManager` enqueue throughput.
+
+Orders are enqueued into a small set of origins in consecutive batches, and the
+throughput of every batch is reported. With O(1) tail appends the throughput
+should stay flat as the queues grow.
+
+Run from the `api/` directory:
+
+    python -m benchmark.order_queue_benchmark
+"""
+import argparse
+import datetime
+import time
+
+from scheduler.manager.order_queue_manager import OrderQueueManager
+from scheduler.model.customer_order import CustomerOrder
+
+
+def measure_enqueue_throughput(batch_count, batch_size, origin_count):
+    """ Measure the enqueue throughput at increasing queue depth.
+
+    Args:
+        batch_count: The number of batches to enqueue.
+        batch_size: The number of orders in each batch, all orders in a batch
+            share the same order date.
+        origin_count: The number of origins that every order could be
+            fulfilled by.
+
+    Returns:
+        A list of tuples. Each tuple contains the queue depth before the batch
+        and the throughput of the batch in orders per second.
+    """
+    sut = OrderQueueManager()
+    origin_ids = ['origin_{}'.format(index) for index in range(origin_count)]
+    for origin_id in origin_ids:
+        sut.add_origin(origin_id)
+    start_date, results = datetime.datetime(2020, 1, 1), []
+    for batch_index in range(batch_count):
+        order_date = start_date + datetime.timedelta(days=batch_index)
+        orders = []
+        for order_index in range(batch_size):
+            order = CustomerOrder('customer', 'product', order_index + 1, order_date)
+            order.fulfillment_origin_ids = origin_ids
+            orders.append(order)
+        queue_depth = len(sut.queued_orders)
+        begin = time.perf_counter()
+        sut.enqueue_daily_order(orders)
+        results.append((queue_depth, batch_size / (time.perf_counter() - begin)))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-count', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--origin-count', type=int, default=3)
+    args = parser.parse_args()
+    for queue_depth, throughput in measure_enqueue_throughput(args.batch_count, args.batch_size, args.origin_count):
+        print('queue depth {:>8d}: {:>12.0f} orders/s'.format(queue_depth, throughput))
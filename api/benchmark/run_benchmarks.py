@@ -0,0 +1,281 @@
+""" Time and memory benchmarks of the scheduler on a synthetic workload.
+
+Every benchmark is run `--repeat` times for the best wall time, plus once more
+under `tracemalloc` for the peak traced memory. The results are written as a
+JSON document, so that they could be compared between versions.
+
+Run from the `api/` directory:
+
+    python -m benchmark.run_benchmarks --output benchmark_results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import app
+import ingestion
+from benchmark import order_memory_benchmark, order_queue_benchmark
+from benchmark.workload import generate_workload
+from scheduler import config
+from scheduler.manager.order_queue_manager import OrderQueueManager
+from scheduler.model.customer_order import CustomerOrder
+from scheduler.order_scheduler import OrderScheduler
+from scheduler.utils.supply_distribution import distribute_supply_batch
+
+
+def measure(setup, run, repeat):
+    """ Measure the wall time and the peak traced memory of a function.
+
+    Args:
+        setup: A function that prepares a fresh state for `run`, excluded from
+            the measurement.
+        run: The function to be measured, it gets the state from `setup`.
+        repeat: The number of timed runs.
+
+    Returns:
+        A dictionary of the best and the mean wall time in seconds, and the
+        peak traced memory in bytes.
+    """
+    durations = []
+    for _ in range(repeat):
+        state = setup()
+        begin = time.perf_counter()
+        run(state)
+        durations.append(time.perf_counter() - begin)
+    state = setup()
+    tracemalloc.start()
+    run(state)
+    _, peak_traced_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'best_seconds': min(durations),
+        'mean_seconds': sum(durations) / len(durations),
+        'peak_traced_bytes': peak_traced_bytes
+    }
+
+
+def scheduler_benchmarks(order_df, sourcing_rule_df, supply_plan_df):
+    """ Build the benchmarks of a workload.
+
+    Args:
+        order_df: The `DataFrame` of the orders.
+        sourcing_rule_df: The `DataFrame` of the sourcing rules.
+        supply_plan_df: The `DataFrame` of the supply plans.
+
+    Returns:
+        A dictionary that maps benchmark names to `(setup, run)` tuples.
+    """
+    orders = [*zip(
+        order_df['customer'].tolist(),
+        order_df['product'].tolist(),
+        order_df['quantity'].tolist(),
+        [datetime.datetime.fromisoformat(date) for date in order_df['date'].tolist()]
+    )]
+    supply_plans = [*zip(
+        supply_plan_df['site'].tolist(),
+        supply_plan_df['product'].tolist(),
+        supply_plan_df['quantity'].tolist(),
+        [datetime.datetime.fromisoformat(date) for date in supply_plan_df['date'].tolist()]
+    )]
+    dates = sorted(set([order[-1] for order in orders]).union(set([plan[-1] for plan in supply_plans])))
+    origin_lookup = {}
+    for customer, site, product in zip(sourcing_rule_df['customer'].tolist(), sourcing_rule_df['site'].tolist(), sourcing_rule_df['product'].tolist()):
+        origin_lookup.setdefault((customer, product), set()).add((site, product))
+
+    def claimed_scheduler():
+        order_scheduler = OrderScheduler()
+        for customer, site, product in zip(sourcing_rule_df['customer'].tolist(), sourcing_rule_df['site'].tolist(), sourcing_rule_df['product'].tolist()):
+            order_scheduler.add_sourcing_rule(customer, site, product)
+        for order in orders:
+            order_scheduler.claim_order(*order)
+        for plan in supply_plans:
+            order_scheduler.claim_supply_plan(*plan)
+        return order_scheduler
+
+    def daily_customer_orders():
+        daily_orders = {}
+        for order_id, (customer, product, quantity, order_date) in enumerate(orders):
+            customer_order = CustomerOrder(customer, product, quantity, order_date, order_id)
+            customer_order.fulfillment_origin_ids = tuple(sorted(origin_lookup[(customer, product)]))
+            daily_orders.setdefault(order_date, []).append(customer_order)
+        return [daily_orders[date] for date in sorted(daily_orders.keys())]
+
+    def enqueued_manager():
+        order_queue_manager = OrderQueueManager()
+        for origin_ids in origin_lookup.values():
+            for origin_id in origin_ids:
+                order_queue_manager.add_origin(origin_id)
+        for customer_orders in daily_customer_orders():
+            order_queue_manager.enqueue_daily_order(customer_orders)
+        return order_queue_manager
+
+    def enqueue_setup():
+        order_queue_manager = OrderQueueManager()
+        for origin_ids in origin_lookup.values():
+            for origin_id in origin_ids:
+                order_queue_manager.add_origin(origin_id)
+        return order_queue_manager, daily_customer_orders()
+
+    def enqueue_run(state):
+        order_queue_manager, daily_orders = state
+        for customer_orders in daily_orders:
+            order_queue_manager.enqueue_daily_order(customer_orders)
+
+    def claim_run(order_queue_manager):
+        for origin_id in [*order_queue_manager.origin_queue_lookup.keys()]:
+            customer_orders = order_queue_manager.order_queue_content(origin_id)
+            order_queue_manager.claim_origin_fulfillment(origin_id, [order.order_id for order in customer_orders], [order.quantity for order in customer_orders])
+
+    def import_setup():
+        order_scheduler = claimed_scheduler()
+        order_scheduler.current_date = dates[-1] if len(dates) != 0 else order_scheduler.current_date
+        return order_scheduler
+
+    def plan_run(order_scheduler):
+        for date in dates:
+            order_scheduler.plan_fulfillment(date)
+
+    def snapshot_setup():
+        order_scheduler = claimed_scheduler()
+        for date in dates[:len(dates) // 2]:
+            order_scheduler.plan_fulfillment(date)
+        snapshot_file, path = tempfile.mkstemp(suffix='.snapshot')
+        os.close(snapshot_file)
+        order_scheduler.save_snapshot(path)
+        return path
+
+    def snapshot_load_run(path):
+        OrderScheduler.load_snapshot(path)
+        os.remove(path)
+
+    def distribution_setup():
+        generator = random.Random(0)
+        order_quantity_lists = [[generator.randint(1, 100) for _ in range(generator.randint(1, 3))] for _ in range(10000)]
+        return order_quantity_lists, [generator.randint(1, 150) for _ in order_quantity_lists]
+
+    def distribute_supply_run(state):
+        order_scheduler = OrderScheduler()
+        for order_quantities, supply_quantity in zip(*state):
+            order_scheduler._distribute_supply(order_quantities, supply_quantity)
+
+    def distribute_supply_batch_run(state):
+        order_quantity_lists, supply_quantities = state
+        column_count = max(map(len, order_quantity_lists))
+        distribute_supply_batch(
+            [[*quantities, *[0] * (column_count - len(quantities))] for quantities in order_quantity_lists],
+            supply_quantities,
+            config.SUPPLY_DISTRIBUTION_RATES
+        )
+
+    def batch_response_run(state):
+        app._prepare_batch_fulfillment_plan_response(*state)
+
+    order_csv = order_df.to_csv(index=False).encode()
+
+    return {
+        'order_queue_enqueue': (enqueue_setup, enqueue_run),
+        'order_queue_claim': (enqueued_manager, claim_run),
+        'import_order_supply': (import_setup, lambda x: x._import_order_supply()),
+        'plan_fulfillment': (claimed_scheduler, plan_run),
+        'snapshot_load': (snapshot_setup, snapshot_load_run),
+        'distribute_supply': (distribution_setup, distribute_supply_run),
+        'distribute_supply_batch': (distribution_setup, distribute_supply_batch_run),
+        'batch_fulfillment_plan_response': (
+            lambda: (order_df.copy(), sourcing_rule_df.copy(), supply_plan_df.copy()),
+            batch_response_run
+        ),
+        'upload_ingestion': (lambda: io.BytesIO(order_csv), lambda x: ingestion.read_upload(x, 'orders'))
+    }
+
+
+def run_benchmarks(workload_kwargs, repeat, names=None):
+    """ Run the benchmarks on a generated workload.
+
+    Args:
+        workload_kwargs: The arguments of `generate_workload`.
+        repeat: The number of timed runs of each benchmark.
+        names: The names of the benchmarks to run. If `None`, all benchmarks
+            are run.
+
+    Returns:
+        A JSON serializable dictionary of the environment, the workload and the
+        benchmark results.
+    """
+    order_df, sourcing_rule_df, supply_plan_df = generate_workload(**workload_kwargs)
+    benchmarks = scheduler_benchmarks(order_df, sourcing_rule_df, supply_plan_df)
+    results = {
+        name: measure(setup, run, repeat)
+        for name, (setup, run) in benchmarks.items() if names is None or name in names
+    }
+    if names is None or 'order_queue_depth' in names:
+        results['order_queue_depth'] = {
+            'enqueue_orders_per_second': [
+                {'queue_depth': queue_depth, 'orders_per_second': throughput}
+                for queue_depth, throughput in order_queue_benchmark.measure_enqueue_throughput(10, 2000, 3)
+            ]
+        }
+    if names is None or 'order_memory' in names:
+        results['order_memory'] = {
+            'bytes_per_order': {
+                str(origins_per_order): order_memory_benchmark.measure_bytes_per_order(20000, 100, origins_per_order)
+                for origins_per_order in [1, 2, 3]
+            }
+        }
+    return {
+        'created_at': datetime.datetime.now().isoformat(),
+        'git_revision': _git_revision(),
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'workload': {
+            **workload_kwargs,
+            'order_rows': len(order_df),
+            'sourcing_rule_rows': len(sourcing_rule_df),
+            'supply_plan_rows': len(supply_plan_df)
+        },
+        'repeat': repeat,
+        'benchmarks': results
+    }
+
+
+def _git_revision():
+    """ Get the git revision of the working tree, `None` if unavailable.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, check=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--benchmark', action='append', dest='names', help='run only the named benchmark, could be repeated')
+    parser.add_argument('--customer-count', type=int, default=50)
+    parser.add_argument('--site-count', type=int, default=10)
+    parser.add_argument('--product-count', type=int, default=20)
+    parser.add_argument('--day-count', type=int, default=60)
+    parser.add_argument('--daily-order-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    report = run_benchmarks({
+        'customer_count': args.customer_count,
+        'site_count': args.site_count,
+        'product_count': args.product_count,
+        'day_count': args.day_count,
+        'daily_order_rate': args.daily_order_rate,
+        'seed': args.seed
+    }, args.repeat, args.names)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=4)
+    for name, result in report['benchmarks'].items():
+        if 'best_seconds' in result:
+            print('{:<36s} {:>10.4f} s {:>14d} bytes'.format(name, result['best_seconds'], result['peak_traced_bytes']))
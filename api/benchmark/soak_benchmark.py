@@ -0,0 +1,136 @@
+""" Soak benchmark of the memory of a long-running `OrderScheduler`.
+
+A scheduler plans a steady workload day by day over years of simulated time,
+the orders and supply plans of each day are claimed right before it is planned,
+like a long-lived planning scenario. The resident set size (RSS) of the process
+is sampled every `--sample-days` days, together with the number of queued
+orders, order lookup entries and retained supply history entries. In bounded
+memory, the RSS levels off once the backlog is steady, otherwise the supply
+history keeps growing with the days.
+
+Run from the `api/` directory:
+
+    python -m benchmark.soak_benchmark --days 1095
+    python -m benchmark.soak_benchmark --days 1095 --unbounded
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+
+from scheduler.order_scheduler import OrderScheduler
+
+
+def current_rss_bytes():
+    """ Get the resident set size of this process.
+
+    The current RSS is read from `/proc/self/statm` on Linux, elsewhere the
+    peak RSS of `resource.getrusage` is returned instead.
+    """
+    try:
+        with open('/proc/self/statm') as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def run_soak(day_count, sample_days=30, bounded_memory=True, daily_order_count=500, customer_count=200, site_count=20, product_count=50, seed=0):
+    """ Plan a steady workload for many days and sample the memory.
+
+    Every customer orders a few products, each of them could be fulfilled by 1
+    to 3 sites. The daily supply of every origin is random around 105% of the
+    expected demand that it serves, so that the backlog stays steady.
+
+    Args:
+        day_count: The number of simulated days.
+        sample_days: The number of days between the samples.
+        bounded_memory: Whether the scheduler runs in bounded memory.
+        daily_order_count: The number of orders of each day.
+        customer_count: The number of customers.
+        site_count: The number of sites.
+        product_count: The number of products.
+        seed: The seed of the random workload.
+
+    Returns:
+        A list of samples, each of them is a dictionary of the `day`, the
+        `rss_bytes`, the `queued_order_count`, the `order_lookup_count` and the
+        `supply_history_count`.
+    """
+    rng = random.Random(seed)
+    order_scheduler = OrderScheduler(bounded_memory=bounded_memory)
+    demand_sites = {}
+    for customer in range(customer_count):
+        for product in rng.sample(range(product_count), 5):
+            demand_sites[('customer_{}'.format(customer), 'product_{}'.format(product))] = [
+                'site_{}'.format(site) for site in rng.sample(range(site_count), rng.randint(1, 3))
+            ]
+    origin_demands = {}
+    daily_demand = daily_order_count / len(demand_sites) * 10.5
+    for (customer_name, product_name), site_names in demand_sites.items():
+        for site_name in site_names:
+            order_scheduler.add_sourcing_rule(customer_name, site_name, product_name)
+            origin_key = (site_name, product_name)
+            origin_demands[origin_key] = origin_demands.get(origin_key, 0) + daily_demand / len(site_names)
+    demand_keys, origin_keys = [*demand_sites.keys()], [*origin_demands.keys()]
+    start_date, samples = datetime.datetime(2020, 1, 1), []
+    for day in range(day_count):
+        date = start_date + datetime.timedelta(days=day)
+        orders = [rng.choice(demand_keys) for _ in range(daily_order_count)]
+        order_scheduler.claim_daily_orders(date, [order[0] for order in orders], [order[1] for order in orders], [rng.randint(1, 20) for _ in orders])
+        order_scheduler.claim_daily_supply_plans(
+            date,
+            [origin_key[0] for origin_key in origin_keys],
+            [origin_key[1] for origin_key in origin_keys],
+            [round(origin_demands[origin_key] * 1.05 * rng.uniform(0.5, 1.5)) for origin_key in origin_keys]
+        )
+        order_scheduler.plan_fulfillment(date)
+        if (day + 1) % sample_days == 0 or day + 1 == day_count:
+            gc.collect()
+            samples.append({
+                'day': day + 1,
+                'rss_bytes': current_rss_bytes(),
+                'queued_order_count': len(order_scheduler.order_queue_manager.queued_orders),
+                'order_lookup_count': len(order_scheduler.order_queue_manager.order_lookup),
+                'supply_history_count': sum(
+                    len(origin.history_supply_dates) for origin in order_scheduler.fulfillment_origin_manager.origin_lookup.values()
+                )
+            })
+    return samples
+
+
+def rss_growth_per_year(samples):
+    """ Get the RSS growth of the second half of the samples in bytes per
+        year, the first half is the warm-up.
+
+    Args:
+        samples: The samples of `run_soak`.
+    """
+    first, last = samples[len(samples) // 2], samples[-1]
+    if last['day'] == first['day']:
+        return 0.0
+    return (last['rss_bytes'] - first['rss_bytes']) / (last['day'] - first['day']) * 365
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=1095)
+    parser.add_argument('--sample-days', type=int, default=90)
+    parser.add_argument('--daily-order-count', type=int, default=500)
+    parser.add_argument('--unbounded', action='store_true', help='keep the whole supply history')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the samples to a JSON file')
+    args = parser.parse_args()
+    samples = run_soak(args.days, args.sample_days, not args.unbounded, args.daily_order_count, seed=args.seed)
+    for sample in samples:
+        print('day {:>6d}: {:>8.1f} MB RSS, {:>7d} queued orders, {:>7d} order lookups, {:>8d} supply history entries'.format(
+            sample['day'], sample['rss_bytes'] / 2 ** 20, sample['queued_order_count'], sample['order_lookup_count'], sample['supply_history_count']
+        ))
+    print('RSS growth after warm-up: {:.2f} MB/year'.format(rss_growth_per_year(samples) / 2 ** 20))
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(samples, output_file, indent=4)
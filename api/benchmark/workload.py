@@ -0,0 +1,120 @@
+""" Synthetic workload generator for the scheduler benchmarks.
+
+The generated workload has the same layout as the uploads of the backend app.
+Run from the `api/` directory to write a workload as CSV files:
+
+    python -m benchmark.workload --output-dir /tmp/workload
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def generate_workload(customer_count=50, site_count=10, product_count=20, day_count=60,
+        sites_per_demand=2, demand_ratio=0.3, daily_order_rate=0.2, quantity_shape=1.5,
+        quantity_scale=10, supply_ratio=1.0, supply_interval=7, start_date='2020-01-01', seed=0):
+    """ Generate the orders, sourcing rules and supply plans of a workload.
+
+    Each customer demands a random subset of the products, and each demand
+    could be fulfilled by a random subset of the sites. The number of orders of
+    a demand on a date follows a Poisson distribution, and the order quantities
+    follow a Pareto (Lomax) distribution, so that there are a few huge orders.
+    Every origin receives supply every `supply_interval` days on average, sized
+    so that the total supply is about `supply_ratio` times the total demand.
+
+    Args:
+        customer_count: The number of customers.
+        site_count: The number of sites.
+        product_count: The number of products.
+        day_count: The number of days of the workload.
+        sites_per_demand: The maximum number of sites of a demand.
+        demand_ratio: The probability that a customer demands a product.
+        daily_order_rate: The expected number of orders of a demand per day.
+        quantity_shape: The shape of the Pareto distribution of the order
+            quantities, the smaller, the heavier the tail.
+        quantity_scale: The scale of the order quantities.
+        supply_ratio: The ratio between the total supply and the total demand.
+        supply_interval: The average interval in days between two supplies of
+            an origin.
+        start_date: The first date of the workload.
+        seed: The seed of the random generator.
+
+    Returns:
+        A tuple of `DataFrame` objects of the orders, the sourcing rules and the
+        supply plans, with the same columns as the uploads of the backend app.
+    """
+    rng = np.random.default_rng(seed)
+    customers = np.array(['customer_{}'.format(index) for index in range(customer_count)])
+    sites = np.array(['site_{}'.format(index) for index in range(site_count)])
+    products = np.array(['product_{}'.format(index) for index in range(product_count)])
+    dates = pd.date_range(start_date, periods=day_count)
+    demand_customers, demand_products = np.nonzero(rng.random((customer_count, product_count)) < demand_ratio)
+    rule_demands, rule_sites = [], []
+    for demand_index in range(len(demand_customers)):
+        demand_sites = rng.choice(site_count, size=rng.integers(1, sites_per_demand + 1), replace=False)
+        rule_demands += [demand_index] * len(demand_sites)
+        rule_sites += demand_sites.tolist()
+    rule_demands, rule_sites = np.array(rule_demands, dtype=int), np.array(rule_sites, dtype=int)
+    sourcing_rule_df = pd.DataFrame({
+        'site': sites[rule_sites],
+        'product': products[demand_products[rule_demands]],
+        'customer': customers[demand_customers[rule_demands]]
+    })
+    order_counts = rng.poisson(daily_order_rate, size=(day_count, len(demand_customers)))
+    order_days, order_demands = np.nonzero(order_counts)
+    order_days, order_demands = np.repeat(order_days, order_counts[order_days, order_demands]), np.repeat(order_demands, order_counts[order_days, order_demands])
+    order_quantities = (rng.pareto(quantity_shape, size=len(order_days)) * quantity_scale).astype(int) + 1
+    order_df = pd.DataFrame({
+        'customer': customers[demand_customers[order_demands]],
+        'product': products[demand_products[order_demands]],
+        'date': dates[order_days].strftime('%Y-%m-%d'),
+        'quantity': order_quantities
+    })
+    origins = sourcing_rule_df[['site', 'product']].drop_duplicates().to_numpy()
+    supply_days, supply_origins = np.nonzero(rng.random((day_count, len(origins))) < 1 / supply_interval)
+    supply_quantities = rng.random(len(supply_days))
+    if len(supply_days) != 0:
+        supply_quantities *= supply_ratio * order_quantities.sum() / supply_quantities.sum()
+    supply_plan_df = pd.DataFrame({
+        'site': origins[supply_origins, 0] if len(origins) != 0 else [],
+        'product': origins[supply_origins, 1] if len(origins) != 0 else [],
+        'date': dates[supply_days].strftime('%Y-%m-%d'),
+        'quantity': supply_quantities.astype(int) + 1
+    })
+    return order_df, sourcing_rule_df, supply_plan_df
+
+
+def write_workload(output_dir, **kwargs):
+    """ Generate a workload and write it as CSV files.
+
+    Args:
+        output_dir: The directory of the `orders.csv`, `sourcing_rules.csv` and
+            `supply_plans.csv` files.
+        kwargs: The arguments of `generate_workload`.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    order_df, sourcing_rule_df, supply_plan_df = generate_workload(**kwargs)
+    order_df.to_csv(os.path.join(output_dir, 'orders.csv'), index=False)
+    sourcing_rule_df.to_csv(os.path.join(output_dir, 'sourcing_rules.csv'), index=False)
+    supply_plan_df.to_csv(os.path.join(output_dir, 'supply_plans.csv'), index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--customer-count', type=int, default=50)
+    parser.add_argument('--site-count', type=int, default=10)
+    parser.add_argument('--product-count', type=int, default=20)
+    parser.add_argument('--day-count', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_workload(
+        args.output_dir,
+        customer_count=args.customer_count,
+        site_count=args.site_count,
+        product_count=args.product_count,
+        day_count=args.day_count,
+        seed=args.seed
+    )
@@ -0,0 +1,337 @@
+""" Typed parsing and validation of the uploads.
+
+Each upload has a fixed schema of columns, see `UPLOAD_COLUMNS`:
+
+- the names, like `customer`, `site` and `product`, are categorical strings,
+  even if they look like numbers;
+- the `date` is in one of the `DATE_FORMATS`;
+- the `quantity` is a non-negative integer.
+
+Where `pyarrow` is installed, the CSV files are parsed by its multi-threaded
+reader straight into the schema, and only a file with invalid values is read
+again leniently to find them. Otherwise, `pandas` parses the names as
+categories and the other columns are converted afterwards. Either way, every
+column is validated in a vectorized pass, and the invalid values are reported
+by row in an `UploadError`.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:
+    pyarrow = None
+
+
+# The columns of each upload, in the order of the normalized `DataFrame`.
+UPLOAD_COLUMNS = {
+    'orders': ['customer', 'product', 'date', 'quantity'],
+    'sourcing_rules': ['customer', 'site', 'product'],
+    'supply_plans': ['site', 'product', 'date', 'quantity']
+}
+# The accepted date formats, tried in order. The last one is the format of the
+# upload templates of the front-end, like `1-Jul-19`.
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d-%b-%y']
+# The largest number of invalid values that an `UploadError` lists.
+MAX_REPORTED_ERRORS = 100
+# The largest quantity, beyond it the quantities would overflow `int64`.
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+class UploadError(Exception):
+    """ Raised when an upload does not follow its schema.
+
+    Attributes:
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`, or the
+            name of the JSON rows of a request, like `scenarios[0].orders`.
+        errors: A list of up to `MAX_REPORTED_ERRORS` dictionaries of the
+            `row`, the `column` and the `message` of an invalid value, by
+            ascending row. The rows are counted from 1 after the header, the
+            `row` of an error of the header is `None`, and so is the `column`
+            of a file that is not valid CSV.
+        error_count: The total number of invalid values.
+    """
+
+    def __init__(self, upload_name, errors, error_count):
+        super().__init__('{} has {} invalid values'.format(upload_name, error_count))
+        self.upload_name = upload_name
+        self.errors = errors
+        self.error_count = error_count
+
+    def to_dict(self):
+        """ Describe the error for a response.
+        """
+        return {'upload': self.upload_name, 'errors': self.errors, 'error_count': self.error_count}
+
+
+def read_upload(source, upload_name):
+    """ Read a CSV upload into a normalized `DataFrame`.
+
+    Args:
+        source: A CSV file object.
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+
+    Returns:
+        A `DataFrame` with the columns of `UPLOAD_COLUMNS` in order, the names
+        as categories, the dates as `datetime64[ns]` and the quantities as
+        `int64`.
+
+    Raises:
+        UploadError: If the upload does not follow its schema.
+    """
+    columns = UPLOAD_COLUMNS[upload_name]
+    if pyarrow is None:
+        try:
+            df = pd.read_csv(source, dtype=_pandas_dtypes(columns))
+        except pd.errors.EmptyDataError:
+            raise _header_error(upload_name, [])
+        except pd.errors.ParserError as error:
+            raise _parse_error(upload_name, error)
+        return normalize_upload(_check_fields(df, upload_name), upload_name)
+    data = source.read()
+    if len(data.strip()) == 0:
+        raise _header_error(upload_name, [])
+    try:
+        table = _read_arrow_csv(data, columns, strict=True)
+    except pyarrow.ArrowInvalid:
+        # a value does not convert, read the dates and quantities as strings
+        # so that the invalid values could be reported by row
+        try:
+            table = _read_arrow_csv(data, columns, strict=False)
+        except pyarrow.ArrowInvalid as error:
+            raise _parse_error(upload_name, error)
+    return normalize_upload(table.to_pandas(), upload_name)
+
+
+def iter_upload_chunks(source, upload_name, chunk_size):
+    """ Read a CSV upload in chunks of normalized `DataFrame` objects.
+
+    Args:
+        source: A CSV file object.
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+        chunk_size: The number of rows of a chunk.
+
+    Yields:
+        The normalized chunks, see also `read_upload`. The rows of the errors
+        are counted from the start of the file.
+
+    Raises:
+        UploadError: If a chunk does not follow the schema.
+    """
+    row_offset = 0
+    try:
+        chunks = pd.read_csv(source, chunksize=chunk_size, dtype=_pandas_dtypes(UPLOAD_COLUMNS[upload_name]))
+    except pd.errors.EmptyDataError:
+        raise _header_error(upload_name, [])
+    with chunks:
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except pd.errors.ParserError as error:
+                raise _parse_error(upload_name, error)
+            if chunk is None:
+                return
+            yield normalize_upload(_check_fields(chunk, upload_name), upload_name, row_offset)
+            row_offset += len(chunk)
+
+
+def normalize_upload(df, upload_name, row_offset=0):
+    """ Convert a `DataFrame` of an upload to its schema, and validate it.
+
+    Args:
+        df: A `DataFrame` with the columns of the upload, of any types, e.g.
+            parsed from JSON rows.
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+        row_offset: The number of rows before `df` in the upload, to report
+            the rows of the errors.
+
+    Returns:
+        The normalized `DataFrame`, see also `read_upload`.
+
+    Raises:
+        UploadError: If `df` does not follow the schema.
+    """
+    columns = UPLOAD_COLUMNS[upload_name]
+    if set(df.columns) != set(columns):
+        raise _header_error(upload_name, [*df.columns])
+    normalized_columns, invalid_masks = {}, []
+    for column in columns:
+        values = df[column]
+        missing_mask = values.isna().to_numpy()
+        if column == 'date':
+            values, invalid_mask, message = *_parse_dates(values, missing_mask), 'is not a date in a known format'
+        elif column == 'quantity':
+            values, invalid_mask, message = *_parse_quantities(values, missing_mask), 'is not a non-negative integer'
+        else:
+            values, invalid_mask, message = _parse_names(values), None, None
+        normalized_columns[column] = values
+        invalid_masks.append((column, 'is missing', missing_mask))
+        if invalid_mask is not None:
+            invalid_masks.append((column, message, invalid_mask))
+    error_count = sum(int(np.count_nonzero(mask)) for _, _, mask in invalid_masks)
+    if error_count != 0:
+        errors = sorted([
+            {'row': int(row) + row_offset + 1, 'column': column, 'message': message}
+            for column, message, mask in invalid_masks
+            for row in np.flatnonzero(mask)[:MAX_REPORTED_ERRORS]
+        ], key=lambda x: x['row'])[:MAX_REPORTED_ERRORS]
+        raise UploadError(upload_name, errors, error_count)
+    return pd.DataFrame(normalized_columns, index=df.index)
+
+
+def _header_error(upload_name, header):
+    """ Get the `UploadError` of a header that does not have the columns of
+        the upload, e.g. the empty header of an empty file.
+
+    Args:
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+        header: The list of the column names of the upload.
+    """
+    columns = UPLOAD_COLUMNS[upload_name]
+    errors = [{'row': None, 'column': column, 'message': 'is missing'} for column in columns if column not in header]
+    errors += [{'row': None, 'column': column, 'message': 'is unexpected'} for column in header if column not in columns]
+    return UploadError(upload_name, errors, len(errors))
+
+
+def _parse_error(upload_name, error):
+    """ Get the `UploadError` of a file that is not valid CSV, e.g. with a
+        row of the wrong number of fields.
+
+    Args:
+        upload_name: The name of the upload, a key of `UPLOAD_COLUMNS`.
+        error: The error of the CSV reader.
+    """
+    return UploadError(upload_name, [{'row': None, 'column': None, 'message': 'is not valid CSV: {}'.format(str(error).strip())}], 1)
+
+
+def _check_fields(df, upload_name):
+    """ Check that `pd.read_csv` did not take the first fields as an index,
+        which it does if the first row has more fields than the header.
+
+    Raises:
+        UploadError: If the rows have more fields than the header.
+    """
+    if not isinstance(df.index, pd.RangeIndex):
+        raise _parse_error(upload_name, 'the rows have more fields than the header')
+    return df
+
+
+def _pandas_dtypes(columns):
+    """ Get the `dtype` argument of `pd.read_csv` for the columns, the names
+        are categories and the dates are strings.
+    """
+    return {column: str if column == 'date' else 'category' for column in columns if column != 'quantity'}
+
+
+def _read_arrow_csv(data, columns, strict):
+    """ Read CSV data into an Arrow table.
+
+    Args:
+        data: The `bytes` of the CSV file.
+        columns: The columns of the upload.
+        strict: Whether the dates and the quantities are converted by the
+            reader, otherwise they are read as strings.
+    """
+    column_types = {column: pyarrow.dictionary(pyarrow.int32(), pyarrow.string()) for column in columns}
+    if 'date' in columns:
+        column_types['date'] = pyarrow.timestamp('ns') if strict else pyarrow.string()
+    if 'quantity' in columns:
+        column_types['quantity'] = pyarrow.int64() if strict else pyarrow.string()
+    return pyarrow.csv.read_csv(io.BytesIO(data), convert_options=pyarrow.csv.ConvertOptions(
+        column_types=column_types,
+        timestamp_parsers=DATE_FORMATS,
+        strings_can_be_null=True
+    ))
+
+
+def _parse_names(values):
+    """ Convert the names to categories of strings.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    if values.cat.categories.inferred_type not in ['string', 'empty']:
+        values = values.cat.rename_categories(values.cat.categories.astype(str))
+    return values
+
+
+def _parse_dates(values, missing_mask):
+    """ Parse the dates with the first of `DATE_FORMATS` that matches.
+
+    Returns:
+        A tuple of the dates and the mask of the invalid values.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('datetime64[ns]'), None
+    dates = pd.to_datetime(values, format=DATE_FORMATS[0], errors='coerce')
+    for date_format in DATE_FORMATS[1:]:
+        retry_mask = dates.isna().to_numpy() & ~missing_mask
+        if not retry_mask.any():
+            break
+        dates[retry_mask] = pd.to_datetime(values[retry_mask], format=date_format, errors='coerce')
+    return dates.astype('datetime64[ns]'), dates.isna().to_numpy() & ~missing_mask
+
+
+def _parse_quantities(values, missing_mask):
+    """ Convert the quantities to integers.
+
+    Integer strings are parsed exactly rather than through floats, and the
+    values beyond `int64` are invalid rather than wrapped around.
+
+    Returns:
+        A tuple of the quantities and the mask of the invalid values.
+    """
+    kind = values.dtype.kind if isinstance(values.dtype, np.dtype) else None
+    if kind == 'i':
+        return values.astype('int64'), (values < 0).to_numpy()
+    if kind == 'u':
+        invalid_mask = (values > _INT64_MAX).to_numpy()
+        return pd.Series(np.where(invalid_mask, 0, values.to_numpy()).astype('int64'), index=values.index), invalid_mask
+    if kind == 'f':
+        number_array = values.to_numpy()
+        with np.errstate(invalid='ignore'):
+            invalid_mask = ~missing_mask & ((number_array % 1 != 0) | (number_array < 0) | (number_array >= 2.0 ** 63))
+        return pd.Series(np.where(missing_mask | invalid_mask, 0, number_array).astype('int64'), index=values.index), invalid_mask
+    quantities, parsed_mask = np.zeros(len(values), dtype='int64'), np.zeros(len(values), dtype=bool)
+    try:
+        # up to 18 digits always fit into int64
+        parsed_mask = values.str.fullmatch(r'\s*\+?\d{1,18}\s*').fillna(False).to_numpy(dtype=bool)
+    except AttributeError:
+        pass
+    if parsed_mask.any():
+        quantities[parsed_mask] = values[parsed_mask].str.strip().astype('int64').to_numpy()
+    invalid_mask = np.zeros(len(values), dtype=bool)
+    value_array = values.to_numpy(dtype=object)
+    for index in np.flatnonzero(~parsed_mask & ~missing_mask):
+        quantity = _parse_quantity(value_array[index])
+        if quantity is None or not 0 <= quantity <= _INT64_MAX:
+            invalid_mask[index] = True
+        else:
+            quantities[index] = quantity
+    return pd.Series(quantities, index=values.index), invalid_mask
+
+
+def _parse_quantity(value):
+    """ Parse a quantity that is not a short integer string exactly.
+
+    Returns:
+        The `int` of the quantity, `None` if it is not an integer.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, (float, np.floating)) and np.isfinite(value) and float(value).is_integer():
+        return int(value)
+    return None
@@ -0,0 +1,299 @@
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import uuid
+
+# The number of shared progress values of a job slot: the planned days, the
+# total days, the cancellation flag and the start flag.
+_SLOT_SIZE = 4
+# The shared progress values of the job slots, inherited by the workers.
+_slot_values = None
+
+
+class JobCancelled(Exception):
+    """ Raised in a worker when its job is cancelled while running.
+    """
+
+
+class JobProgress(object):
+    """ The progress of a job as seen by its worker.
+
+    The progress lives in a slot of shared memory, so the service could poll
+    it while the job is running, and the service could flag the job to stop.
+
+    Attributes:
+        slot: The index of the job slot.
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def start(self, total_day_count):
+        """ Set the number of days that the job plans.
+
+        Args:
+            total_day_count: The number of days to plan.
+        """
+        _slot_values[self.slot * _SLOT_SIZE + 1] = total_day_count
+        self.check_cancelled()
+
+    def advance(self, day_count=1):
+        """ Count the planned days, and stop the job if it is cancelled.
+
+        Args:
+            day_count: The number of days planned since the last call.
+
+        Raises:
+            JobCancelled: If the job is cancelled.
+        """
+        _slot_values[self.slot * _SLOT_SIZE] += day_count
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        """ Stop the job if it is cancelled.
+
+        Raises:
+            JobCancelled: If the job is cancelled.
+        """
+        if _slot_values[self.slot * _SLOT_SIZE + 2] != 0:
+            raise JobCancelled()
+
+
+class PlanningJob(object):
+    """ A planning run submitted to the `JobManager`.
+
+    Attributes:
+        job_id: The id of the job.
+        slot: The index of the job slot while the job is queued or running,
+            `None` once it is finished.
+        slot_values: The shared progress values of the job slots.
+        future: The `Future` of the job in the process pool.
+        planned_day_count: The number of planned days when the job finished.
+        total_day_count: The number of days to plan when the job finished.
+        result_bytes: The size of the result of the succeeded job, see also
+            `JobManager.max_finished_bytes`.
+    """
+
+    def __init__(self, job_id, slot, slot_values, future):
+        self.job_id = job_id
+        self.slot = slot
+        self.slot_values = slot_values
+        self.future = future
+        self.planned_day_count = 0
+        self.total_day_count = None
+        self.result_bytes = 0
+
+    @property
+    def status(self):
+        """ The status of the job, `queued`, `running`, `succeeded`, `failed`
+            or `cancelled`.
+        """
+        future, slot = self.future, self.slot
+        if not future.done():
+            # the pool marks the jobs that it hands to the workers as running
+            # before they start, thus the start flag of the slot is checked
+            return 'running' if slot is not None and self.slot_values[slot * _SLOT_SIZE + 3] != 0 else 'queued'
+        if future.cancelled() or isinstance(future.exception(), JobCancelled):
+            return 'cancelled'
+        return 'failed' if future.exception() is not None else 'succeeded'
+
+
+class JobManager(object):
+    """ A thread-safe manager of planning jobs in a bounded process pool.
+
+    A job is a function that takes a `JobProgress` and the arguments of the
+    job, and returns a picklable result. At most `max_workers` jobs run at a
+    time, and at most `max_queued_jobs` more wait for a worker, further jobs
+    are rejected until a job finishes. The progress of a job is shared through
+    a fixed table of slots, one for each queued or running job. Finished jobs
+    keep their result until they are removed, the oldest of them are dropped
+    beyond `max_finished_jobs`, or while their results take more than
+    `max_finished_bytes`. The latest finished job is kept however large its
+    result is, so that it could be fetched.
+
+    Attributes:
+        max_workers: The number of worker processes.
+        max_finished_jobs: The number of finished jobs that are kept.
+        max_finished_bytes: The largest total size of the results of the
+            finished jobs, which is the total length of the `bytes` and
+            strings in the results.
+        finished_bytes: The total size of the results of the finished jobs.
+        job_lookup: A dictionary that maps job ids to the `PlanningJob`
+            objects, in submission order.
+        free_slots: A list of the indices of the free job slots.
+        slot_values: The shared progress values of the job slots.
+        executor: The `ProcessPoolExecutor`, created on the first submission.
+        lock: The lock that guards the jobs and the slots, reentrant since
+            cancelling a queued job runs its done callback right away.
+    """
+
+    def __init__(self, max_workers=None, max_queued_jobs=16, max_finished_jobs=64, max_finished_bytes=256 * 2 ** 20):
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count()
+        self.max_finished_jobs = max_finished_jobs
+        self.max_finished_bytes = max_finished_bytes
+        self.finished_bytes = 0
+        self.job_lookup = {}
+        self.free_slots = [*range(self.max_workers + max_queued_jobs)][::-1]
+        self.slot_values = multiprocessing.RawArray('q', len(self.free_slots) * _SLOT_SIZE)
+        self.executor = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.job_lookup)
+
+    def submit_job(self, job_function, *args):
+        """ Queue a job to the process pool.
+
+        Args:
+            job_function: A picklable function that takes a `JobProgress` and
+                `args`.
+            args: The picklable arguments of the job.
+
+        Returns:
+            The new `PlanningJob` object, `None` if there are too many queued
+            or running jobs.
+        """
+        with self.lock:
+            if len(self.free_slots) == 0:
+                return None
+            slot = self.free_slots.pop()
+            self.slot_values[slot * _SLOT_SIZE:(slot + 1) * _SLOT_SIZE] = [0, -1, 0, 0]
+            try:
+                future = self._get_executor().submit(_run_job, slot, job_function, args)
+            except concurrent.futures.process.BrokenProcessPool:
+                # a worker died abruptly, the jobs of the broken pool have failed
+                self.executor = None
+                future = self._get_executor().submit(_run_job, slot, job_function, args)
+            job = PlanningJob(uuid.uuid4().hex, slot, self.slot_values, future)
+            self.job_lookup[job.job_id] = job
+        job.future.add_done_callback(lambda _: self._finish_job(job))
+        return job
+
+    def get_job(self, job_id):
+        """ Get a job by its id, `None` if it does not exist.
+
+        Args:
+            job_id: The id of the job.
+        """
+        with self.lock:
+            return self.job_lookup.get(job_id)
+
+    def get_progress(self, job):
+        """ Get the progress of a job.
+
+        Args:
+            job: The `PlanningJob` object.
+
+        Returns:
+            A tuple of the number of planned days and the number of days to
+            plan, which is `None` until the job starts planning.
+        """
+        with self.lock:
+            if job.slot is None:
+                return job.planned_day_count, job.total_day_count
+            planned_day_count, total_day_count = self.slot_values[job.slot * _SLOT_SIZE:job.slot * _SLOT_SIZE + 2]
+            return planned_day_count, total_day_count if total_day_count >= 0 else None
+
+    def cancel_job(self, job_id):
+        """ Cancel a job. A queued job never starts, a running job stops after
+            the day that it is planning, and is `cancelled` once it stopped.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            Whether the job existed.
+        """
+        with self.lock:
+            job = self.job_lookup.get(job_id)
+            if job is None:
+                return False
+            if job.slot is not None and not job.future.cancel():
+                self.slot_values[job.slot * _SLOT_SIZE + 2] = 1
+        return True
+
+    def remove_job(self, job_id):
+        """ Cancel a job if it is not finished, and remove it from the manager.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            Whether the job existed.
+        """
+        if not self.cancel_job(job_id):
+            return False
+        with self.lock:
+            job = self.job_lookup.pop(job_id, None)
+            if job is not None and job.slot is None:
+                self.finished_bytes -= job.result_bytes
+            return job is not None
+
+    def shutdown(self):
+        """ Cancel the queued jobs and wait for the running jobs.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_executor(self):
+        """ Get the process pool, create it if there is none.
+        """
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=_init_worker, initargs=(self.slot_values,)
+            )
+        return self.executor
+
+    def _finish_job(self, job):
+        """ Keep the final progress of a finished job, free its slot and drop
+            the oldest finished jobs beyond `max_finished_jobs` or
+            `max_finished_bytes`.
+        """
+        with self.lock:
+            slot = job.slot
+            job.planned_day_count, total_day_count = self.slot_values[slot * _SLOT_SIZE:slot * _SLOT_SIZE + 2]
+            job.total_day_count = total_day_count if total_day_count >= 0 else None
+            # the job was removed while it was running if it is not looked up
+            if self.job_lookup.get(job.job_id) is job:
+                if not job.future.cancelled() and job.future.exception() is None:
+                    job.result_bytes = _result_size(job.future.result())
+                    self.finished_bytes += job.result_bytes
+                finished_jobs = [other_job for other_job in self.job_lookup.values() if other_job.slot is None] + [job]
+                for index, other_job in enumerate(finished_jobs):
+                    if len(finished_jobs) - index <= self.max_finished_jobs and (self.finished_bytes <= self.max_finished_bytes or other_job is job):
+                        break
+                    del self.job_lookup[other_job.job_id]
+                    self.finished_bytes -= other_job.result_bytes
+            # the slot is freed last, since a job without a slot counts as finished
+            job.slot = None
+            self.free_slots.append(slot)
+
+
+def _result_size(result):
+    """ Get the total length of the `bytes` and strings in a job result, which
+        could be nested in tuples and lists.
+    """
+    if isinstance(result, (bytes, str)):
+        return len(result)
+    if isinstance(result, (tuple, list)):
+        return sum(_result_size(item) for item in result)
+    return 0
+
+
+def _init_worker(slot_values):
+    """ Keep the shared progress values in a worker process.
+    """
+    global _slot_values
+    _slot_values = slot_values
+
+
+def _run_job(slot, job_function, args):
+    """ Run a job in a worker process, unless it was cancelled while queued.
+    """
+    progress = JobProgress(slot)
+    progress.check_cancelled()
+    _slot_values[slot * _SLOT_SIZE + 3] = 1
+    return job_function(progress, *args)
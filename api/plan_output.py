@@ -0,0 +1,160 @@
+""" Serialization of fulfillment plans in the output formats of the API.
+
+The plans are serialized from a `FulfillmentPlanBuffer` column by column. The
+`json` format is the list of plan objects that the front-end reads, the other
+formats are compact:
+
+- `compact-json`: a JSON document with the columns as arrays, the names
+  dictionary encoded and the dates as ISO strings;
+- `csv`: a CSV file, gzip compressed if the client accepts it;
+- `parquet` and `arrow`: a Parquet file or an Arrow IPC stream with dictionary
+  encoded name columns, which require `pyarrow`.
+
+The other keys of the response, like the statistics, are added to the JSON
+documents, and to the schema metadata of the Parquet and Arrow outputs as JSON
+strings. The CSV output only has the plans.
+"""
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+FULFILLMENT_PLAN_COLUMNS = ['customer', 'product', 'order_date', 'site', 'fulfillment_date', 'quantity']
+# The mimetype of each output format, `compact-json` could only be requested by
+# name since it has the same mimetype as `json`.
+OUTPUT_MIMETYPES = {
+    'json': 'application/json',
+    'compact-json': 'application/json',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+ARROW_FORMATS = ['parquet', 'arrow']
+
+
+def negotiate_output_format(format_name, accept_mimetypes):
+    """ Choose the output format of a request.
+
+    Args:
+        format_name: The requested format name, or `None` to choose by the
+            mimetypes that the client accepts.
+        accept_mimetypes: The `Accept` header of the request, see also
+            `werkzeug.datastructures.MIMEAccept`.
+
+    Returns:
+        The name of the output format, `json` if the client sends no `Accept`
+        header or accepts `*/*` or `application/json`, or `None` if the
+        requested format is unknown or the client accepts none of the formats.
+    """
+    if format_name is not None:
+        return format_name if format_name in OUTPUT_MIMETYPES else None
+    if not accept_mimetypes:
+        return 'json'
+    mimetype_formats = {mimetype: name for name, mimetype in OUTPUT_MIMETYPES.items() if name != 'compact-json'}
+    return mimetype_formats.get(accept_mimetypes.best_match([*mimetype_formats.keys()]))
+
+
+def output_format_available(output_format):
+    """ Check whether the dependencies of an output format are installed.
+
+    Args:
+        output_format: The name of the output format.
+    """
+    return output_format not in ARROW_FORMATS or pyarrow is not None
+
+
+def serialize_fulfillment_plans(plan_buffer, output_format, metadata=None, compress=True):
+    """ Serialize the fulfillment plans in an output format.
+
+    Args:
+        plan_buffer: The `FulfillmentPlanBuffer` of the plans.
+        output_format: The name of the output format, see also
+            `OUTPUT_MIMETYPES`.
+        metadata: A dictionary of the other keys of the response.
+        compress: Whether the `csv` output is gzip compressed.
+
+    Returns:
+        The serialized plans, a `str` for the JSON formats and `bytes`
+        otherwise.
+    """
+    metadata = metadata if metadata is not None else {}
+    if output_format == 'json':
+        response = {**metadata, 'fulfillment_plans': [dict(zip(FULFILLMENT_PLAN_COLUMNS, plan)) for plan in plan_buffer.rows()]}
+        return json.dumps(response, indent=4, sort_keys=True, default=str)
+    if output_format == 'compact-json':
+        return json.dumps({**metadata, 'fulfillment_plans': _compact_plans(plan_buffer)}, separators=(',', ':'), sort_keys=True, default=_json_default)
+    if output_format == 'csv':
+        content = _plan_data_frame(plan_buffer).to_csv(index=False).encode('utf-8')
+        return gzip.compress(content, compresslevel=6) if compress else content
+    assert output_format in ARROW_FORMATS, 'unknown output format'
+    assert pyarrow is not None, 'pyarrow is required for {} output'.format(output_format)
+    table = _arrow_table(plan_buffer, metadata)
+    sink = pyarrow.BufferOutputStream()
+    if output_format == 'parquet':
+        pyarrow.parquet.write_table(table, sink)
+    else:
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _compact_plans(plan_buffer):
+    """ Get the columns of the plans as lists, the names are dictionary encoded
+        and the dates are ISO strings.
+    """
+    columns = plan_buffer.columns()
+    for column in ['order_date', 'fulfillment_date']:
+        columns[column] = np.datetime_as_string(columns[column], unit='auto')
+    columns['quantity'] = plan_buffer.quantities
+    return {
+        'row_count': len(plan_buffer),
+        'dictionaries': plan_buffer.dictionaries(),
+        'columns': {column: _to_list(columns[column]) for column in FULFILLMENT_PLAN_COLUMNS}
+    }
+
+
+def _plan_data_frame(plan_buffer):
+    """ Get the plans as a `DataFrame` with the names decoded.
+    """
+    columns, dictionaries = plan_buffer.columns(), plan_buffer.dictionaries()
+    for column, names in dictionaries.items():
+        columns[column] = np.array(names, dtype=object)[columns[column]] if len(names) != 0 else columns[column].astype(object)
+    columns['quantity'] = plan_buffer.quantities
+    return pd.DataFrame({column: columns[column] for column in FULFILLMENT_PLAN_COLUMNS})
+
+
+def _arrow_table(plan_buffer, metadata):
+    """ Get the plans as a `pyarrow.Table` with dictionary encoded names and
+        the metadata in the schema.
+    """
+    columns, dictionaries = plan_buffer.columns(), plan_buffer.dictionaries()
+    arrays = {}
+    for column in FULFILLMENT_PLAN_COLUMNS:
+        if column in dictionaries:
+            arrays[column] = pyarrow.DictionaryArray.from_arrays(columns[column].astype(np.int32), pyarrow.array(dictionaries[column]))
+        else:
+            arrays[column] = pyarrow.array(columns[column])
+    return pyarrow.table(arrays).replace_schema_metadata({
+        key: json.dumps(value, separators=(',', ':'), sort_keys=True, default=_json_default) for key, value in sorted(metadata.items())
+    })
+
+
+def _to_list(values):
+    """ Convert a column to a list of Python objects.
+    """
+    return values.tolist() if isinstance(values, np.ndarray) else [*values]
+
+
+def _json_default(value):
+    """ Serialize the dates as ISO strings and other unknown objects as
+        strings.
+    """
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
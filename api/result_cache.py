@@ -0,0 +1,187 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+
+def cache_key(data_frames, options):
+    """ Get the content address of a request.
+
+    The rows of each `DataFrame` are hashed column by column in one vectorized
+    pass, so the key costs much less than the planning. The row order is part
+    of the key, since it decides the order of the plans of a day.
+
+    Args:
+        data_frames: A list of normalized `DataFrame` objects, with their
+            columns in a fixed order and their dates parsed.
+        options: A JSON serializable object of the options and configurations
+            that change the result.
+
+    Returns:
+        The hexadecimal SHA-256 digest of the key.
+    """
+    digest = hashlib.sha256()
+    for df in data_frames:
+        digest.update(json.dumps([[column, str(dtype)] for column, dtype in df.dtypes.items()]).encode())
+        digest.update(len(df).to_bytes(8, 'little'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache(object):
+    """ A thread-safe cache of serialized results by their content address.
+
+    The results are kept in an in-memory LRU of at most `max_memory_bytes`,
+    and if a `directory` is given, in a file per result there as well, of at
+    most `max_disk_bytes` in total. The least recently used files are evicted
+    first, and a result found on disk is brought back into memory. The files
+    are written atomically, and the files of a previous run are reused.
+
+    Attributes:
+        max_memory_bytes: The largest total size of the results in memory.
+        directory: The directory of the results on disk, `None` if there is no
+            disk store.
+        max_disk_bytes: The largest total size of the results on disk.
+        memory_entries: An `OrderedDict` that maps keys to the results in
+            memory, least recently used first.
+        memory_bytes: The total size of the results in memory.
+        disk_entries: An `OrderedDict` that maps keys to the sizes of the
+            results on disk, least recently used first.
+        disk_bytes: The total size of the results on disk.
+        memory_hit_count: The number of results found in memory.
+        disk_hit_count: The number of results found on disk.
+        miss_count: The number of results not found.
+        lock: The lock that guards the entries and the counters.
+    """
+
+    def __init__(self, max_memory_bytes=256 * 2 ** 20, directory=None, max_disk_bytes=2 ** 30):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_entries = collections.OrderedDict()
+        self.memory_bytes = 0
+        self.disk_entries = collections.OrderedDict()
+        self.disk_bytes = 0
+        self.memory_hit_count = 0
+        self.disk_hit_count = 0
+        self.miss_count = 0
+        self.lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            entries = [entry for entry in os.scandir(directory) if entry.is_file() and not entry.name.startswith('.')]
+            for entry in sorted(entries, key=lambda x: x.stat().st_mtime):
+                self.disk_entries[entry.name] = entry.stat().st_size
+                self.disk_bytes += entry.stat().st_size
+            self._evict_disk_entries()
+
+    def __len__(self):
+        return len(self.memory_entries.keys() | self.disk_entries.keys())
+
+    def get(self, key):
+        """ Get a result and count the hit or the miss.
+
+        Args:
+            key: The key of `cache_key`.
+
+        Returns:
+            The `bytes` of the result, `None` if it is not cached.
+        """
+        with self.lock:
+            value = self.memory_entries.get(key)
+            if value is not None:
+                self.memory_entries.move_to_end(key)
+                if key in self.disk_entries:
+                    self.disk_entries.move_to_end(key)
+                self.memory_hit_count += 1
+                return value
+            if key in self.disk_entries:
+                try:
+                    with open(os.path.join(self.directory, key), 'rb') as value_file:
+                        value = value_file.read()
+                    os.utime(os.path.join(self.directory, key))
+                except OSError:
+                    self.disk_bytes -= self.disk_entries.pop(key)
+                else:
+                    self.disk_entries.move_to_end(key)
+                    self._put_memory_entry(key, value)
+                    self.disk_hit_count += 1
+                    return value
+            self.miss_count += 1
+            return None
+
+    def put(self, key, value):
+        """ Cache a result.
+
+        A result larger than the capacity of the memory or the disk is not
+        kept there.
+
+        Args:
+            key: The key of `cache_key`.
+            value: The `bytes` of the result.
+        """
+        with self.lock:
+            self._put_memory_entry(key, value)
+            if self.directory is None or key in self.disk_entries or len(value) > self.max_disk_bytes:
+                return
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.')
+            try:
+                with os.fdopen(descriptor, 'wb') as value_file:
+                    value_file.write(value)
+                os.replace(temp_path, os.path.join(self.directory, key))
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+            self.disk_entries[key] = len(value)
+            self.disk_bytes += len(value)
+            self._evict_disk_entries()
+
+    def stats(self):
+        """ Get the counters and the sizes of the cache.
+
+        Returns:
+            A dictionary of the `hit_count`, `memory_hit_count`,
+            `disk_hit_count`, `miss_count`, and the entry counts and sizes of
+            the memory and the disk.
+        """
+        with self.lock:
+            return {
+                'hit_count': self.memory_hit_count + self.disk_hit_count,
+                'memory_hit_count': self.memory_hit_count,
+                'disk_hit_count': self.disk_hit_count,
+                'miss_count': self.miss_count,
+                'memory_entry_count': len(self.memory_entries),
+                'memory_bytes': self.memory_bytes,
+                'disk_entry_count': len(self.disk_entries),
+                'disk_bytes': self.disk_bytes
+            }
+
+    def _put_memory_entry(self, key, value):
+        """ Put a result into the memory LRU, and evict the least recently used
+            results beyond `max_memory_bytes`.
+        """
+        if len(value) > self.max_memory_bytes:
+            return
+        if key in self.memory_entries:
+            self.memory_bytes -= len(self.memory_entries.pop(key))
+        self.memory_entries[key] = value
+        self.memory_bytes += len(value)
+        while self.memory_bytes > self.max_memory_bytes:
+            _, evicted_value = self.memory_entries.popitem(last=False)
+            self.memory_bytes -= len(evicted_value)
+
+    def _evict_disk_entries(self):
+        """ Remove the least recently used files beyond `max_disk_bytes`.
+        """
+        while self.disk_bytes > self.max_disk_bytes:
+            key, size = self.disk_entries.popitem(last=False)
+            self.disk_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except OSError:
+                pass
@@ -0,0 +1,130 @@
+import threading
+import uuid
+
+from scheduler.order_scheduler import OrderScheduler
+
+
+class PlanningScenario(object):
+    """ A long-lived `OrderScheduler` of a planning scenario.
+
+    The orders and supply plans of a scenario are claimed incrementally, each
+    batch only plans the dates that became due, so an update costs as much as
+    the claims it adds instead of a replay of the whole history.
+
+    Attributes:
+        scenario_id: The id of the scenario.
+        order_scheduler: The `OrderScheduler` of the scenario.
+        lock: The lock that serializes the updates of the scenario.
+    """
+
+    def __init__(self, scenario_id, order_scheduler):
+        self.scenario_id = scenario_id
+        self.order_scheduler = order_scheduler
+        self.lock = threading.Lock()
+
+    def claim_and_plan(self, sourcing_rules, daily_orders, daily_supply_plans, until_date=None):
+        """ Claim a batch of sourcing rules, orders and supply plans, then plan
+            the dates that became due.
+
+        The whole batch is validated before anything is claimed, so a rejected
+        batch leaves the scenario untouched.
+
+        Args:
+            sourcing_rules: A list of `(customer_name, site_name, product_name)`
+                tuples to be added before the orders.
+            daily_orders: A dictionary that maps dates to the customer names,
+                product names and quantities of the orders on that date.
+            daily_supply_plans: A dictionary that maps dates to the site names,
+                product names and quantities of the supply plans on that date.
+            until_date: The last date to plan, inclusive. If `None`, the last
+                date of the batch is used, and if the batch has no dates,
+                nothing is planned.
+
+        Returns:
+            A list of `(date, fulfillment_plans)` tuples of the newly planned
+            dates, see also `OrderScheduler.run_until`.
+        """
+        with self.lock:
+            order_scheduler = self.order_scheduler
+            dates = [*daily_orders.keys(), *daily_supply_plans.keys()]
+            for date in dates:
+                assert date > order_scheduler.current_date, 'you cannot add claims for the past'
+            if until_date is None and len(dates) != 0:
+                until_date = max(dates)
+            assert until_date is None or until_date >= order_scheduler.current_date, 'you cannot plan the past'
+            new_demands = set([(customer_name, product_name) for customer_name, _, product_name in sourcing_rules])
+            new_origins = set([(site_name, product_name) for _, site_name, product_name in sourcing_rules])
+            for customer_names, product_names, _ in daily_orders.values():
+                for customer_name, product_name in set(zip(customer_names, product_names)) - new_demands:
+                    order_scheduler.sourcing_rule_manager.get_fulfillment_sites(
+                        order_scheduler.customer_interner.get_id(customer_name),
+                        order_scheduler.product_interner.get_id(product_name)
+                    )
+            for site_names, product_names, _ in daily_supply_plans.values():
+                for site_name, product_name in set(zip(site_names, product_names)) - new_origins:
+                    order_scheduler.get_origin_id(site_name, product_name)
+            for customer_name, site_name, product_name in sourcing_rules:
+                order_scheduler.add_sourcing_rule(customer_name, site_name, product_name)
+            for date, columns in daily_orders.items():
+                order_scheduler.claim_daily_orders(date, *columns)
+            for date, columns in daily_supply_plans.items():
+                order_scheduler.claim_daily_supply_plans(date, *columns)
+            if until_date is None:
+                return []
+            return order_scheduler.run_until(until_date)
+
+
+class ScenarioRegistry(object):
+    """ A thread-safe registry of the planning scenarios of the service.
+
+    Attributes:
+        scenario_lookup: A dictionary that maps scenario ids to the
+            `PlanningScenario` objects.
+        lock: The lock that guards `scenario_lookup`.
+    """
+
+    def __init__(self):
+        self.scenario_lookup = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.scenario_lookup)
+
+    def create_scenario(self, sourcing_rules):
+        """ Create a scenario with an empty `OrderScheduler`.
+
+        Args:
+            sourcing_rules: A list of `(customer_name, site_name, product_name)`
+                tuples.
+
+        Returns:
+            The new `PlanningScenario` object.
+        """
+        order_scheduler = OrderScheduler()
+        for customer_name, site_name, product_name in sourcing_rules:
+            order_scheduler.add_sourcing_rule(customer_name, site_name, product_name)
+        scenario = PlanningScenario(uuid.uuid4().hex, order_scheduler)
+        with self.lock:
+            self.scenario_lookup[scenario.scenario_id] = scenario
+        return scenario
+
+    def get_scenario(self, scenario_id):
+        """ Get a scenario by its id, `None` if it does not exist.
+
+        Args:
+            scenario_id: The id of the scenario.
+        """
+        with self.lock:
+            return self.scenario_lookup.get(scenario_id)
+
+    def remove_scenario(self, scenario_id):
+        """ Remove a scenario from the registry.
+
+        Args:
+            scenario_id: The id of the scenario.
+
+        Returns:
+            Whether the scenario existed.
+        """
+        with self.lock:
+            return self.scenario_lookup.pop(scenario_id, None) is not None
@@ -1,4 +1,5 @@
 from .manager.fulfillment_origin_manager import *
 from .manager.order_queue_manager import *
+from .manager.origin_priority_manager import *
 from .manager.sourcing_rule_manager import *
 from . import order_scheduler
\ No newline at end of file
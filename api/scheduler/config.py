@@ -3,3 +3,23 @@
 # change it, update the corresponding unit tests or write a universal unit test
 # that take this configuration into consideration.
 SUPPLY_DISTRIBUTION_RATES = [0.7, 0.2, 0.1]
+
+# The number of trailing days of supply history that the average daily supply
+# of an origin is computed on. If `None`, the whole supply history is used.
+SUPPLY_HISTORY_WINDOW_DAYS = None
+
+# The least number of origins that a day plans together for their supply to be
+# distributed by the vectorized kernel, fewer origins are distributed one by
+# one, which is faster than building the arrays for them.
+BATCH_DISTRIBUTION_MIN_ORIGINS = 128
+
+# The number of days after the planned date that the claimed supply plans are
+# looked ahead, so that the waiting time of an origin is estimated on its
+# upcoming supply. If `None`, only the supply history is used.
+LOOKAHEAD_HORIZON_DAYS = None
+
+# Whether the scheduler runs in bounded memory, where the origins drop the
+# supply history that the average daily supply no longer needs: the supplies
+# older than `SUPPLY_HISTORY_WINDOW_DAYS`, or all but the totals if the window
+# is `None`. The plans are the same, but the full history is no longer kept.
+BOUNDED_MEMORY = False
@@ -8,40 +8,48 @@ class FulfillmentOriginManager(object):
         origin_lookup: A dictionary for looking up `FulfillmentOrigin` object
             with its `origin_id`.
         site_product_lookup: A dictionary for looking up the `origin_id` of an
-            `FulfillmentOrigin` object with its `site_name` and `product_name`.
+            `FulfillmentOrigin` object with its `site_id` and `product_id`.
+        shared_origin_ids: A set of the ids of the origins that are shared
+            with the other branches of the last `fork`. Such an origin is
+            copied before it changes.
     """
 
     def __init__(self):
         self.origin_lookup = {}
         self.site_product_lookup = {}
+        self.shared_origin_ids = set()
 
-    def add_origin(self, site_name, product_name, origin_id=None):
+    def add_origin(self, site_id, product_id, origin_id=None):
         """ Add a fulfillment origin to the manager.
 
         Args:
-            site_name: The site name of the fulfillment origin.
-            product_name: The product name of the fulfillment origin.
-            origin_id: The id of the fulfillment origin. If `None`, an
-            auto-generated UUID string would be used.
+            site_id: The site id of the fulfillment origin.
+            product_id: The product id of the fulfillment origin.
+            origin_id: The id of the fulfillment origin. If `None`, the number
+            of origins in the manager would be used, so that auto-generated ids
+            are dense integers.
         """
-        if self._origin_exists(site_name, product_name):
+        if self._origin_exists(site_id, product_id):
             return
-        new_origin = FulfillmentOrigin(site_name, product_name, origin_id)
+        if origin_id is None:
+            origin_id = len(self.origin_lookup)
+        assert origin_id not in self.origin_lookup, 'duplicate origin id'
+        new_origin = FulfillmentOrigin(site_id, product_id, origin_id)
         self.origin_lookup[new_origin.origin_id] = new_origin
-        if site_name not in self.site_product_lookup:
-            self.site_product_lookup[site_name] = {}
-        self.site_product_lookup[site_name][product_name] = new_origin.origin_id
+        if site_id not in self.site_product_lookup:
+            self.site_product_lookup[site_id] = {}
+        self.site_product_lookup[site_id][product_id] = new_origin.origin_id
 
-    def get_origin_id(self, site_name, product_name):
-        """ Get the origin id of a fulfillment origin by its site name and
-            product name.
+    def get_origin_id(self, site_id, product_id):
+        """ Get the origin id of a fulfillment origin by its site id and
+            product id.
 
         Args:
-            site_name: The site name of the fulfillment origin.
-            product_name: The product name of the fulfillment origin.
+            site_id: The site id of the fulfillment origin.
+            product_id: The product id of the fulfillment origin.
         """
-        assert self._origin_exists(site_name, product_name), 'unknown origin'
-        return self.site_product_lookup[site_name][product_name]
+        assert self._origin_exists(site_id, product_id), 'unknown origin'
+        return self.site_product_lookup[site_id][product_id]
     
     def get_origin(self, origin_id):
         """ Get the `FulfillmentOrigin` object by its `origin_id`.
@@ -66,27 +74,76 @@ class FulfillmentOriginManager(object):
         assert origin_id in self.origin_lookup, 'unknown origin'
         return self.origin_lookup[origin_id].cached_supply_quantity
 
-    def get_origin_average_daily_supply_quantity(self, origin_id, until_date):
+    def get_origin_average_daily_supply_quantity(self, origin_id, until_date, window_days=None):
         """ Get the average daily supply of a fulfillment origin.
 
         Args:
             origin_id: The id of the fulfillment origin.
             until_date: The end date for fetching the history supply data.
+            window_days: If not `None`, only the supplies of the last
+                `window_days` days are taken into account.
         """
         assert origin_id in self.origin_lookup, 'unknown origin'
-        return self.origin_lookup[origin_id].average_daily_supply_quantity(until_date)
+        return self.origin_lookup[origin_id].average_daily_supply_quantity(until_date, window_days)
 
-    def add_supply(self, site_name, product_name, quantity, date):
+    def get_origin_future_supply_quantity(self, origin_id, start_date, end_date):
+        """ Get the quantity of the indexed future supply plans of a
+            fulfillment origin after the start date until the end date.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+            start_date: The date that the range starts after, usually today.
+            end_date: The last date of the range, inclusive.
+        """
+        assert origin_id in self.origin_lookup, 'unknown origin'
+        return self.origin_lookup[origin_id].future_supply_quantity(start_date, end_date)
+
+    def index_future_supply(self, supply_plan_pool):
+        """ Index the future supply plans of all fulfillment origins.
+
+        Args:
+            supply_plan_pool: A dictionary that maps dates to dictionaries that
+                map `(site_id, product_id)` to the supply quantity of the
+                date, see also `OrderScheduler.supply_plan_pool`. The supply
+                plans of unknown origins are skipped.
+        """
+        origin_supplies = {}
+        for date in sorted(supply_plan_pool.keys()):
+            for (site_id, product_id), quantity in supply_plan_pool[date].items():
+                origin_id = self.site_product_lookup.get(site_id, {}).get(product_id)
+                if origin_id is not None:
+                    dates, quantities = origin_supplies.setdefault(origin_id, ([], []))
+                    dates.append(date)
+                    quantities.append(quantity)
+        for origin_id in self.origin_lookup:
+            self._writable_origin(origin_id).index_future_supply(*origin_supplies.get(origin_id, ([], [])))
+
+    def add_supply(self, site_id, product_id, quantity, date):
         """ Add supply to a fulfillment origin.
 
         Args:
-            site_name: The site name of the fulfillment origin.
-            product_name: The product name of the fulfillment origin.
+            site_id: The site id of the fulfillment origin.
+            product_id: The product id of the fulfillment origin.
             quantity: The quantity of the supply.
             date: The date of the supply.
+
+        Returns:
+            The id of the fulfillment origin.
         """
-        assert self._origin_exists(site_name, product_name), 'add supply for unknown origin'
-        self.origin_lookup[self.get_origin_id(site_name, product_name)].add_supply(quantity, date)
+        origin_id = self.site_product_lookup.get(site_id, {}).get(product_id)
+        assert origin_id is not None, 'add supply for unknown origin'
+        self._writable_origin(origin_id).add_supply(quantity, date)
+        return origin_id
+
+    def trim_supply_history(self, origin_id, start_date):
+        """ Drop the history supplies of a fulfillment origin before a date.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+            start_date: The date of the earliest supply to keep.
+        """
+        assert origin_id in self.origin_lookup, 'unknown origin'
+        self._writable_origin(origin_id).trim_supply_history(start_date)
 
     def consume_supply(self, origin_id, quantity):
         """ Declear a product consumption of a fulfillment origin.
@@ -96,13 +153,37 @@ class FulfillmentOriginManager(object):
             quantity: The quantity of the consumption.
         """
         assert origin_id in self.origin_lookup, 'consume supply for unknown origin'
-        self.origin_lookup[origin_id].consume_supply(quantity)
+        self._writable_origin(origin_id).consume_supply(quantity)
+
+    def fork(self):
+        """ Get a copy-on-write copy of the manager.
+
+        The origins are shared by both managers, and an origin is copied by
+        the manager that changes it first, see also `shared_origin_ids`.
+        """
+        manager = FulfillmentOriginManager()
+        manager.origin_lookup = dict(self.origin_lookup)
+        manager.site_product_lookup = {site_id: dict(products) for site_id, products in self.site_product_lookup.items()}
+        for origin_manager in [self, manager]:
+            origin_manager.shared_origin_ids = set(self.origin_lookup.keys())
+        return manager
+
+    def _writable_origin(self, origin_id):
+        """ Get an origin to change, which is copied first if it is shared.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        if origin_id in self.shared_origin_ids:
+            self.shared_origin_ids.discard(origin_id)
+            self.origin_lookup[origin_id] = self.origin_lookup[origin_id].fork()
+        return self.origin_lookup[origin_id]
 
-    def _origin_exists(self, site_name, product_name):
+    def _origin_exists(self, site_id, product_id):
         """ Check whether a fulfillment origin exists in this manager.
 
         Args:
-            site_name: The site name of the fulfillment origin.
-            product_name: The product name of the fulfillment origin.
+            site_id: The site id of the fulfillment origin.
+            product_id: The product id of the fulfillment origin.
         """
-        return site_name in self.site_product_lookup and product_name in self.site_product_lookup[site_name]
+        return site_id in self.site_product_lookup and product_id in self.site_product_lookup[site_id]
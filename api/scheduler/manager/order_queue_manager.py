@@ -1,9 +1,14 @@
 import datetime
+import itertools
 from typing import Counter
 
+from scheduler.model.customer_order import CustomerOrder
 from scheduler.model.fulfillment_queue_node import FulfillmentQueueNode
 
 
+_generation_counter = itertools.count(1)
+
+
 class OrderQueueManager(object):
     """ A manager object that maintains the order queue.
 
@@ -18,22 +23,55 @@ class OrderQueueManager(object):
     Attributes:
         origin_queue_lookup: A dictionary that maps fulfillment origin id to its
             order queue head.
-        order_lookup: A dictionary that maps an order id to a list of the queue
-            nodes that represents this order.
+        origin_queue_tail_lookup: A dictionary that maps fulfillment origin id
+            to its order queue tail, so that orders are appended in O(1).
+        order_lookup: A dictionary that maps an order id to a tuple of the queue
+            nodes that represents this order. The finished orders are removed,
+            so that the memory is proportional to the queued orders.
         queued_orders: A dictionary that maps an order id to its `CustomerOrder`
             object.
-        origin_due_quantity_counter: A counter object that counts the average
-            due quantity of an order queue, keyed by fulfillment origin id. See
-            also `origin_average_quantity` method of `CustomerOrder`.
+        origin_due_quantity_sums: A dictionary that maps fulfillment origin id
+            to the remaining quantity of its queued orders, summed up by the
+            number of fulfillment origins of the orders in a dictionary that
+            maps the number of origins to the quantity sum. The sums are exact
+            for integer quantities, see also `get_origin_average_due_quantity`.
         current_date: The date of the last queued order.
+        backlog_quantity: The remaining quantity of the queued orders.
+        customer_backlog_counter: A counter object of the remaining quantity
+            of the queued orders, keyed by customer id. Customers without
+            remaining quantity are removed.
+        product_backlog_counter: A counter object of the remaining quantity of
+            the queued orders, keyed by product id. Products without
+            remaining quantity are removed.
+        shared_orders: The `queued_orders` dictionary of the last `fork`,
+            which is shared with the other branches and never changed. While
+            `queued_orders` is this dictionary, it is copied together with
+            `order_lookup` before they change, and an order in it is copied
+            before its quantity changes.
+        generation: The generation of the manager, which is renewed by each
+            `fork`. The queue nodes of earlier generations are shared with the
+            other branches and never changed: a finished order is skipped
+            instead of unlinked there, and the nodes queued after a shared
+            tail are linked by `shared_next_lookup`. The queue heads are kept
+            at the first queued order, and the queue tails could be the shared
+            node of a finished order.
+        shared_next_lookup: A dictionary that maps the shared tail node of a
+            queue to the next node that this manager queued after it.
     """
 
     def __init__(self):
         self.origin_queue_lookup = {}
+        self.origin_queue_tail_lookup = {}
         self.order_lookup = {}
         self.queued_orders = {}
-        self.origin_due_quantity_counter = Counter()
+        self.origin_due_quantity_sums = {}
         self.current_date = datetime.datetime.min
+        self.backlog_quantity = 0
+        self.customer_backlog_counter = Counter()
+        self.product_backlog_counter = Counter()
+        self.shared_orders = {}
+        self.generation = 0
+        self.shared_next_lookup = {}
 
     def add_origin(self, origin_id):
         """ Add a fulfillment origin to the manager.
@@ -43,6 +81,7 @@ class OrderQueueManager(object):
         """
         if origin_id not in self.origin_queue_lookup:
             self.origin_queue_lookup[origin_id] = None
+            self.origin_queue_tail_lookup[origin_id] = None
 
     def enqueue_daily_order(self, customer_orders):
         """ Put the orders on the same day to the queue.
@@ -64,34 +103,85 @@ class OrderQueueManager(object):
         """ Claim a fulfillment operation.
 
         If this fulfillment finishes all remaining quantities of the order, its
-        corresponding nodes will be removed from queue.
+        corresponding nodes will be removed from queue. See also
+        `claim_origin_fulfillment`.
 
         Args:
             origin_id: The fulfillment origin that ships the products.
             order_id: The order id that this operation fulfills.
             quantity: The quantity of products that this operation fulfills.
         """
-        def dequeue_node(node):
-            if node.prev is not None:
-                node.prev.next = node.next
-            if node.next is not None:
-                node.next.prev = node.prev
-        assert origin_id in self.origin_queue_lookup and order_id in self.queued_orders, 'fulfill for unknown order'
-        assert quantity <= self.queued_orders[order_id].quantity, 'fulfillment overflow'
-        average_quantity_before = self.queued_orders[order_id].origin_average_quantity()
-        oids = self.queued_orders[order_id].fulfillment_origin_ids
-        if quantity < self.queued_orders[order_id].quantity:
-            self.queued_orders[order_id].quantity -= quantity
-            average_quantity_after = self.queued_orders[order_id].origin_average_quantity()
-        elif quantity == self.queued_orders[order_id].quantity:
-            self.queued_orders.pop(order_id, None)
-            for node in self.order_lookup[order_id]:
-                if node.prev is None:
-                    self.origin_queue_lookup[node.origin_id] = node.next
-                dequeue_node(node)
-        average_quantity_after = 0 if order_id not in self.queued_orders else self.queued_orders[order_id].origin_average_quantity()
-        for oid in oids:
-            self.origin_due_quantity_counter[oid] -= average_quantity_before - average_quantity_after
+        self.claim_origin_fulfillment(origin_id, [order_id], [quantity])
+
+    def claim_origin_fulfillment(self, origin_id, order_ids, quantities):
+        """ Claim the fulfillment operations of a fulfillment origin at once.
+
+        The remaining quantities of the orders and the due quantity sums of
+        their origins are updated first, then the nodes of the finished orders
+        are removed from the queues in one pass.
+
+        Args:
+            origin_id: The fulfillment origin that ships the products.
+            order_ids: The ids of the orders that the operations fulfill.
+            quantities: The quantity of products that each operation fulfills.
+        """
+        assert origin_id in self.origin_queue_lookup, 'fulfill for unknown order'
+        self._own_orders()
+        queued_orders, shared_orders, due_quantity_sums, finished_order_ids = self.queued_orders, self.shared_orders, self.origin_due_quantity_sums, []
+        try:
+            for order_id, quantity in zip(order_ids, quantities):
+                order = queued_orders.get(order_id)
+                assert order is not None, 'fulfill for unknown order'
+                assert quantity <= order.quantity, 'fulfillment overflow'
+                if quantity != 0:
+                    origin_count = len(order.fulfillment_origin_ids)
+                    for oid in order.fulfillment_origin_ids:
+                        quantity_sums = due_quantity_sums[oid]
+                        quantity_sum = quantity_sums.get(origin_count, 0) - quantity
+                        if quantity_sum == 0:
+                            del quantity_sums[origin_count]
+                        else:
+                            quantity_sums[origin_count] = quantity_sum
+                    self._count_backlog(order, -quantity)
+                if quantity < order.quantity:
+                    if len(shared_orders) != 0 and order is shared_orders.get(order_id):
+                        order = queued_orders[order_id] = self._copy_order(order)
+                    order.quantity -= quantity
+                else:
+                    del queued_orders[order_id]
+                    finished_order_ids.append(order_id)
+        finally:
+            self._dequeue_orders(finished_order_ids)
+
+    def backlog_orders(self):
+        """ Get a snapshot of the queued orders.
+
+        The orders are read from `queued_orders` in the order they were queued,
+        so every order is listed once however many origins could fulfill it.
+
+        Returns:
+            A list of `(order_id, customer_id, product_id, order_date,
+            quantity)` tuples, where `quantity` is the remaining quantity.
+        """
+        return [
+            (order.order_id, order.customer_id, order.product_id, order.order_date, order.quantity)
+            for order in self.queued_orders.values()
+        ]
+
+    def backlog_summary(self):
+        """ Get the summary of the queued orders from the running totals.
+
+        Returns:
+            A dictionary of the `order_count` and the remaining `quantity` of
+            the queued orders, and the remaining quantity of each customer and
+            product in `customer_quantities` and `product_quantities`.
+        """
+        return {
+            'order_count': len(self.queued_orders),
+            'quantity': self.backlog_quantity,
+            'customer_quantities': dict(self.customer_backlog_counter),
+            'product_quantities': dict(self.product_backlog_counter)
+        }
 
     def peek_order_queue_content(self, origin_id, min_quantity_sum, min_order_count):
         """ Get the top `CustomerOrder` objects in the queue.
@@ -107,12 +197,14 @@ class OrderQueueManager(object):
             min_order_count: The minimum count of the returned orders.
         """
         assert origin_id in self.origin_queue_lookup, 'origin does not exist'
-        order_quantity_sum = 0
+        order_quantity_sum, queued_orders, shared_next_lookup = 0, self.queued_orders, self.shared_next_lookup
         peek_orders, head = [], self.origin_queue_lookup[origin_id]
         while head is not None and (order_quantity_sum < min_quantity_sum or len(peek_orders) < min_order_count):
-            peek_orders.append(self.queued_orders[head.order_id])
-            order_quantity_sum += peek_orders[-1].quantity
-            head = head.next
+            order = queued_orders.get(head.order_id)
+            if order is not None:
+                peek_orders.append(order)
+                order_quantity_sum += order.quantity
+            head = head.next if head.next is not None or len(shared_next_lookup) == 0 else shared_next_lookup.get(head)
         return peek_orders
 
     def order_queue_content(self, origin_id):
@@ -125,16 +217,78 @@ class OrderQueueManager(object):
         order_ids, head = [], self.origin_queue_lookup[origin_id]
         while head is not None:
             order_ids.append(head.order_id)
-            head = head.next
-        return [self.queued_orders[order_id] for order_id in order_ids]
+            head = self._next_node(head)
+        return [self.queued_orders[order_id] for order_id in order_ids if order_id in self.queued_orders]
+
+    def restore_queued_orders(self, customer_orders, due_quantity_sums):
+        """ Queue the orders of another manager as they were.
+
+        The order queue of an origin keeps the enqueue order of its orders,
+        which is also the insertion order of `queued_orders`, so the queues are
+        rebuilt by appending the orders in that order. The due quantity sums
+        are taken as they are instead of being summed up again, so that they
+        are bit-identical to the other manager for float quantities too. The
+        backlog totals are summed up from the orders.
+
+        Args:
+            customer_orders: The `CustomerOrder` objects in the order of the
+                `queued_orders` of the other manager.
+            due_quantity_sums: A dictionary that maps fulfillment origin ids to
+                the values of `origin_due_quantity_sums`.
+        """
+        assert len(self.queued_orders) == 0, 'please restore to an empty queue'
+        self._own_orders()
+        for customer_order in customer_orders:
+            order_id = customer_order.order_id
+            nodes = tuple([FulfillmentQueueNode(origin_id, order_id, self.generation) for origin_id in customer_order.fulfillment_origin_ids])
+            for node in nodes:
+                self._append_node(node)
+            self.queued_orders[order_id] = customer_order
+            self.order_lookup[order_id] = nodes
+            self._count_backlog(customer_order, customer_order.quantity)
+        self.origin_due_quantity_sums = {origin_id: dict(quantity_sums) for origin_id, quantity_sums in due_quantity_sums.items()}
+
+    def fork(self):
+        """ Get a copy-on-write copy of the manager.
+
+        The queued orders, their lookup and the queue nodes are shared by both
+        managers until either of them changes them, see also `shared_orders`
+        and `generation`. Only the state of the origins, customers and
+        products is copied right away.
+        """
+        manager = OrderQueueManager()
+        manager.origin_queue_lookup = dict(self.origin_queue_lookup)
+        manager.origin_queue_tail_lookup = dict(self.origin_queue_tail_lookup)
+        manager.order_lookup = self.order_lookup
+        manager.queued_orders = self.queued_orders
+        manager.origin_due_quantity_sums = {origin_id: dict(quantity_sums) for origin_id, quantity_sums in self.origin_due_quantity_sums.items()}
+        manager.current_date = self.current_date
+        manager.backlog_quantity = self.backlog_quantity
+        manager.customer_backlog_counter = Counter(self.customer_backlog_counter)
+        manager.product_backlog_counter = Counter(self.product_backlog_counter)
+        manager.shared_next_lookup = dict(self.shared_next_lookup)
+        generation = next(_generation_counter)
+        for queue_manager in [self, manager]:
+            queue_manager.shared_orders = self.queued_orders
+            queue_manager.generation = generation
+        return manager
 
     def get_origin_average_due_quantity(self, origin_id):
         """ Get the average due order remain quantity sum of a fulfillment origin.
 
+        Each order counts its remaining quantity divided by its number of
+        fulfillment origins, see also `origin_average_quantity` method of
+        `CustomerOrder`. The quotients are taken from the exact sums of
+        `origin_due_quantity_sums` on each call, so that rounding errors do not
+        pile up over the claims.
+
         Args:
             origin_id: The id of the fulfillment origin.
         """
-        return self.origin_due_quantity_counter[origin_id]
+        due_quantity = 0
+        for origin_count, quantity_sum in self.origin_due_quantity_sums.get(origin_id, {}).items():
+            due_quantity += quantity_sum / origin_count
+        return due_quantity
 
     def _enqueue_order(self, customer_order):
         """ Put an order to the order queue.
@@ -142,22 +296,132 @@ class OrderQueueManager(object):
         Args:
             customer_order: A `CustomerOrder` object to be queued.
         """
-        def enqueue_node(head, node):
-            tail = head
-            while tail.next is not None:
-                tail = tail.next
-            tail.next = node
-            node.prev = tail
-            node.next = None
         assert customer_order.order_id not in self.order_lookup, 'one order can only be added once'
-        for origin_id in customer_order.fulfillment_origin_ids:
-            self.origin_due_quantity_counter[origin_id] += customer_order.origin_average_quantity()
-        self.order_lookup[customer_order.order_id] = []
+        self._own_orders()
+        self._count_due_quantity(customer_order, customer_order.quantity)
         self.queued_orders[customer_order.order_id] = customer_order
+        self._count_backlog(customer_order, customer_order.quantity)
+        nodes = [FulfillmentQueueNode(origin_id, customer_order.order_id, self.generation) for origin_id in customer_order.fulfillment_origin_ids]
+        for node in nodes:
+            self._append_node(node)
+        self.order_lookup[customer_order.order_id] = tuple(nodes)
+
+    def _append_node(self, node):
+        """ Append a new queue node to the queue of its origin.
+
+        Args:
+            node: The `FulfillmentQueueNode` of this generation.
+        """
+        tail = self.origin_queue_tail_lookup[node.origin_id]
+        if tail is not None:
+            if tail.generation == self.generation:
+                tail.next = node
+            else:
+                self.shared_next_lookup[tail] = node
+            node.prev = tail
+        if self.origin_queue_lookup[node.origin_id] is None:
+            self.origin_queue_lookup[node.origin_id] = node
+        self.origin_queue_tail_lookup[node.origin_id] = node
+
+    def _dequeue_orders(self, order_ids):
+        """ Remove the nodes of finished orders from the order queues.
+
+        Args:
+            order_ids: The ids of the orders, which are already removed from
+                `queued_orders`.
+        """
+        heads, tails, order_lookup, generation = self.origin_queue_lookup, self.origin_queue_tail_lookup, self.order_lookup, self.generation
+        for order_id in order_ids:
+            for node in order_lookup.pop(order_id):
+                if node.generation != generation:
+                    # a shared node stays in place, and is skipped from now on
+                    if heads[node.origin_id] is node:
+                        heads[node.origin_id] = self._next_queued_node(node)
+                    continue
+                if heads[node.origin_id] is node:
+                    heads[node.origin_id] = node.next
+                if node.prev is not None:
+                    if node.prev.generation == generation:
+                        node.prev.next = node.next
+                    elif node.next is not None:
+                        self.shared_next_lookup[node.prev] = node.next
+                    else:
+                        del self.shared_next_lookup[node.prev]
+                if node.next is None:
+                    tails[node.origin_id] = node.prev
+                else:
+                    node.next.prev = node.prev
+
+    def _next_node(self, node):
+        """ Get the next node in a queue, `None` at the end of the queue.
+        """
+        return node.next if node.next is not None else self.shared_next_lookup.get(node)
+
+    def _next_queued_node(self, node):
+        """ Get the node of the next queued order after a node in its queue,
+            `None` if there is no such order.
+        """
+        node = self._next_node(node)
+        while node is not None and node.order_id not in self.queued_orders:
+            node = self._next_node(node)
+        return node
+
+    def _own_orders(self):
+        """ Copy `queued_orders` and `order_lookup` if they are shared with
+            the other branches of a fork.
+        """
+        if self.queued_orders is self.shared_orders:
+            self.queued_orders = dict(self.queued_orders)
+            self.order_lookup = dict(self.order_lookup)
+
+    def _copy_order(self, customer_order):
+        """ Copy an order of `shared_orders` before its quantity changes.
+        """
+        order = CustomerOrder(customer_order.customer_id, customer_order.product_id, customer_order.quantity, customer_order.order_date, customer_order.order_id)
+        order.fulfillment_origin_ids = customer_order.fulfillment_origin_ids
+        return order
+
+    def _count_due_quantity(self, customer_order, quantity):
+        """ Add a quantity to the due quantity sums of an order's fulfillment
+            origins.
+
+        Args:
+            customer_order: The `CustomerOrder` object.
+            quantity: The quantity to add, negative when the order is
+                fulfilled.
+        """
+        origin_count = len(customer_order.fulfillment_origin_ids)
         for origin_id in customer_order.fulfillment_origin_ids:
-            node = FulfillmentQueueNode(origin_id, customer_order.order_id)
-            if self.origin_queue_lookup[origin_id] is None:
-                self.origin_queue_lookup[origin_id] = node
+            quantity_sums = self.origin_due_quantity_sums.get(origin_id)
+            if quantity_sums is None:
+                quantity_sums = self.origin_due_quantity_sums[origin_id] = {}
+            quantity_sum = quantity_sums.get(origin_count, 0) + quantity
+            if quantity_sum == 0:
+                quantity_sums.pop(origin_count, None)
             else:
-                enqueue_node(self.origin_queue_lookup[origin_id], node)
-            self.order_lookup[customer_order.order_id].append(node)
+                quantity_sums[origin_count] = quantity_sum
+
+    def _count_backlog(self, customer_order, quantity):
+        """ Add a quantity to the backlog totals of an order's customer and
+            product.
+
+        Args:
+            customer_order: The `CustomerOrder` object.
+            quantity: The quantity to add, negative when the order is
+                fulfilled.
+        """
+        if quantity == 0:
+            return
+        self.backlog_quantity += quantity
+        customer_backlog, customer_id = self.customer_backlog_counter, customer_order.customer_id
+        customer_quantity = customer_backlog.get(customer_id, 0) + quantity
+        if customer_quantity == 0:
+            del customer_backlog[customer_id]
+        else:
+            customer_backlog[customer_id] = customer_quantity
+        product_backlog, product_id = self.product_backlog_counter, customer_order.product_id
+        product_quantity = product_backlog.get(product_id, 0) + quantity
+        if product_quantity == 0:
+            del product_backlog[product_id]
+        else:
+            product_backlog[product_id] = product_quantity
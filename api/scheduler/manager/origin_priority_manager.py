@@ -0,0 +1,86 @@
+import heapq
+
+
+class OriginPriorityManager(object):
+    """ A manager object that maintains the fulfillment priority of origins.
+
+    An origin only needs to be planned on a date if it has cached supply and
+    due orders. Planning an origin either consumes all of its cached supply or
+    empties its order queue, so between two plans this condition can only
+    become true for origins whose supply, consumption or due quantity changed.
+    These origins are marked as touched, and only they are ranked by their
+    estimated waiting time when the next plan is made.
+
+    Attributes:
+        origin_rank_lookup: A dictionary that maps fulfillment origin id to the
+            order it was added, which breaks ties between equal waiting times.
+        touched_origin_ids: The set of origin ids that changed since the last
+            ranking.
+    """
+
+    def __init__(self):
+        self.origin_rank_lookup = {}
+        self.touched_origin_ids = set()
+
+    def add_origin(self, origin_id):
+        """ Add a fulfillment origin to the manager.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        if origin_id not in self.origin_rank_lookup:
+            self.origin_rank_lookup[origin_id] = len(self.origin_rank_lookup)
+
+    def fork(self):
+        """ Get an independent copy of the manager.
+        """
+        manager = OriginPriorityManager()
+        manager.origin_rank_lookup = dict(self.origin_rank_lookup)
+        manager.touched_origin_ids = set(self.touched_origin_ids)
+        return manager
+
+    def touch_origin(self, origin_id):
+        """ Mark a fulfillment origin for ranking in the next plan.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        assert origin_id in self.origin_rank_lookup, 'unknown origin'
+        self.touched_origin_ids.add(origin_id)
+
+    def pop_prioritized_origin_ids(self, waiting_time, is_plannable):
+        """ Rank the touched origins and reset the touched set.
+
+        Args:
+            waiting_time: A function that maps an origin id to its estimated
+                waiting time.
+            is_plannable: A function that tells whether an origin id needs to
+                be planned.
+
+        Returns:
+            A list of plannable origin ids, sorted by their estimated waiting
+            time in ascending order. Origins with the same waiting time are
+            sorted by the order they were added.
+        """
+        return [origin_id for _, _, origin_id in self.pop_prioritized_origins(waiting_time, is_plannable)]
+
+    def pop_prioritized_origins(self, waiting_time, is_plannable):
+        """ Rank the touched origins and reset the touched set.
+
+        Args:
+            waiting_time: A function that maps an origin id to its estimated
+                waiting time.
+            is_plannable: A function that tells whether an origin id needs to
+                be planned.
+
+        Returns:
+            A list of `(waiting_time, rank, origin_id)` tuples of the plannable
+            origins in ascending order, see also `pop_prioritized_origin_ids`.
+        """
+        heap = [
+            (waiting_time(origin_id), self.origin_rank_lookup[origin_id], origin_id)
+            for origin_id in self.touched_origin_ids if is_plannable(origin_id)
+        ]
+        self.touched_origin_ids = set()
+        heapq.heapify(heap)
+        return [heapq.heappop(heap) for _ in range(len(heap))]
@@ -2,12 +2,24 @@ class SourcingRuleManager(object):
     """ A manager object that maintains the sourcing rules.
 
     A sourcing rule defines which product that which customer orders could be
-    fulfilled by which site.
+    fulfilled by which site. The rules are indexed by the customer and the
+    product, so that the eligible sites of a demand are looked up in O(1)
+    however many rules the customer has.
+
+    Attributes:
+        rule_lookup: A dictionary that maps `(customer_name, product_name)` to
+            a tuple of the names of the sites that fulfill the demand, in the
+            order they were added.
+        origin_id_lookup: A dictionary that maps `(customer_name,
+            product_name)` to a tuple of the fulfillment origin ids of the
+            sites in `rule_lookup`, for the rules that were added with their
+            origin ids. The tuple is shared by all orders of the demand.
     """
     def __init__(self):
         self.rule_lookup = {}
+        self.origin_id_lookup = {}
 
-    def add_sourcing_rule(self, customer_name, site_name, product_name):
+    def add_sourcing_rule(self, customer_name, site_name, product_name, origin_id=None):
         """ Add a sourcing rule to the manager.
 
         If customer with `customer_name` orders product with `product_name`,
@@ -17,10 +29,19 @@ class SourcingRuleManager(object):
             customer_name: The name of the customer.
             site_name: The name of the site.
             product_name: The name of the product.
+            origin_id: The id of the fulfillment origin of the site and the
+                product, which is cached for `get_fulfillment_origin_ids`.
+                Either pass it for all rules or for none of them.
         """
-        if customer_name not in self.rule_lookup:
-            self.rule_lookup[customer_name] = set()
-        self.rule_lookup[customer_name].add((site_name, product_name))
+        if len(self.rule_lookup) != 0:
+            assert (origin_id is not None) == (len(self.origin_id_lookup) != 0), 'pass the origin ids for all rules or for none of them'
+        demand = (customer_name, product_name)
+        site_names = self.rule_lookup.get(demand, ())
+        if site_name in site_names:
+            return
+        self.rule_lookup[demand] = (*site_names, site_name)
+        if origin_id is not None:
+            self.origin_id_lookup[demand] = (*self.origin_id_lookup.get(demand, ()), origin_id)
 
     def get_fulfillment_sites(self, customer_name, product_name):
         """ Get the fulfillment sites' names given a customer's product demand.
@@ -28,8 +49,37 @@ class SourcingRuleManager(object):
         Args:
             customer_name: The name of the customer.
             product_name: The name of the product.
+
+        Returns:
+            A tuple of the site names in the order they were added.
+        """
+        site_names = self.rule_lookup.get((customer_name, product_name))
+        assert site_names is not None, 'no available fulfillment origin'
+        return site_names
+
+    def get_fulfillment_origin_ids(self, customer_name, product_name):
+        """ Get the cached fulfillment origin ids given a customer's product
+            demand.
+
+        Args:
+            customer_name: The name of the customer.
+            product_name: The name of the product.
+
+        Returns:
+            The tuple of the origin ids of the fulfillment sites, which is the
+            same object for every call until a rule of the demand is added.
+        """
+        assert len(self.origin_id_lookup) != 0 or len(self.rule_lookup) == 0, 'the sourcing rules were added without origin ids'
+        origin_ids = self.origin_id_lookup.get((customer_name, product_name))
+        assert origin_ids is not None, 'no available fulfillment origin'
+        return origin_ids
+
+    def fork(self):
+        """ Get an independent copy of the manager.
+
+        The tuples are immutable, so they are shared with the copy.
         """
-        assert customer_name in self.rule_lookup, 'no available fulfillment origin'
-        fulfillment_sites = [s for s, p in self.rule_lookup[customer_name] if p == product_name]
-        assert len(fulfillment_sites) != 0, 'no available fulfillment origin'
-        return set(fulfillment_sites)
+        manager = SourcingRuleManager()
+        manager.rule_lookup = dict(self.rule_lookup)
+        manager.origin_id_lookup = dict(self.origin_id_lookup)
+        return manager
@@ -1,27 +1,34 @@
-import shortuuid
+import itertools
+
+
+_order_id_counter = itertools.count()
 
 
 class CustomerOrder(object):
     """ A customer's order.
 
     Attributes:
-        customer_name: The name of the customer who issues the order.
-        product_name: The product's name that the order demands.
+        customer_id: The id of the customer who issues the order. The
+            `OrderScheduler` uses the interned id of the customer's name.
+        product_id: The id of the product that the order demands. The
+            `OrderScheduler` uses the interned id of the product's name.
         quantity: The product's quantity that the order demands.
         order_date: The date that the order was issued.
-        fulfillment_origin_ids: The id of the origins that could fulfill this
-            order.
-        order_id: The identifier of the order for external reference. If pass 
-            `None`, this value would be an auto-generated UUID string.
+        fulfillment_origin_ids: A collection of the id of the origins that could
+            fulfill this order. The `OrderScheduler` uses a tuple.
+        order_id: The identifier of the order for external reference. If pass
+            `None`, this value would be an auto-generated sequential integer.
     """
-    
-    def __init__(self, customer_name, product_name, quantity, order_date, order_id=None):
-        self.customer_name = customer_name
-        self.product_name = product_name
+
+    __slots__ = ('customer_id', 'product_id', 'quantity', 'order_date', 'fulfillment_origin_ids', 'order_id')
+
+    def __init__(self, customer_id, product_id, quantity, order_date, order_id=None):
+        self.customer_id = customer_id
+        self.product_id = product_id
         self.quantity = quantity
         self.order_date = order_date
-        self.fulfillment_origin_ids = set()
-        self.order_id = order_id if order_id is not None else shortuuid.uuid()
+        self.fulfillment_origin_ids = ()
+        self.order_id = order_id if order_id is not None else next(_order_id_counter)
 
     def origin_average_quantity(self):
         """ Get the origin average quantity of this order.
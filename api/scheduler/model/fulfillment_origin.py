@@ -1,4 +1,9 @@
-import shortuuid
+import bisect
+import datetime
+import itertools
+
+
+_origin_id_counter = itertools.count()
 
 
 class FulfillmentOrigin(object):
@@ -8,35 +13,81 @@ class FulfillmentOrigin(object):
     sourcing rules and the supply data are given on site-product level.
 
     Attributes:
-        site_name: The site name of the origin.
-        product_name: The product name of the origin.
+        site_id: The id of the site of the origin. The `OrderScheduler` uses
+            the interned id of the site's name.
+        product_id: The id of the product of the origin. The `OrderScheduler`
+            uses the interned id of the product's name.
         origin_id: The identifier of the origin for external reference. If pass
-            `None`, this value would be an auto-generated UUID string.
+            `None`, this value would be an auto-generated sequential integer.
         cached_supply_quantity: The quantity of the cached supply of this origin.
         history_supply_dates: The history dates that this origin have supply.
             A list of `datetime` objects in ascending order.
         history_supply_quantities: The history supply quantities list that this
             origin have supply. The order is identical as `history_supply_dates`.
+        history_supply_prefix_sums: The prefix sums of `history_supply_quantities`,
+            starting with 0, for querying the supply of a date range in O(log n).
+            If the history is trimmed, they start with the quantity supplied
+            before the remaining history instead, see also
+            `trim_supply_history`.
+        total_supply_quantity: The sum of `history_supply_quantities`.
+        first_supply_date: The date of the first supply, `None` if there is no
+            supply yet.
+        future_supply_dates: The dates of the claimed supply plans of this
+            origin that are not supplied yet, in ascending order. See also
+            `index_future_supply`.
+        future_supply_prefix_sums: The prefix sums of the quantities of the
+            future supply plans, starting with 0, for querying the future supply
+            of a date range in O(log n).
     """
 
-    def __init__(self, site_name, product_name, origin_id=None):
-        self.site_name = site_name
-        self.product_name = product_name
-        self.origin_id = origin_id if origin_id is not None else shortuuid.uuid()
+    def __init__(self, site_id, product_id, origin_id=None):
+        self.site_id = site_id
+        self.product_id = product_id
+        self.origin_id = origin_id if origin_id is not None else next(_origin_id_counter)
         self.cached_supply_quantity = 0
         self.history_supply_dates = []
         self.history_supply_quantities = []
+        self.history_supply_prefix_sums = [0]
+        self.total_supply_quantity = 0
+        self.first_supply_date = None
+        self.future_supply_dates = []
+        self.future_supply_prefix_sums = [0]
 
     def add_supply(self, quantity, date):
         """ Declear a product supply of this origin.
 
+        Supplies can only be declared on an ascending order of its date.
+
         Args:
             quantity: The quantity of the supply.
             date: The date of the supply.
         """
+        assert self.first_supply_date is None or date >= self.history_supply_dates[-1], 'please add the supplies in an ascending manner'
+        if self.first_supply_date is None:
+            self.first_supply_date = date
         self.cached_supply_quantity += quantity
+        self.total_supply_quantity += quantity
         self.history_supply_dates.append(date)
         self.history_supply_quantities.append(quantity)
+        self.history_supply_prefix_sums.append(self.total_supply_quantity)
+
+    def trim_supply_history(self, start_date):
+        """ Drop the history supplies before a date.
+
+        The supply totals and the first supply date are kept, so that the
+        average daily supply of the windows that start from `start_date` on is
+        unchanged. The supplies are only dropped once they are at least half
+        of the history, which takes amortized O(1) time per supply.
+
+        Args:
+            start_date: The date of the earliest supply to keep.
+        """
+        drop_count = bisect.bisect_left(self.history_supply_dates, start_date)
+        if drop_count == 0 or drop_count * 2 < len(self.history_supply_dates):
+            return
+        del self.history_supply_dates[:drop_count]
+        del self.history_supply_quantities[:drop_count]
+        del self.history_supply_prefix_sums[:drop_count]
 
     def consume_supply(self, quantity):
         """ Declear a product consumption of this origin.
@@ -47,7 +98,7 @@ class FulfillmentOrigin(object):
         assert quantity <= self.cached_supply_quantity, 'supply consumption quantity greater than cache'
         self.cached_supply_quantity -= quantity
 
-    def average_daily_supply_quantity(self, today):
+    def average_daily_supply_quantity(self, today, window_days=None):
         """ Get the average daily supply quantity from this origin's history
             supply data.
 
@@ -55,11 +106,53 @@ class FulfillmentOrigin(object):
 
         Args:
             today: The end date for fetching the history supply data.
+            window_days: If not `None`, only the supplies of the last
+                `window_days` days are taken into account.
         """
         epsilon = 1e-5      # the return value could be the divider
-        if len(self.history_supply_dates) == 0:
+        if self.first_supply_date is None:
             return epsilon
-        # TODO(canchen.lee@gmail.com): maintain the ascending order of `history_supply_dates`
-        # and `history_supply_quantities`.
-        day_count = (today - self.history_supply_dates[0]).days
-        return max(sum(self.history_supply_quantities) if day_count == 0 else sum(self.history_supply_quantities) / day_count, epsilon)
+        if window_days is None or today - datetime.timedelta(days=window_days) <= self.first_supply_date:
+            start_date, supply_quantity = self.first_supply_date, self.total_supply_quantity
+        else:
+            start_date = today - datetime.timedelta(days=window_days)
+            start_index = bisect.bisect_left(self.history_supply_dates, start_date)
+            supply_quantity = self.total_supply_quantity - self.history_supply_prefix_sums[start_index]
+        day_count = (today - start_date).days
+        return max(supply_quantity if day_count == 0 else supply_quantity / day_count, epsilon)
+
+    def index_future_supply(self, dates, quantities):
+        """ Replace the index of the future supply plans of this origin.
+
+        Args:
+            dates: The dates of the future supply plans in ascending order.
+            quantities: The quantity of each future supply plan.
+        """
+        self.future_supply_dates = [*dates]
+        self.future_supply_prefix_sums = [0, *itertools.accumulate(quantities)]
+
+    def future_supply_quantity(self, start_date, end_date):
+        """ Get the quantity of the future supply plans after the start date
+            until the end date, inclusive.
+
+        Args:
+            start_date: The date that the range starts after, usually today.
+            end_date: The last date of the range.
+        """
+        start_index = bisect.bisect_right(self.future_supply_dates, start_date)
+        end_index = bisect.bisect_right(self.future_supply_dates, end_date, lo=start_index)
+        return self.future_supply_prefix_sums[end_index] - self.future_supply_prefix_sums[start_index]
+
+    def fork(self):
+        """ Get an independent copy of this origin.
+        """
+        origin = FulfillmentOrigin(self.site_id, self.product_id, self.origin_id)
+        origin.cached_supply_quantity = self.cached_supply_quantity
+        origin.history_supply_dates = self.history_supply_dates[:]
+        origin.history_supply_quantities = self.history_supply_quantities[:]
+        origin.history_supply_prefix_sums = self.history_supply_prefix_sums[:]
+        origin.total_supply_quantity = self.total_supply_quantity
+        origin.first_supply_date = self.first_supply_date
+        origin.future_supply_dates = self.future_supply_dates
+        origin.future_supply_prefix_sums = self.future_supply_prefix_sums
+        return origin
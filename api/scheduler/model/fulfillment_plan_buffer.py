@@ -0,0 +1,148 @@
+import array
+
+import numpy as np
+
+from scheduler.utils.interner import Interner
+
+
+class FulfillmentPlanBuffer(object):
+    """ A columnar buffer of fulfillment plans.
+
+    The customer, product and site names are dictionary encoded by interners,
+    which could be the interners of an `OrderScheduler`, so that its plans are
+    appended without resolving the names. The dates are encoded by a table of
+    the unique dates. Each column takes a machine word per plan, instead of a
+    tuple and its references per plan.
+
+    Attributes:
+        customer_interner: The `Interner` of the customer names.
+        site_interner: The `Interner` of the site names.
+        product_interner: The `Interner` of the product names.
+        customer_ids: An `array` of the customer id of each plan.
+        product_ids: An `array` of the product id of each plan.
+        order_date_codes: An `array` of the code of the order date of each
+            plan in `dates`.
+        site_ids: An `array` of the site id of each plan.
+        fulfillment_date_codes: An `array` of the code of the fulfillment date
+            of each plan in `dates`.
+        quantities: A list of the quantity of each plan.
+        dates: The unique dates, indexed by their codes.
+        date_code_lookup: A dictionary that maps the dates to their codes.
+    """
+
+    def __init__(self, customer_interner=None, site_interner=None, product_interner=None):
+        self.customer_interner = customer_interner if customer_interner is not None else Interner()
+        self.site_interner = site_interner if site_interner is not None else Interner()
+        self.product_interner = product_interner if product_interner is not None else Interner()
+        self.customer_ids = array.array('q')
+        self.product_ids = array.array('q')
+        self.order_date_codes = array.array('q')
+        self.site_ids = array.array('q')
+        self.fulfillment_date_codes = array.array('q')
+        self.quantities = []
+        self.dates = []
+        self.date_code_lookup = {}
+
+    def __len__(self):
+        return len(self.quantities)
+
+    def append(self, customer_id, product_id, order_date, site_id, fulfillment_date, quantity):
+        """ Append a fulfillment plan of interned names.
+
+        Args:
+            customer_id: The id of the customer in `customer_interner`.
+            product_id: The id of the product in `product_interner`.
+            order_date: The date of the order.
+            site_id: The id of the site in `site_interner`.
+            fulfillment_date: The ship date of the plan.
+            quantity: The ship quantity of the plan.
+        """
+        self.customer_ids.append(customer_id)
+        self.product_ids.append(product_id)
+        self.order_date_codes.append(self._date_code(order_date))
+        self.site_ids.append(site_id)
+        self.fulfillment_date_codes.append(self._date_code(fulfillment_date))
+        self.quantities.append(quantity)
+
+    def extend(self, fulfillment_plans):
+        """ Append fulfillment plan tuples, see also
+            `OrderScheduler.plan_fulfillment`.
+
+        Args:
+            fulfillment_plans: An iterable of `(customer_name, product_name,
+                order_date, site_name, fulfillment_date, quantity)` tuples.
+        """
+        for customer_name, product_name, order_date, site_name, fulfillment_date, quantity in fulfillment_plans:
+            self.append(
+                self.customer_interner.intern(customer_name),
+                self.product_interner.intern(product_name),
+                order_date,
+                self.site_interner.intern(site_name),
+                fulfillment_date,
+                quantity
+            )
+
+    def rows(self, start=0, stop=None):
+        """ Iterate over the fulfillment plans as tuples of names.
+
+        Args:
+            start: The index of the first plan.
+            stop: The index after the last plan. If `None`, the plans until the
+                end are iterated.
+
+        Returns:
+            An iterator of the fulfillment plan tuples, the same as they are
+            returned by `OrderScheduler.plan_fulfillment`.
+        """
+        stop = len(self) if stop is None else stop
+        customer_names, product_names, site_names = self.customer_interner.names, self.product_interner.names, self.site_interner.names
+        for index in range(start, stop):
+            yield (
+                customer_names[self.customer_ids[index]],
+                product_names[self.product_ids[index]],
+                self.dates[self.order_date_codes[index]],
+                site_names[self.site_ids[index]],
+                self.dates[self.fulfillment_date_codes[index]],
+                self.quantities[index]
+            )
+
+    def columns(self):
+        """ Get the fulfillment plans as NumPy columns.
+
+        Returns:
+            A dictionary that maps `customer`, `product` and `site` to `int64`
+            arrays of their ids in the interners, `order_date` and
+            `fulfillment_date` to `datetime64[us]` arrays, and `quantity` to an
+            array of the quantities.
+        """
+        dates = np.array(self.dates, dtype='datetime64[us]')
+        return {
+            'customer': np.frombuffer(self.customer_ids, dtype=np.int64).copy(),
+            'product': np.frombuffer(self.product_ids, dtype=np.int64).copy(),
+            'order_date': dates[np.frombuffer(self.order_date_codes, dtype=np.int64)],
+            'site': np.frombuffer(self.site_ids, dtype=np.int64).copy(),
+            'fulfillment_date': dates[np.frombuffer(self.fulfillment_date_codes, dtype=np.int64)],
+            'quantity': np.array(self.quantities)
+        }
+
+    def dictionaries(self):
+        """ Get the names of the dictionary encoded columns.
+
+        Returns:
+            A dictionary that maps `customer`, `product` and `site` to the
+            lists of names indexed by their ids.
+        """
+        return {
+            'customer': self.customer_interner.names,
+            'product': self.product_interner.names,
+            'site': self.site_interner.names
+        }
+
+    def _date_code(self, date):
+        """ Get the code of a date, the date is added to `dates` if it is new.
+        """
+        date_code = self.date_code_lookup.get(date)
+        if date_code is None:
+            date_code = self.date_code_lookup[date] = len(self.dates)
+            self.dates.append(date)
+        return date_code
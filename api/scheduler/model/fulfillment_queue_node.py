@@ -4,12 +4,17 @@ class FulfillmentQueueNode(object):
     Attributes:
         origin_id: The id of the fulfillment origin of the queue.
         order_id: The id of the customer order that this node represents.
+        generation: The generation of the `OrderQueueManager` that created the
+            node, see also `OrderQueueManager.fork`.
         next: The next node in the queue.
         prev: The previous node in the queue.
     """
 
-    def __init__(self, origin_id, order_id):
+    __slots__ = ('origin_id', 'order_id', 'generation', 'next', 'prev')
+
+    def __init__(self, origin_id, order_id, generation=0):
         self.origin_id = origin_id
         self.order_id = order_id
+        self.generation = generation
         self.next = None
         self.prev = None
@@ -0,0 +1,63 @@
+PHASES = ['import_order_supply', 'rank_origins', 'peek_order_queue', 'distribute_supply', 'claim_fulfillment']
+
+
+class SchedulerStats(object):
+    """ The statistics of the fulfillment planning of an `OrderScheduler`.
+
+    Attributes:
+        phase_seconds: A dictionary that maps each phase in `PHASES` to its
+            total wall time in seconds.
+        day_count: The number of planned days.
+        origin_count: The number of planned origins summed over the days.
+        plan_row_count: The number of emitted fulfillment plans.
+        daily_stats: A list of the statistics of each planned day, see also
+            `record_day`.
+        daily_callback: A function that gets the statistics of each day once
+            it is planned, or `None`.
+    """
+
+    def __init__(self, daily_callback=None):
+        self.phase_seconds = {phase: 0.0 for phase in PHASES}
+        self.day_count = 0
+        self.origin_count = 0
+        self.plan_row_count = 0
+        self.daily_stats = []
+        self.daily_callback = daily_callback
+
+    def record_day(self, date, phase_seconds, queue_depth, origin_count, plan_row_count):
+        """ Record the statistics of a planned day.
+
+        Args:
+            date: The planned date.
+            phase_seconds: A dictionary that maps the phases to their wall time
+                in seconds on that day.
+            queue_depth: The number of queued orders after the planning.
+            origin_count: The number of planned origins.
+            plan_row_count: The number of emitted fulfillment plans.
+        """
+        for phase, seconds in phase_seconds.items():
+            self.phase_seconds[phase] += seconds
+        self.day_count += 1
+        self.origin_count += origin_count
+        self.plan_row_count += plan_row_count
+        day_stats = {
+            'date': date,
+            'phase_seconds': phase_seconds,
+            'queue_depth': queue_depth,
+            'origin_count': origin_count,
+            'plan_row_count': plan_row_count
+        }
+        self.daily_stats.append(day_stats)
+        if self.daily_callback is not None:
+            self.daily_callback(day_stats)
+
+    def to_dict(self):
+        """ Get the statistics as a dictionary.
+        """
+        return {
+            'phase_seconds': dict(self.phase_seconds),
+            'day_count': self.day_count,
+            'origin_count': self.origin_count,
+            'plan_row_count': self.plan_row_count,
+            'daily_stats': self.daily_stats
+        }
@@ -0,0 +1,63 @@
+import math
+import numbers
+
+
+class WhatIfScenario(object):
+    """ A what-if scenario that changes the pending claims of a scheduler.
+
+    Attributes:
+        name: The name of the scenario.
+        supply_factors: A list of `(site_name, product_name, start_date,
+            end_date, factor)` tuples. The pending supply plans of the site and
+            product between the two dates, inclusive, are scaled by the factor.
+            If the product name is `None`, all products of the site are scaled.
+            The factor applies to the aggregated supply of a date, integer
+            quantities are rounded down.
+        orders: A list of `(customer_name, product_name, quantity, order_date)`
+            tuples of extra orders.
+        supply_plans: A list of `(site_name, product_name, quantity, plan_date)`
+            tuples of extra supply plans.
+    """
+
+    def __init__(self, name, supply_factors=(), orders=(), supply_plans=()):
+        self.name = name
+        self.supply_factors = [*supply_factors]
+        self.orders = [*orders]
+        self.supply_plans = [*supply_plans]
+
+    def apply(self, order_scheduler):
+        """ Apply the changes of this scenario to a scheduler.
+
+        The supply factors only affect the supply plans that are claimed but
+        not planned yet, so they are applied before the extra supply plans.
+
+        Args:
+            order_scheduler: The `OrderScheduler` of the scenario, usually a
+                fork of a common scheduler.
+        """
+        for site_name, product_name, start_date, end_date, factor in self.supply_factors:
+            site_id = order_scheduler.site_interner.id_lookup.get(site_name)
+            product_id = order_scheduler.product_interner.id_lookup.get(product_name)
+            if site_id is None or (product_name is not None and product_id is None):
+                continue
+            supply_plan_pool = order_scheduler.supply_plan_pool
+            for plan_date, supplies in supply_plan_pool.items():
+                if start_date <= plan_date <= end_date:
+                    # replaced instead of changed in place, since the supplies could be shared with other forks
+                    supply_plan_pool[plan_date] = {
+                        origin_key: _scale_quantity(quantity, factor) if origin_key[0] == site_id and (product_name is None or origin_key[1] == product_id) else quantity
+                        for origin_key, quantity in supplies.items()
+                    }
+            order_scheduler.future_supply_index_stale = True
+        for customer_name, product_name, quantity, order_date in self.orders:
+            order_scheduler.claim_order(customer_name, product_name, quantity, order_date)
+        for site_name, product_name, quantity, plan_date in self.supply_plans:
+            order_scheduler.claim_supply_plan(site_name, product_name, quantity, plan_date)
+
+
+def _scale_quantity(quantity, factor):
+    """ Scale a quantity, integer quantities are rounded down.
+    """
+    if isinstance(quantity, numbers.Integral):
+        return math.floor(quantity * factor)
+    return quantity * factor
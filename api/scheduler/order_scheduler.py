@@ -1,12 +1,20 @@
 import datetime
+import heapq
 import math
+import time
 
-from scheduler import config
+import numpy as np
+
+from scheduler import config, snapshot
 from scheduler.model.customer_order import CustomerOrder
+from scheduler.model.fulfillment_plan_buffer import FulfillmentPlanBuffer
+from scheduler.model.scheduler_stats import PHASES, SchedulerStats
 from scheduler.manager.fulfillment_origin_manager import FulfillmentOriginManager
 from scheduler.manager.order_queue_manager import OrderQueueManager
+from scheduler.manager.origin_priority_manager import OriginPriorityManager
 from scheduler.manager.sourcing_rule_manager import SourcingRuleManager
-from scheduler.utils import utils
+from scheduler.utils.interner import Interner
+from scheduler.utils.supply_distribution import distribute_supply_batch
 
 
 class OrderScheduler(object):
@@ -22,28 +30,85 @@ class OrderScheduler(object):
     its history daily supply quantity).
 
     The user could claim the order information and supply plan of future to the
-    cheduler, and get the fulfillment plan of dates in an ascending way.
-    Currently, the scheduler don't use future supply plan and order information
-    for optimization.
+    cheduler, and get the fulfillment plan of dates in an ascending way. By
+    default, the scheduler don't use future supply plan and order information
+    for optimization. In lookahead mode, the claimed supply plans within the
+    lookahead horizon are indexed by origin, and the waiting time of an origin
+    with upcoming supply is estimated on its average daily supply over the
+    horizon instead of its history, which routes the orders with multiple
+    origins to the origins that will be replenished soon.
+
+    The customer, site and product names are interned to dense integer ids, the
+    managers only work with these ids, and the names are resolved when the
+    fulfillment plans are emitted.
 
     Attributes:
+        customer_interner: The `Interner` of the customer names.
+        site_interner: The `Interner` of the site names.
+        product_interner: The `Interner` of the product names.
         fulfillment_origin_manager: The manager object that maintains the
             attributes of fulfillment origins.
         order_queue_manager: The manager object that maintains the order queue.
+        origin_priority_manager: The manager object that ranks the origins
+            that need to be planned.
         sourcing_rule_manager: The manager oejct that manages the sourcing rules.
         current_date: The last date of the fulfillment plan.
-        supply_plan_pool: The dictionary that maps dates to the imported supply
-            plan raw data.
-        order_pool: The dictionary that maps dates to the imported order raw data.
+        supply_plan_pool: The dictionary that maps dates to the claimed supply
+            plans of the date, which are aggregated in a dictionary that maps
+            the interned `(site_id, product_id)` to the total quantity.
+        order_pool: The dictionary that maps dates to the claimed orders of
+            the date, which are aggregated in a dictionary that maps the
+            interned `(customer_id, product_id)` to the total quantity.
+        supply_plan_dates: A heap of the dates in `supply_plan_pool`.
+        order_dates: A heap of the dates in `order_pool`.
+        next_order_id: The id of the next order to be queued.
+        stats: The `SchedulerStats` object of the fulfillment planning, or
+            `None` if the statistics are disabled. See also `enable_stats`.
+        lookahead_days: The number of days of the lookahead horizon, or `None`
+            if the lookahead mode is disabled.
+        bounded_memory: Whether the supply history of the origins is trimmed to
+            what the average daily supply needs, see also
+            `config.BOUNDED_MEMORY`. Together with the finished orders that are
+            always dropped, the memory of a long-running scheduler is
+            proportional to its queued orders and pending claims.
+        future_supply_index_stale: Whether supply plans are claimed since the
+            future supply of the origins was indexed. The index is rebuilt from
+            `supply_plan_pool` on the next planned date in lookahead mode, so
+            claim the supply plans before planning if possible.
+        shared_daily_claims: A dictionary that maps the `id` of the daily
+            claims in the pools at the last `fork` to the claims, which are
+            shared with the other branches, so they are copied before they
+            change. See also `_daily_claims`.
     """
 
-    def __init__(self):
+    def __init__(self, lookahead_days=None, bounded_memory=None):
+        """ Create a scheduler.
+
+        Args:
+            lookahead_days: The number of days of the lookahead horizon. If
+                `None`, `config.LOOKAHEAD_HORIZON_DAYS` is used.
+            bounded_memory: Whether to run in bounded memory. If `None`,
+                `config.BOUNDED_MEMORY` is used.
+        """
+        self.customer_interner = Interner()
+        self.site_interner = Interner()
+        self.product_interner = Interner()
         self.fulfillment_origin_manager = FulfillmentOriginManager()
         self.order_queue_manager = OrderQueueManager()
+        self.origin_priority_manager = OriginPriorityManager()
         self.sourcing_rule_manager = SourcingRuleManager()
         self.current_date = datetime.datetime.min
         self.supply_plan_pool = {}
         self.order_pool = {}
+        self.supply_plan_dates = []
+        self.order_dates = []
+        self.next_order_id = 0
+        self.stats = None
+        self.lookahead_days = lookahead_days if lookahead_days is not None else config.LOOKAHEAD_HORIZON_DAYS
+        assert self.lookahead_days is None or self.lookahead_days > 0, 'lookahead horizon must be positive'
+        self.future_supply_index_stale = True
+        self.bounded_memory = bounded_memory if bounded_memory is not None else config.BOUNDED_MEMORY
+        self.shared_daily_claims = {}
 
     def add_sourcing_rule(self, customer_name, site_name, product_name):
         """ Add a sourcing rule to the scheduler.
@@ -56,9 +121,36 @@ class OrderScheduler(object):
             site_name: The name of the site.
             product_name: The name of the product.
         """
-        self.fulfillment_origin_manager.add_origin(site_name, product_name)
-        self.sourcing_rule_manager.add_sourcing_rule(customer_name, site_name, product_name)
-        self.order_queue_manager.add_origin(self.fulfillment_origin_manager.get_origin_id(site_name, product_name))
+        customer_id = self.customer_interner.intern(customer_name)
+        site_id = self.site_interner.intern(site_name)
+        product_id = self.product_interner.intern(product_name)
+        self.fulfillment_origin_manager.add_origin(site_id, product_id)
+        origin_id = self.fulfillment_origin_manager.get_origin_id(site_id, product_id)
+        self.sourcing_rule_manager.add_sourcing_rule(customer_id, site_id, product_id, origin_id)
+        self.order_queue_manager.add_origin(origin_id)
+        self.origin_priority_manager.add_origin(origin_id)
+
+    def get_origin_id(self, site_name, product_name):
+        """ Get the origin id of a fulfillment origin by its site name and
+            product name.
+
+        Args:
+            site_name: The site name of the fulfillment origin.
+            product_name: The product name of the fulfillment origin.
+        """
+        return self.fulfillment_origin_manager.get_origin_id(
+            self.site_interner.get_id(site_name),
+            self.product_interner.get_id(product_name)
+        )
+
+    def get_origin_names(self, origin_id):
+        """ Get the site name and product name of a fulfillment origin.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        origin = self.fulfillment_origin_manager.get_origin(origin_id)
+        return self.site_interner.get_name(origin.site_id), self.product_interner.get_name(origin.product_id)
 
     def claim_supply_plan(self, site_name, product_name, quantity, plan_date):
         """ Claim a supply plan to the scheduler.
@@ -70,9 +162,10 @@ class OrderScheduler(object):
             plan_date: The date that the planned supply ships.
         """
         assert plan_date > self.current_date, 'you cannot add plan for the past'
-        if plan_date not in self.supply_plan_pool:
-            self.supply_plan_pool[plan_date] = []
-        self.supply_plan_pool[plan_date].append((site_name, product_name, plan_date, quantity))
+        self.future_supply_index_stale = True
+        daily_supplies = self._daily_claims(self.supply_plan_pool, self.supply_plan_dates, plan_date)
+        origin_key = (self.site_interner.intern(site_name), self.product_interner.intern(product_name))
+        daily_supplies[origin_key] = daily_supplies.get(origin_key, 0) + quantity
 
     def claim_order(self, customer_name, product_name, quantity, order_date):
         """ Claim an order to the scheduler.
@@ -84,11 +177,85 @@ class OrderScheduler(object):
             order_date: The date that the order initiates.
         """
         assert order_date > self.current_date, 'you cannot add order in the past'
-        if order_date not in self.order_pool:
-            self.order_pool[order_date] = []
-        self.order_pool[order_date].append((customer_name, product_name, order_date, quantity))
+        daily_orders = self._daily_claims(self.order_pool, self.order_dates, order_date)
+        demand_key = (self.customer_interner.intern(customer_name), self.product_interner.intern(product_name))
+        daily_orders[demand_key] = daily_orders.get(demand_key, 0) + quantity
+
+    def claim_daily_supply_plans(self, plan_date, site_names, product_names, quantities):
+        """ Claim the supply plans of a date to the scheduler in bulk.
 
-    def plan_fulfillment(self, date):
+        The arguments could be lists, NumPy arrays or any other sequences with
+        the same length, the supply plans are claimed in one pass.
+
+        Args:
+            plan_date: The date that the planned supplies ship.
+            site_names: The sites that provide the supplies.
+            product_names: The product names of the supplies.
+            quantities: The product quantities of the supplies.
+        """
+        assert plan_date > self.current_date, 'you cannot add plan for the past'
+        assert len(site_names) == len(product_names) == len(quantities), 'column length mismatch'
+        self.future_supply_index_stale = True
+        self._aggregate_claims(
+            self._daily_claims(self.supply_plan_pool, self.supply_plan_dates, plan_date),
+            map(self.site_interner.intern, site_names),
+            map(self.product_interner.intern, product_names),
+            quantities
+        )
+
+    def claim_daily_orders(self, order_date, customer_names, product_names, quantities):
+        """ Claim the orders of a date to the scheduler in bulk.
+
+        The arguments could be lists, NumPy arrays or any other sequences with
+        the same length, the orders are claimed in one pass.
+
+        Args:
+            order_date: The date that the orders initiate.
+            customer_names: The names of the customers that initiate the orders.
+            product_names: The product names of the orders.
+            quantities: The product quantities of the orders.
+        """
+        assert order_date > self.current_date, 'you cannot add order in the past'
+        assert len(customer_names) == len(product_names) == len(quantities), 'column length mismatch'
+        self._aggregate_claims(
+            self._daily_claims(self.order_pool, self.order_dates, order_date),
+            map(self.customer_interner.intern, customer_names),
+            map(self.product_interner.intern, product_names),
+            quantities
+        )
+
+    def next_claim_date(self):
+        """ Get the earliest date with claimed orders or supply plans that are
+            not planned yet, `None` if there is no such date.
+        """
+        dates = [heap[0] for heap in [self.order_dates, self.supply_plan_dates] if len(heap) != 0]
+        return min(dates) if len(dates) != 0 else None
+
+    def run_until(self, end_date, plan_buffer=None):
+        """ Plan the fulfillment of all dates until `end_date`.
+
+        Only the dates with claimed orders or supply plans are planned, since
+        nothing changes on the other dates. Afterwards, `current_date` is
+        `end_date`, so you could no longer add orders and supply plans before it.
+
+        Args:
+            end_date: The last date to plan, inclusive.
+            plan_buffer: The `FulfillmentPlanBuffer` to append the plans to, see
+                also `plan_fulfillment`.
+
+        Returns:
+            A list of `(date, fulfillment_plans)` tuples of the planned dates in
+            ascending order, see also `plan_fulfillment`.
+        """
+        daily_plans = []
+        date = self.next_claim_date()
+        while date is not None and date <= end_date:
+            daily_plans.append((date, self.plan_fulfillment(date, plan_buffer)))
+            date = self.next_claim_date()
+        self.current_date = max(self.current_date, end_date)
+        return daily_plans
+
+    def plan_fulfillment(self, date, plan_buffer=None):
         """ Get the fulfillment plan of the date.
 
         This method updates the internal state of the scheduler, thus you should
@@ -97,35 +264,355 @@ class OrderScheduler(object):
 
         Args:
             date: The ship date of the fulfillment plan.
+            plan_buffer: A `FulfillmentPlanBuffer` of `create_plan_buffer`. If
+                given, the plans are appended to it instead of being returned
+                as tuples.
 
         Returns:
             A list of tuples. Each tuple represents a fulfillment plan, the
             elements are customer name, product name, order date, site name,
-            ship date, ship quantity.
+            ship date, ship quantity. If `plan_buffer` is given, the `range` of
+            the indices of the plans in the buffer.
+        """
+        if plan_buffer is not None:
+            start = len(plan_buffer)
+            self.plan_origin_fulfillment(date, plan_buffer)
+            return range(start, len(plan_buffer))
+        return [plan for _, _, origin_plans in self.plan_origin_fulfillment(date) for plan in origin_plans]
+
+    def plan_origin_fulfillment(self, date, plan_buffer=None):
+        """ Get the fulfillment plan of the date grouped by origin.
+
+        See also `plan_fulfillment`, the origins are listed in the order they
+        are planned.
+
+        Args:
+            date: The ship date of the fulfillment plan.
+            plan_buffer: The `FulfillmentPlanBuffer` to append the plans to,
+                see also `plan_fulfillment`.
+
+        Returns:
+            A list of `(origin_id, waiting_time, fulfillment_plans)` tuples,
+            where `waiting_time` is the estimated waiting time that the origin
+            is ranked by, and `fulfillment_plans` are the fulfillment plan
+            tuples of the origin, or the `range` of their indices in
+            `plan_buffer`.
         """
+        timed = self.stats is not None
+        if timed:
+            phase_seconds, begin = {phase: 0.0 for phase in PHASES}, time.perf_counter()
         self.current_date = date
-        fulfillment_plans = []
+        origin_fulfillment_plans = []
         self._import_order_supply()
-        available_origin_ids = sorted(
-            self.fulfillment_origin_manager.get_available_origin_ids(),
-            key=lambda x:self.order_queue_manager.get_origin_average_due_quantity(x) / self.fulfillment_origin_manager.get_origin_average_daily_supply_quantity(x, date)
+        if timed:
+            now = time.perf_counter()
+            phase_seconds['import_order_supply'] += now - begin
+            begin = now
+        horizon_end_date = None
+        if self.lookahead_days is not None:
+            if self.future_supply_index_stale:
+                self.fulfillment_origin_manager.index_future_supply(self.supply_plan_pool)
+                self.future_supply_index_stale = False
+            horizon_end_date = date + datetime.timedelta(days=self.lookahead_days)
+        prioritized_origins = self.origin_priority_manager.pop_prioritized_origins(
+            waiting_time=lambda x: self._estimate_waiting_time(x, date, horizon_end_date),
+            is_plannable=self._origin_plannable
         )
-        for origin_id in available_origin_ids:
+        if timed:
+            phase_seconds['rank_origins'] += time.perf_counter() - begin
+        origin_index = 0
+        while origin_index < len(prioritized_origins):
+            if timed:
+                begin = time.perf_counter()
+            origin_batch = self._peek_origin_batch(prioritized_origins, origin_index)
+            origin_index += len(origin_batch)
+            if timed:
+                now = time.perf_counter()
+                phase_seconds['peek_order_queue'] += now - begin
+                begin = now
+            distributions = self._distribute_supply_batch(
+                [[*map(lambda x: x.quantity, queue_top_orders)] for _, _, _, queue_top_orders in origin_batch],
+                [supply_quantity for _, _, supply_quantity, _ in origin_batch]
+            )
+            if timed:
+                now = time.perf_counter()
+                phase_seconds['distribute_supply'] += now - begin
+                begin = now
+            for (waiting_time, origin_id, supply_quantity, queue_top_orders), (supply_quantity_distribution, remain_quantity) in zip(origin_batch, distributions):
+                self.fulfillment_origin_manager.consume_supply(origin_id, supply_quantity - remain_quantity)
+                origin_fulfillment_plans.append((origin_id, waiting_time, self._claim_origin_fulfillment(
+                    date, origin_id, queue_top_orders, supply_quantity_distribution, plan_buffer
+                )))
+            if timed:
+                phase_seconds['claim_fulfillment'] += time.perf_counter() - begin
+        if timed:
+            self.stats.record_day(
+                date=date,
+                phase_seconds=phase_seconds,
+                queue_depth=len(self.order_queue_manager.queued_orders),
+                origin_count=len(prioritized_origins),
+                plan_row_count=sum(len(plans) for _, _, plans in origin_fulfillment_plans)
+            )
+        return origin_fulfillment_plans
+
+    def fork(self):
+        """ Get an independent copy of the scheduler for a what-if scenario.
+
+        The copy is copy-on-write: the queued orders, the queue nodes, the
+        origins and the daily claims of the pools are shared between the
+        branches until either of them changes them, and only the state of the
+        names, the sourcing rules and the ranking is copied right away, so a
+        fork costs far less than the orders that it shares. The statistics are
+        not forked.
+
+        Returns:
+            The forked `OrderScheduler` object, which plans the same way as
+            this one until either of them changes.
+        """
+        order_scheduler = OrderScheduler(self.lookahead_days, self.bounded_memory)
+        order_scheduler.customer_interner = self.customer_interner.fork()
+        order_scheduler.site_interner = self.site_interner.fork()
+        order_scheduler.product_interner = self.product_interner.fork()
+        order_scheduler.fulfillment_origin_manager = self.fulfillment_origin_manager.fork()
+        order_scheduler.order_queue_manager = self.order_queue_manager.fork()
+        order_scheduler.origin_priority_manager = self.origin_priority_manager.fork()
+        order_scheduler.sourcing_rule_manager = self.sourcing_rule_manager.fork()
+        order_scheduler.current_date = self.current_date
+        order_scheduler.supply_plan_pool = dict(self.supply_plan_pool)
+        order_scheduler.order_pool = dict(self.order_pool)
+        self.shared_daily_claims = {id(claims): claims for pool in [self.supply_plan_pool, self.order_pool] for claims in pool.values()}
+        order_scheduler.shared_daily_claims = self.shared_daily_claims
+        order_scheduler.supply_plan_dates = self.supply_plan_dates[:]
+        order_scheduler.order_dates = self.order_dates[:]
+        order_scheduler.next_order_id = self.next_order_id
+        return order_scheduler
+
+    def save_snapshot(self, path):
+        """ Checkpoint the state of the scheduler to a snapshot file.
+
+        The sourcing rules, the order queues, the origin caches and supply
+        history and the pending orders and supply plans are written, see also
+        `scheduler.snapshot`.
+
+        Args:
+            path: The path of the snapshot file.
+        """
+        snapshot.write_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path, mmap_mode='r'):
+        """ Restore a scheduler from a snapshot file.
+
+        Args:
+            path: The path of the snapshot file.
+            mmap_mode: The mode to memory-map the arrays of the file. If `None`,
+                the file is read into memory.
+
+        Returns:
+            The restored `OrderScheduler` object, which plans the same way as
+            the checkpointed one.
+        """
+        order_scheduler = cls()
+        snapshot.read_snapshot(order_scheduler, path, mmap_mode)
+        return order_scheduler
+
+    def enable_stats(self, daily_callback=None):
+        """ Start collecting the statistics of the fulfillment planning.
+
+        The statistics are disabled by default, enabling them replaces the
+        statistics collected so far.
+
+        Args:
+            daily_callback: A function that gets the statistics of each day
+                once it is planned, see also `SchedulerStats.record_day`.
+
+        Returns:
+            The `SchedulerStats` object that collects the statistics.
+        """
+        self.stats = SchedulerStats(daily_callback)
+        return self.stats
+
+    def disable_stats(self):
+        """ Stop collecting the statistics of the fulfillment planning.
+        """
+        self.stats = None
+
+    def backlog_orders(self):
+        """ Get a snapshot of the orders that are not fulfilled yet.
+
+        Returns:
+            A list of `(customer_name, product_name, order_date, quantity)`
+            tuples in the order that the orders were queued, where `quantity`
+            is the remaining quantity.
+        """
+        customer_names, product_names = self.customer_interner.names, self.product_interner.names
+        return [
+            (customer_names[customer_id], product_names[product_id], order_date, quantity)
+            for _, customer_id, product_id, order_date, quantity in self.order_queue_manager.backlog_orders()
+        ]
+
+    def backlog_summary(self):
+        """ Get the summary of the orders that are not fulfilled yet.
+
+        The totals are maintained while the orders are queued and fulfilled,
+        so the summary is read without going through the orders, see also
+        `OrderQueueManager.backlog_summary`.
+
+        Returns:
+            A dictionary of the `order_count` and the remaining `quantity`, and
+            dictionaries that map the customer and product names to their
+            remaining quantity in `customer_quantities` and
+            `product_quantities`.
+        """
+        summary = self.order_queue_manager.backlog_summary()
+        summary['customer_quantities'] = {self.customer_interner.get_name(customer_id): quantity for customer_id, quantity in summary['customer_quantities'].items()}
+        summary['product_quantities'] = {self.product_interner.get_name(product_id): quantity for product_id, quantity in summary['product_quantities'].items()}
+        return summary
+
+    def create_plan_buffer(self):
+        """ Create a columnar buffer for the fulfillment plans of this
+            scheduler.
+
+        Returns:
+            A `FulfillmentPlanBuffer` that shares the interners of this
+            scheduler, see also `plan_fulfillment`.
+        """
+        return FulfillmentPlanBuffer(self.customer_interner, self.site_interner, self.product_interner)
+
+    def _claim_origin_fulfillment(self, date, origin_id, queue_top_orders, supply_quantity_distribution, plan_buffer=None):
+        """ Claim the distributed supply of an origin and emit the plans with
+            positive quantities.
+
+        Args:
+            date: The ship date of the fulfillment plan.
+            origin_id: The id of the fulfillment origin.
+            queue_top_orders: The top orders of the origin that the supply is
+                distributed to.
+            supply_quantity_distribution: The distributed quantity of each
+                order.
+            plan_buffer: The `FulfillmentPlanBuffer` to append the plans to,
+                `None` to return them as tuples.
+
+        Returns:
+            A list of the fulfillment plan tuples, see also `plan_fulfillment`.
+            If `plan_buffer` is given, the `range` of the indices of the
+            appended plans in the buffer.
+        """
+        site_id = self.fulfillment_origin_manager.get_origin(origin_id).site_id
+        self.order_queue_manager.claim_origin_fulfillment(origin_id, [order.order_id for order in queue_top_orders], supply_quantity_distribution)
+        if plan_buffer is None:
+            site_name = self.site_interner.get_name(site_id)
+            fulfillment_plans = [
+                (self.customer_interner.get_name(order.customer_id), self.product_interner.get_name(order.product_id), order.order_date, site_name, date, quantity)
+                for order, quantity in zip(queue_top_orders, supply_quantity_distribution) if quantity > 0
+            ]
+        else:
+            start = len(plan_buffer)
+            for order, quantity in zip(queue_top_orders, supply_quantity_distribution):
+                if quantity > 0:
+                    plan_buffer.append(order.customer_id, order.product_id, order.order_date, site_id, date, quantity)
+            fulfillment_plans = range(start, len(plan_buffer))
+        self._touch_plannable_origin(origin_id)
+        return fulfillment_plans
+
+    def _touch_plannable_origin(self, origin_id):
+        """ Touch a fulfillment origin for ranking if it is plannable.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        if self._origin_plannable(origin_id):
+            self.origin_priority_manager.touch_origin(origin_id)
+
+    def _estimate_waiting_time(self, origin_id, date, horizon_end_date=None):
+        """ Estimate the waiting time of the due orders of a fulfillment
+            origin.
+
+        The waiting time is the average due quantity of the origin divided by
+        its average daily supply. In lookahead mode, the daily supply is
+        averaged over the future supply plans within the horizon, if there are
+        any, which takes two binary searches on the index of the origin.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+            date: The planned date.
+            horizon_end_date: The last date of the lookahead horizon, `None` if
+                the lookahead mode is disabled.
+        """
+        due_quantity = self.order_queue_manager.get_origin_average_due_quantity(origin_id)
+        if horizon_end_date is not None:
+            future_supply_quantity = self.fulfillment_origin_manager.get_origin_future_supply_quantity(origin_id, date, horizon_end_date)
+            if future_supply_quantity > 0:
+                return due_quantity / (future_supply_quantity / self.lookahead_days)
+        return due_quantity / self.fulfillment_origin_manager.get_origin_average_daily_supply_quantity(origin_id, date, config.SUPPLY_HISTORY_WINDOW_DAYS)
+
+    def _origin_plannable(self, origin_id):
+        """ Check whether a fulfillment origin has both cached supply and due
+            orders.
+
+        Args:
+            origin_id: The id of the fulfillment origin.
+        """
+        return self.fulfillment_origin_manager.get_origin_cache_quantity(origin_id) > 0 and self.order_queue_manager.origin_queue_lookup[origin_id] is not None
+
+    def _peek_origin_batch(self, prioritized_origins, origin_index):
+        """ Peek the top orders of the next prioritized origins that could be
+            distributed together.
+
+        The origins are taken in their priority order as long as their top
+        orders are disjoint, so that claiming the fulfillment of an origin does
+        not change the top orders of the others, and distributing them together
+        plans the same as distributing them one by one.
+
+        Args:
+            prioritized_origins: The `(waiting_time, rank, origin_id)` tuples
+                of the day, see also `OriginPriorityManager`.
+            origin_index: The index of the first origin to peek.
+
+        Returns:
+            A non-empty list of `(waiting_time, origin_id, supply_quantity,
+            queue_top_orders)` tuples.
+        """
+        origin_batch, batch_order_ids = [], set()
+        for waiting_time, _, origin_id in prioritized_origins[origin_index:]:
             supply_quantity = self.fulfillment_origin_manager.get_origin_cache_quantity(origin_id)
-            queue_top_orders = self.order_queue_manager.peek_order_queue_content(origin_id,supply_quantity,len(config.SUPPLY_DISTRIBUTION_RATES))
-            supply_quantity_distribution, remain_quantity = self._distribute_supply([*map(lambda x: x.quantity, queue_top_orders)], supply_quantity)
-            self.fulfillment_origin_manager.consume_supply(origin_id, supply_quantity - remain_quantity)
-            for index in range(len(queue_top_orders)):
-                self.order_queue_manager.claim_fulfillment(origin_id, queue_top_orders[index].order_id, supply_quantity_distribution[index])
-                fulfillment_plans.append((
-                    queue_top_orders[index].customer_name,
-                    queue_top_orders[index].product_name,
-                    queue_top_orders[index].order_date,
-                    self.fulfillment_origin_manager.get_origin(origin_id).site_name,
-                    date,
-                    supply_quantity_distribution[index]
-                ))
-        return [*filter(lambda x: x[-1] > 0, fulfillment_plans)]
+            queue_top_orders = self.order_queue_manager.peek_order_queue_content(origin_id, supply_quantity, len(config.SUPPLY_DISTRIBUTION_RATES))
+            order_ids = [order.order_id for order in queue_top_orders]
+            if len(origin_batch) != 0 and not batch_order_ids.isdisjoint(order_ids):
+                break
+            batch_order_ids.update(order_ids)
+            origin_batch.append((waiting_time, origin_id, supply_quantity, queue_top_orders))
+        return origin_batch
+
+    def _distribute_supply_batch(self, order_quantity_lists, supply_quantities):
+        """ Distribute the supplies of multiple origins to their demands.
+
+        The distributions are the same as `_distribute_supply` of each origin,
+        they are computed by `distribute_supply_batch` when there are at least
+        `config.BATCH_DISTRIBUTION_MIN_ORIGINS` origins with integer
+        quantities.
+
+        Args:
+            order_quantity_lists: A list of the demand quantities of the orders
+                of each origin, see also `_distribute_supply`.
+            supply_quantities: A list of the available supply quantity of each
+                origin.
+
+        Returns:
+            A list of the quantity distribution list and remaining supply of
+            each origin.
+        """
+        if len(supply_quantities) >= config.BATCH_DISTRIBUTION_MIN_ORIGINS:
+            column_count = max(map(len, order_quantity_lists))
+            order_quantities = np.array([[*quantities, *[0] * (column_count - len(quantities))] for quantities in order_quantity_lists])
+            supply_quantities_array = np.array(supply_quantities)
+            if order_quantities.dtype.kind == 'i' and supply_quantities_array.dtype.kind == 'i':
+                quantity_distribution, remain_quantities = distribute_supply_batch(order_quantities, supply_quantities_array, config.SUPPLY_DISTRIBUTION_RATES)
+                return [
+                    (distribution[:len(quantities)], remain_quantity)
+                    for distribution, quantities, remain_quantity in zip(quantity_distribution.tolist(), order_quantity_lists, remain_quantities.tolist())
+                ]
+        return [*map(self._distribute_supply, order_quantity_lists, supply_quantities)]
 
     def _distribute_supply(self, order_quantities, supply_quantity):
         """ Distribute a supply to fulfill multiple demands.
@@ -170,40 +657,82 @@ class OrderScheduler(object):
                     remain_quantity -= extra_quantity
             return quantity_distribution, 0
 
+    def _daily_claims(self, pool, pool_dates, date):
+        """ Get the aggregated claims of a date in a pool to change, the date is
+            added to the pool and its heap if it is new, and the claims are
+            copied first if they are shared with the other branches of a fork.
+
+        Args:
+            pool: Either `supply_plan_pool` or `order_pool`.
+            pool_dates: The heap of the dates in `pool`.
+            date: The date of the claims.
+
+        Returns:
+            The dictionary that maps the keys of the claims of the date to
+            their total quantity.
+        """
+        daily_claims = pool.get(date)
+        if daily_claims is None:
+            daily_claims = pool[date] = {}
+            heapq.heappush(pool_dates, date)
+        elif id(daily_claims) in self.shared_daily_claims:
+            daily_claims = pool[date] = dict(daily_claims)
+        return daily_claims
+
+    def _aggregate_claims(self, daily_claims, name_ids_0, name_ids_1, quantities):
+        """ Add the quantities of claims to the aggregated claims of a date.
+
+        Args:
+            daily_claims: The dictionary of `_daily_claims`.
+            name_ids_0: The interned ids of the first key element, the site or
+                the customer.
+            name_ids_1: The interned ids of the product.
+            quantities: The quantities of the claims.
+        """
+        for key, quantity in zip(zip(name_ids_0, name_ids_1), quantities):
+            daily_claims[key] = daily_claims.get(key, 0) + quantity
+
     def _import_order_supply(self):
         """ Import cached supply plan and order data.
 
-        When the scheduler gets supply plan and order claims, the data will be
-        first put into `supply_plan_pool` and `order_pool`. When the `current_date`
-        updates, the scheduler add all previous and current supply plans to
-        origin's cache, and the orders to the order queue.
+        When the scheduler gets supply plan and order claims, their names are
+        interned and their quantities are aggregated into `supply_plan_pool`
+        and `order_pool`, and their dates put into the `supply_plan_dates` and
+        `order_dates` heaps. When the `current_date` updates, the due dates are
+        popped from the heaps, and the scheduler add all previous and current
+        supply plans to origin's cache, and the orders to the order queue, one
+        order per customer and product of a date. The origins that get supply
+        or orders are touched for ranking. In bounded memory, the supply history
+        that the average daily supply no longer needs is dropped.
         """
-        order_dates = sorted([date for date in self.order_pool.keys() if date <= self.current_date])
-        supply_dates = sorted([date for date in self.supply_plan_pool.keys() if date <= self.current_date])
+        supply_dates, order_dates = [], []
+        while len(self.supply_plan_dates) != 0 and self.supply_plan_dates[0] <= self.current_date:
+            supply_dates.append(heapq.heappop(self.supply_plan_dates))
+        while len(self.order_dates) != 0 and self.order_dates[0] <= self.current_date:
+            order_dates.append(heapq.heappop(self.order_dates))
+        history_start_date = None
+        if self.bounded_memory and len(supply_dates) != 0:
+            window_days = config.SUPPLY_HISTORY_WINDOW_DAYS
+            history_start_date = self.current_date - datetime.timedelta(days=window_days) if window_days is not None else self.current_date
         for supply_date in supply_dates:
-            daily_supplies = utils.aggregate_tuples(self.supply_plan_pool[supply_date], [0, 1, 2], 3)
-            for supply in daily_supplies:
-                self.fulfillment_origin_manager.add_supply(
-                    site_name=supply[0],
-                    product_name=supply[1],
-                    quantity=supply[3],
-                    date=supply[2]
-                )
-            self.supply_plan_pool.pop(supply_date, None)
+            for (site_id, product_id), quantity in self.supply_plan_pool.pop(supply_date).items():
+                origin_id = self.fulfillment_origin_manager.add_supply(site_id, product_id, quantity, supply_date)
+                self.origin_priority_manager.touch_origin(origin_id)
+                if history_start_date is not None:
+                    self.fulfillment_origin_manager.trim_supply_history(origin_id, history_start_date)
         for order_date in order_dates:
-            daily_orders = utils.aggregate_tuples(self.order_pool[order_date], [0, 1, 2], 3)
             casted_orders = []
-            for order in daily_orders:
+            for (customer_id, product_id), quantity in self.order_pool.pop(order_date).items():
                 new_order = CustomerOrder(
-                    customer_name=order[0],
-                    product_name=order[1],
-                    quantity=order[3],
-                    order_date=order[2]
+                    customer_id=customer_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    order_date=order_date,
+                    order_id=self.next_order_id
                 )
-                new_order.fulfillment_origin_ids = set([self.fulfillment_origin_manager.get_origin_id(
-                    site_name,
-                    order[1]
-                ) for site_name in self.sourcing_rule_manager.get_fulfillment_sites(order[0], order[1])])
+                self.next_order_id += 1
+                new_order.fulfillment_origin_ids = self.sourcing_rule_manager.get_fulfillment_origin_ids(customer_id, product_id)
                 casted_orders.append(new_order)
+                for origin_id in new_order.fulfillment_origin_ids:
+                    self.origin_priority_manager.touch_origin(origin_id)
             self.order_queue_manager.enqueue_daily_order(casted_orders)
-            self.order_pool.pop(order_date, None)
@@ -0,0 +1,237 @@
+import concurrent.futures
+import heapq
+import os
+
+from scheduler.order_scheduler import OrderScheduler
+
+
+def partition_sourcing_rules(sourcing_rules):
+    """ Partition the sourcing rules into independent components.
+
+    An order of a customer and a product could only be fulfilled by the origins
+    of the same product, thus the sourcing rules form a graph between the
+    `(customer, product)` demands and the `(site, product)` origins. Orders and
+    supplies of different connected components never interact, so each
+    component could be scheduled on its own.
+
+    Args:
+        sourcing_rules: A list of `(customer_name, site_name, product_name)`
+            tuples.
+
+    Returns:
+        A list of the components, each component is a list of sourcing rules.
+        The components are ordered by their first rule, and the rules keep
+        their order within a component.
+    """
+    parent_lookup = {}
+
+    def find(node):
+        root = node
+        while parent_lookup[root] != root:
+            root = parent_lookup[root]
+        while parent_lookup[node] != root:
+            parent_lookup[node], node = root, parent_lookup[node]
+        return root
+
+    for customer_name, site_name, product_name in sourcing_rules:
+        demand_node, origin_node = ('demand', customer_name, product_name), ('origin', site_name, product_name)
+        parent_lookup.setdefault(demand_node, demand_node)
+        parent_lookup.setdefault(origin_node, origin_node)
+        parent_lookup[find(demand_node)] = find(origin_node)
+    components = {}
+    for rule in sourcing_rules:
+        components.setdefault(find(('origin', rule[1], rule[2])), []).append(rule)
+    return [*components.values()]
+
+
+def plan_partitioned_fulfillment(sourcing_rules, daily_orders, daily_supply_plans, max_workers=None, with_backlog=False, lookahead_days=None):
+    """ Plan the fulfillment of independent components in parallel.
+
+    The components of `partition_sourcing_rules` are balanced over
+    `max_workers` processes, each of them runs an `OrderScheduler` for its
+    components. The daily plans are merged by the estimated waiting time and
+    the rank of their origins, so that the result is identical to a single
+    `OrderScheduler` that gets the same sourcing rules, orders and supply
+    plans.
+
+    Args:
+        sourcing_rules: A list of `(customer_name, site_name, product_name)`
+            tuples.
+        daily_orders: A list of `(date, columns)` tuples, where `columns` are
+            the customer names, product names and quantities of the orders on
+            that date.
+        daily_supply_plans: A list of `(date, columns)` tuples, where `columns`
+            are the site names, product names and quantities of the supply
+            plans on that date.
+        max_workers: The number of worker processes. If `None`, the number of
+            CPUs is used. If 1, the components are planned in this process.
+        with_backlog: Whether to return the backlog summary too.
+        lookahead_days: The lookahead horizon of the schedulers, see also
+            `OrderScheduler`.
+
+    Returns:
+        A list of `(date, fulfillment_plans)` tuples in ascending date order,
+        for each date that has orders or supply plans. If `with_backlog`, a
+        tuple of the list and the merged `OrderScheduler.backlog_summary` of
+        the partitions.
+    """
+    max_workers = max_workers if max_workers is not None else os.cpu_count()
+    origin_rank_lookup, component_lookup = {}, {}
+    components = partition_sourcing_rules(sourcing_rules)
+    for component_index, component in enumerate(components):
+        for customer_name, site_name, product_name in component:
+            component_lookup[('demand', customer_name, product_name)] = component_index
+            component_lookup[('origin', site_name, product_name)] = component_index
+    for _, site_name, product_name in sourcing_rules:
+        origin_rank_lookup.setdefault((site_name, product_name), len(origin_rank_lookup))
+    component_orders = _split_daily_columns(daily_orders, component_lookup, 'demand', len(components), 'no available fulfillment origin')
+    component_supply_plans = _split_daily_columns(daily_supply_plans, component_lookup, 'origin', len(components), 'add supply for unknown origin')
+    buckets = _balance_components(components, component_orders, component_supply_plans, max_workers)
+    partitions = [(
+        [rule for index in bucket for rule in components[index]],
+        _merge_daily_columns([component_orders[index] for index in bucket]),
+        _merge_daily_columns([component_supply_plans[index] for index in bucket]),
+        lookahead_days
+    ) for bucket in buckets]
+    if max_workers == 1:
+        partition_plans = [*map(_plan_partition_fulfillment, partitions)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            partition_plans = [*executor.map(_plan_partition_fulfillment, partitions)]
+    daily_origin_plans = {}
+    for daily_plans, _ in partition_plans:
+        for date, origin_plans in daily_plans:
+            daily_origin_plans.setdefault(date, []).extend(origin_plans)
+    dates = sorted(set([date for date, _ in daily_orders]).union(set([date for date, _ in daily_supply_plans])))
+    merged_daily_plans = [(date, [
+        plan
+        for _, _, plans in sorted(
+            daily_origin_plans.get(date, []),
+            key=lambda x: (x[1], origin_rank_lookup[x[0]])
+        )
+        for plan in plans
+    ]) for date in dates]
+    if with_backlog:
+        return merged_daily_plans, _merge_backlog_summaries([backlog_summary for _, backlog_summary in partition_plans])
+    return merged_daily_plans
+
+
+def _split_daily_columns(daily_columns, component_lookup, node_type, component_count, error_message):
+    """ Split the daily columns of orders or supply plans by component.
+
+    Args:
+        daily_columns: A list of `(date, columns)` tuples, where the first two
+            columns are the names that identify the node of the row.
+        component_lookup: A dictionary that maps a node to its component index.
+        node_type: The type of the node, `demand` or `origin`.
+        component_count: The number of components.
+        error_message: The assertion message of a row without component.
+
+    Returns:
+        A list of the daily columns of each component.
+    """
+    component_daily_columns = [[] for _ in range(component_count)]
+    for date, columns in daily_columns:
+        split_columns = {}
+        for row in zip(*columns):
+            component_index = component_lookup.get((node_type, row[0], row[1]))
+            assert component_index is not None, error_message
+            split_columns.setdefault(component_index, []).append(row)
+        for component_index, rows in split_columns.items():
+            component_daily_columns[component_index].append((date, tuple(map(list, zip(*rows)))))
+    return component_daily_columns
+
+
+def _merge_daily_columns(component_daily_columns):
+    """ Merge the daily columns of several components by date.
+
+    Args:
+        component_daily_columns: A list of the daily columns of each
+            component, each of them in ascending date order.
+
+    Returns:
+        The merged daily columns in ascending date order.
+    """
+    merged_daily_columns = []
+    for date, columns in heapq.merge(*component_daily_columns, key=lambda x: x[0]):
+        if len(merged_daily_columns) != 0 and merged_daily_columns[-1][0] == date:
+            for merged_column, column in zip(merged_daily_columns[-1][1], columns):
+                merged_column += column
+        else:
+            merged_daily_columns.append((date, tuple(map(list, columns))))
+    return merged_daily_columns
+
+
+def _merge_backlog_summaries(backlog_summaries):
+    """ Sum up the backlog summaries of the partitions.
+
+    The names are listed partition by partition, not in the order of a single
+    `OrderScheduler`, so the output formats serialize them with sorted keys.
+
+    Args:
+        backlog_summaries: A list of `OrderScheduler.backlog_summary`
+            dictionaries.
+
+    Returns:
+        The merged backlog summary.
+    """
+    merged_summary = {'order_count': 0, 'quantity': 0, 'customer_quantities': {}, 'product_quantities': {}}
+    for backlog_summary in backlog_summaries:
+        merged_summary['order_count'] += backlog_summary['order_count']
+        merged_summary['quantity'] += backlog_summary['quantity']
+        for key in ['customer_quantities', 'product_quantities']:
+            for name, quantity in backlog_summary[key].items():
+                merged_summary[key][name] = merged_summary[key].get(name, 0) + quantity
+    return merged_summary
+
+
+def _balance_components(components, component_orders, component_supply_plans, bucket_count):
+    """ Assign the components to buckets with similar workloads.
+
+    The workload of a component is estimated by its number of sourcing rules,
+    order rows and supply plan rows. The components are assigned to the least
+    loaded bucket, largest first.
+
+    Returns:
+        A list of non-empty buckets, each bucket is an ascending list of
+        component indices.
+    """
+    def workload(index):
+        return len(components[index]) + sum(len(columns[-1]) for _, columns in component_orders[index] + component_supply_plans[index])
+    buckets = [(0, bucket_index, []) for bucket_index in range(bucket_count)]
+    for index in sorted(range(len(components)), key=workload, reverse=True):
+        load, bucket_index, bucket = heapq.heappop(buckets)
+        bucket.append(index)
+        heapq.heappush(buckets, (load + workload(index), bucket_index, bucket))
+    return [sorted(bucket) for _, _, bucket in sorted(buckets, key=lambda x: x[1]) if len(bucket) != 0]
+
+
+def _plan_partition_fulfillment(partition):
+    """ Plan the fulfillment of a partition in an `OrderScheduler`.
+
+    Args:
+        partition: A tuple of the sourcing rules, daily orders, daily supply
+            plans and lookahead horizon of the partition. All of the orders and
+            supply plans are claimed before the dates are planned, like a
+            single `OrderScheduler` of the batch.
+
+    Returns:
+        A tuple of a list of `(date, origin_plans)` tuples, where
+        `origin_plans` is a list of `((site_name, product_name), waiting_time,
+        fulfillment_plans)` tuples, and the backlog summary of the partition.
+    """
+    sourcing_rules, daily_orders, daily_supply_plans, lookahead_days = partition
+    order_scheduler = OrderScheduler(lookahead_days)
+    for customer_name, site_name, product_name in sourcing_rules:
+        order_scheduler.add_sourcing_rule(customer_name, site_name, product_name)
+    for date, columns in daily_orders:
+        order_scheduler.claim_daily_orders(date, *columns)
+    for date, columns in daily_supply_plans:
+        order_scheduler.claim_daily_supply_plans(date, *columns)
+    daily_plans = []
+    for date in sorted(set([date for date, _ in daily_orders]).union(set([date for date, _ in daily_supply_plans]))):
+        daily_plans.append((date, [
+            (order_scheduler.get_origin_names(origin_id), waiting_time, plans)
+            for origin_id, waiting_time, plans in order_scheduler.plan_origin_fulfillment(date)
+        ]))
+    return daily_plans, order_scheduler.backlog_summary()
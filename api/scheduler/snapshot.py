@@ -0,0 +1,320 @@
+""" Snapshots of the `OrderScheduler` state in a compact binary file.
+
+A snapshot file starts with `MAGIC`, the length of a JSON header as a little
+endian 64-bit integer and the header itself. The header holds the names of the
+interners and the scalars of the scheduler, and the dtype, shape and offset of
+each NumPy array that follows. The arrays are aligned to `ALIGNMENT` bytes, so
+they could be memory-mapped without being copied.
+
+The dates are stored with microsecond precision in a table of unique dates, and
+restored as `datetime.datetime` objects. The statistics of the scheduler are
+not part of the snapshot.
+"""
+import gc
+import heapq
+import itertools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from scheduler.model.customer_order import CustomerOrder
+from scheduler.utils.interner import Interner
+
+
+MAGIC = b'ORDSNAP4'
+ALIGNMENT = 64
+
+
+def write_snapshot(order_scheduler, path):
+    """ Write the state of an `OrderScheduler` to a snapshot file.
+
+    Args:
+        order_scheduler: The `OrderScheduler` object.
+        path: The path of the snapshot file.
+    """
+    date_interner = Interner()
+    current_date_code = date_interner.intern(order_scheduler.current_date)
+    queue_current_date_code = date_interner.intern(order_scheduler.order_queue_manager.current_date)
+    origin_manager = order_scheduler.fulfillment_origin_manager
+    queue_manager = order_scheduler.order_queue_manager
+    origins = [*origin_manager.origin_lookup.values()]
+    rules = [
+        (customer_id, site_id, product_id)
+        for (customer_id, product_id), site_ids in order_scheduler.sourcing_rule_manager.rule_lookup.items()
+        for site_id in site_ids
+    ]
+    orders = [*queue_manager.queued_orders.values()]
+    due_quantity_sums = [
+        (origin_id, origin_count, quantity_sum)
+        for origin_id, quantity_sums in queue_manager.origin_due_quantity_sums.items()
+        for origin_count, quantity_sum in quantity_sums.items()
+    ]
+    supply_plans = [(*key, date, quantity) for date, supplies in order_scheduler.supply_plan_pool.items() for key, quantity in supplies.items()]
+    pool_orders = [(*key, date, quantity) for date, orders in order_scheduler.order_pool.items() for key, quantity in orders.items()]
+    arrays = {
+        'origin_ids': np.array([origin.origin_id for origin in origins], dtype=np.int64),
+        'origin_site_ids': np.array([origin.site_id for origin in origins], dtype=np.int64),
+        'origin_product_ids': np.array([origin.product_id for origin in origins], dtype=np.int64),
+        'origin_cached_quantities': _number_array([origin.cached_supply_quantity for origin in origins]),
+        'origin_supply_offsets': _offset_array([len(origin.history_supply_dates) for origin in origins]),
+        'origin_supply_date_codes': _code_array(date_interner, [date for origin in origins for date in origin.history_supply_dates]),
+        'origin_supply_quantities': _number_array([quantity for origin in origins for quantity in origin.history_supply_quantities]),
+        'origin_supply_bases': _number_array([origin.history_supply_prefix_sums[0] for origin in origins]),
+        'origin_first_supply_date_codes': np.array([
+            date_interner.intern(origin.first_supply_date) if origin.first_supply_date is not None else -1 for origin in origins
+        ], dtype=np.int64),
+        'rule_customer_ids': np.array([rule[0] for rule in rules], dtype=np.int64),
+        'rule_site_ids': np.array([rule[1] for rule in rules], dtype=np.int64),
+        'rule_product_ids': np.array([rule[2] for rule in rules], dtype=np.int64),
+        'priority_origin_ids': np.array([*order_scheduler.origin_priority_manager.origin_rank_lookup.keys()], dtype=np.int64),
+        'touched_origin_ids': np.array(sorted(order_scheduler.origin_priority_manager.touched_origin_ids), dtype=np.int64),
+        'queue_origin_ids': np.array([*queue_manager.origin_queue_lookup.keys()], dtype=np.int64),
+        'due_origin_ids': np.array([due[0] for due in due_quantity_sums], dtype=np.int64),
+        'due_origin_counts': np.array([due[1] for due in due_quantity_sums], dtype=np.int64),
+        'due_quantities': _number_array([due[2] for due in due_quantity_sums]),
+        'order_ids': np.array([order.order_id for order in orders], dtype=np.int64),
+        'order_customer_ids': np.array([order.customer_id for order in orders], dtype=np.int64),
+        'order_product_ids': np.array([order.product_id for order in orders], dtype=np.int64),
+        'order_quantities': _number_array([order.quantity for order in orders]),
+        'order_date_codes': _code_array(date_interner, [order.order_date for order in orders]),
+        'order_origin_offsets': _offset_array([len(order.fulfillment_origin_ids) for order in orders]),
+        'order_origin_ids': np.array([origin_id for order in orders for origin_id in order.fulfillment_origin_ids], dtype=np.int64),
+        'supply_pool_site_ids': np.array([plan[0] for plan in supply_plans], dtype=np.int64),
+        'supply_pool_product_ids': np.array([plan[1] for plan in supply_plans], dtype=np.int64),
+        'supply_pool_date_codes': _code_array(date_interner, [plan[2] for plan in supply_plans]),
+        'supply_pool_quantities': _number_array([plan[3] for plan in supply_plans]),
+        'order_pool_customer_ids': np.array([order[0] for order in pool_orders], dtype=np.int64),
+        'order_pool_product_ids': np.array([order[1] for order in pool_orders], dtype=np.int64),
+        'order_pool_date_codes': _code_array(date_interner, [order[2] for order in pool_orders]),
+        'order_pool_quantities': _number_array([order[3] for order in pool_orders])
+    }
+    arrays['date_table'] = np.array(date_interner.names, dtype='datetime64[us]')
+    metadata = {
+        'customer_names': order_scheduler.customer_interner.names,
+        'site_names': order_scheduler.site_interner.names,
+        'product_names': order_scheduler.product_interner.names,
+        'current_date_code': current_date_code,
+        'queue_current_date_code': queue_current_date_code,
+        'next_order_id': order_scheduler.next_order_id,
+        'lookahead_days': order_scheduler.lookahead_days,
+        'bounded_memory': order_scheduler.bounded_memory
+    }
+    _write_arrays(path, metadata, arrays)
+
+
+def read_snapshot(order_scheduler, path, mmap_mode='r'):
+    """ Restore the state of a snapshot file to an empty `OrderScheduler`.
+
+    Args:
+        order_scheduler: A new `OrderScheduler` object.
+        path: The path of the snapshot file.
+        mmap_mode: The mode to memory-map the arrays, see also `numpy.memmap`.
+            If `None`, the arrays are read into memory.
+    """
+    assert order_scheduler.next_order_id == 0 and len(order_scheduler.fulfillment_origin_manager.origin_lookup) == 0, 'please restore to an empty scheduler'
+    metadata, arrays = read_snapshot_arrays(path, mmap_mode)
+    gc_enabled = gc.isenabled()
+    # the restored objects live as long as the scheduler, so there is no point
+    # in collecting while they are created
+    gc.disable()
+    try:
+        _restore_state(order_scheduler, metadata, arrays)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _restore_state(order_scheduler, metadata, arrays):
+    """ Restore the state of the arrays of a snapshot file.
+
+    Args:
+        order_scheduler: A new `OrderScheduler` object.
+        metadata: The metadata dictionary of the snapshot file.
+        arrays: A dictionary that maps the names to the arrays.
+    """
+    dates = arrays['date_table'].astype(object).tolist()
+    for interner, key in [
+        (order_scheduler.customer_interner, 'customer_names'),
+        (order_scheduler.site_interner, 'site_names'),
+        (order_scheduler.product_interner, 'product_names')
+    ]:
+        for name in metadata[key]:
+            interner.intern(name)
+    origin_manager = order_scheduler.fulfillment_origin_manager
+    supply_offsets = arrays['origin_supply_offsets'].tolist()
+    supply_dates = [dates[code] for code in arrays['origin_supply_date_codes'].tolist()]
+    supply_quantities = arrays['origin_supply_quantities'].tolist()
+    for index, (origin_id, site_id, product_id, cached_quantity, supply_base, first_date_code) in enumerate(zip(
+        arrays['origin_ids'].tolist(),
+        arrays['origin_site_ids'].tolist(),
+        arrays['origin_product_ids'].tolist(),
+        arrays['origin_cached_quantities'].tolist(),
+        arrays['origin_supply_bases'].tolist(),
+        arrays['origin_first_supply_date_codes'].tolist()
+    )):
+        origin_manager.add_origin(site_id, product_id, origin_id)
+        origin = origin_manager.get_origin(origin_id)
+        begin, end = supply_offsets[index], supply_offsets[index + 1]
+        origin.history_supply_dates = supply_dates[begin:end]
+        origin.history_supply_quantities = supply_quantities[begin:end]
+        # the prefix sums start with the quantity before a trimmed history
+        origin.history_supply_prefix_sums = [*itertools.accumulate(origin.history_supply_quantities, initial=supply_base)]
+        origin.total_supply_quantity = origin.history_supply_prefix_sums[-1]
+        origin.first_supply_date = dates[first_date_code] if first_date_code >= 0 else None
+        origin.cached_supply_quantity = cached_quantity
+    for customer_id, site_id, product_id in zip(
+        arrays['rule_customer_ids'].tolist(),
+        arrays['rule_site_ids'].tolist(),
+        arrays['rule_product_ids'].tolist()
+    ):
+        order_scheduler.sourcing_rule_manager.add_sourcing_rule(customer_id, site_id, product_id, origin_manager.get_origin_id(site_id, product_id))
+    for origin_id in arrays['priority_origin_ids'].tolist():
+        order_scheduler.origin_priority_manager.add_origin(origin_id)
+    order_scheduler.origin_priority_manager.touched_origin_ids = set(arrays['touched_origin_ids'].tolist())
+    queue_manager = order_scheduler.order_queue_manager
+    for origin_id in arrays['queue_origin_ids'].tolist():
+        queue_manager.add_origin(origin_id)
+    origin_offsets = arrays['order_origin_offsets'].tolist()
+    order_origin_ids = arrays['order_origin_ids'].tolist()
+    customer_orders = []
+    for index, (order_id, customer_id, product_id, quantity, date_code) in enumerate(zip(
+        arrays['order_ids'].tolist(),
+        arrays['order_customer_ids'].tolist(),
+        arrays['order_product_ids'].tolist(),
+        arrays['order_quantities'].tolist(),
+        arrays['order_date_codes'].tolist()
+    )):
+        customer_order = CustomerOrder(customer_id, product_id, quantity, dates[date_code], order_id)
+        customer_order.fulfillment_origin_ids = tuple(order_origin_ids[origin_offsets[index]:origin_offsets[index + 1]])
+        customer_orders.append(customer_order)
+    due_quantity_sums = {}
+    for origin_id, origin_count, quantity_sum in zip(
+        arrays['due_origin_ids'].tolist(),
+        arrays['due_origin_counts'].tolist(),
+        arrays['due_quantities'].tolist()
+    ):
+        due_quantity_sums.setdefault(origin_id, {})[origin_count] = quantity_sum
+    queue_manager.restore_queued_orders(customer_orders, due_quantity_sums)
+    queue_manager.current_date = dates[metadata['queue_current_date_code']]
+    for pool, prefix, name_key in [
+        (order_scheduler.supply_plan_pool, 'supply_pool', 'site'),
+        (order_scheduler.order_pool, 'order_pool', 'customer')
+    ]:
+        for name_id, product_id, date_code, quantity in zip(
+            arrays['{}_{}_ids'.format(prefix, name_key)].tolist(),
+            arrays[prefix + '_product_ids'].tolist(),
+            arrays[prefix + '_date_codes'].tolist(),
+            arrays[prefix + '_quantities'].tolist()
+        ):
+            pool.setdefault(dates[date_code], {})[(name_id, product_id)] = quantity
+    order_scheduler.supply_plan_dates = [*order_scheduler.supply_plan_pool.keys()]
+    order_scheduler.order_dates = [*order_scheduler.order_pool.keys()]
+    heapq.heapify(order_scheduler.supply_plan_dates)
+    heapq.heapify(order_scheduler.order_dates)
+    order_scheduler.current_date = dates[metadata['current_date_code']]
+    order_scheduler.next_order_id = metadata['next_order_id']
+    order_scheduler.lookahead_days = metadata['lookahead_days']
+    order_scheduler.bounded_memory = metadata['bounded_memory']
+
+
+def read_snapshot_arrays(path, mmap_mode='r'):
+    """ Read the header and the arrays of a snapshot file.
+
+    Args:
+        path: The path of the snapshot file.
+        mmap_mode: The mode to memory-map the arrays, see also `numpy.memmap`.
+            If `None`, the arrays are read into memory.
+
+    Returns:
+        A tuple of the metadata dictionary and a dictionary that maps the names
+        to the arrays.
+    """
+    with open(path, 'rb') as snapshot_file:
+        assert snapshot_file.read(len(MAGIC)) == MAGIC, 'not a scheduler snapshot'
+        header_length = int.from_bytes(snapshot_file.read(8), 'little')
+        header = json.loads(snapshot_file.read(header_length).decode('utf-8'))
+        if mmap_mode is None:
+            snapshot_file.seek(0)
+            buffer = np.frombuffer(snapshot_file.read(), dtype=np.uint8)
+    if mmap_mode is not None:
+        buffer = np.memmap(path, dtype=np.uint8, mode=mmap_mode)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        byte_count = dtype.itemsize * int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = buffer[spec['offset']:spec['offset'] + byte_count].view(dtype).reshape(spec['shape'])
+    return header['metadata'], arrays
+
+
+def _write_arrays(path, metadata, arrays):
+    """ Write the metadata and the aligned arrays to a snapshot file.
+
+    The file is written to a temporary file in the same directory, which then
+    replaces the path, so a failed write never leaves a partial snapshot and
+    the readers that memory-mapped a previous snapshot keep reading it.
+
+    Args:
+        path: The path of the snapshot file.
+        metadata: A JSON serializable dictionary.
+        arrays: A dictionary that maps the names to the arrays.
+    """
+    specs, offset = {}, 0
+    for name, array in arrays.items():
+        specs[name] = {'dtype': array.dtype.str, 'shape': [*array.shape], 'offset': offset}
+        offset += _aligned(array.nbytes)
+    # the header length depends on the offsets of the arrays, which follow the
+    # header, so the offsets are shifted until the header fits
+    data_offset = 0
+    while True:
+        header = json.dumps({'metadata': metadata, 'arrays': {
+            name: {**spec, 'offset': spec['offset'] + data_offset} for name, spec in specs.items()
+        }}).encode('utf-8')
+        if len(MAGIC) + 8 + len(header) <= data_offset:
+            break
+        data_offset = _aligned(len(MAGIC) + 8 + len(header))
+    header += b' ' * (data_offset - len(MAGIC) - 8 - len(header))
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.')
+    try:
+        with os.fdopen(descriptor, 'wb') as snapshot_file:
+            snapshot_file.write(MAGIC)
+            snapshot_file.write(len(header).to_bytes(8, 'little'))
+            snapshot_file.write(header)
+            for array in arrays.values():
+                snapshot_file.write(np.ascontiguousarray(array).tobytes())
+                snapshot_file.write(b'\0' * (_aligned(array.nbytes) - array.nbytes))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _aligned(byte_count):
+    """ Round a byte count up to a multiple of `ALIGNMENT`.
+    """
+    return -(-byte_count // ALIGNMENT) * ALIGNMENT
+
+
+def _number_array(values):
+    """ Convert quantities to an `int64` array, or a `float64` array if any of
+        them is not an integer.
+    """
+    array = np.array(values)
+    if len(values) == 0 or array.dtype.kind in 'iub':
+        return array.astype(np.int64)
+    assert array.dtype.kind == 'f', 'unsupported quantity type'
+    return array.astype(np.float64)
+
+
+def _offset_array(lengths):
+    """ Convert the lengths of consecutive slices to an array of their offsets.
+    """
+    return np.array([0, *itertools.accumulate(lengths)], dtype=np.int64)
+
+
+def _code_array(interner, values):
+    """ Intern the values and get their ids as an `int64` array.
+    """
+    return np.array([interner.intern(value) for value in values], dtype=np.int64)
@@ -0,0 +1,55 @@
+class Interner(object):
+    """ A table that maps names to dense integer ids.
+
+    Ids are assigned sequentially from 0 in the order that the names are first
+    interned, so they could be used as list indices.
+
+    Attributes:
+        names: The interned names, indexed by their ids.
+        id_lookup: A dictionary that maps an interned name to its id.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.id_lookup = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """ Get the id of a name, the name is interned if it is unknown.
+
+        Args:
+            name: The name to be interned.
+        """
+        name_id = self.id_lookup.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.id_lookup[name] = name_id
+            self.names.append(name)
+        return name_id
+
+    def fork(self):
+        """ Get an independent copy of the table.
+        """
+        interner = Interner()
+        interner.names = self.names[:]
+        interner.id_lookup = dict(self.id_lookup)
+        return interner
+
+    def get_id(self, name):
+        """ Get the id of an interned name.
+
+        Args:
+            name: The interned name.
+        """
+        assert name in self.id_lookup, 'unknown name'
+        return self.id_lookup[name]
+
+    def get_name(self, name_id):
+        """ Get the name of an id.
+
+        Args:
+            name_id: The id of the interned name.
+        """
+        return self.names[name_id]
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def distribute_supply_batch(order_quantities, supply_quantities, distribution_rates):
+    """ Distribute the supplies of many origins to their top orders at once.
+
+    This is the vectorized form of `OrderScheduler._distribute_supply` for
+    integer quantities, each row is distributed by the same rules:
+
+    - if the row sum fits into the supply, all orders are fulfilled;
+    - if the first order fits, the orders are filled first come first serve,
+      which is the supply minus the quantity before an order, clipped between
+      0 and the order quantity;
+    - otherwise the supply leaks, the i-th order gets the floor of the i-th
+      distribution rate times the supply at most, and the rest is filled first
+      come first serve over the remaining demand of the orders.
+
+    The rates are multiplied with the supplies in `float64` and floored, so
+    that the results are identical to the `math.floor` of the scalar version.
+
+    Args:
+        order_quantities: A 2D integer array, each row has the quantities of
+            the top orders of an origin in their priority order, padded with 0
+            to the same length.
+        supply_quantities: A 1D integer array of the positive supply of each
+            origin.
+        distribution_rates: The distribution rates of the top orders, see also
+            `config.SUPPLY_DISTRIBUTION_RATES`.
+
+    Returns:
+        A tuple of the 2D integer array of the distributed quantities, with the
+        same shape as `order_quantities`, and the 1D integer array of the
+        remaining supplies.
+    """
+    order_quantities = np.asarray(order_quantities, dtype=np.int64)
+    supply_quantities = np.asarray(supply_quantities, dtype=np.int64)
+    assert order_quantities.ndim == 2 and len(order_quantities) == len(supply_quantities), 'shape mismatch'
+    assert np.all(supply_quantities > 0), 'supply quantity must be greater than 0'
+    column_count = order_quantities.shape[1]
+    if column_count == 0:
+        return order_quantities.copy(), supply_quantities.copy()
+    supplies = supply_quantities[:, None]
+    quantity_sums = np.cumsum(order_quantities, axis=1)
+    fcfs_quantities = np.clip(supplies - (quantity_sums - order_quantities), 0, order_quantities)
+    rates = np.zeros(column_count)
+    rate_count = min(len(distribution_rates), column_count)
+    rates[:rate_count] = distribution_rates[:rate_count]
+    base_quantities = np.minimum(order_quantities, np.floor(rates * supplies).astype(np.int64))
+    remain_quantities = supply_quantities - base_quantities.sum(axis=1)
+    deficits = order_quantities - base_quantities
+    extra_quantities = np.clip(remain_quantities[:, None] - (np.cumsum(deficits, axis=1) - deficits), 0, deficits)
+    is_fcfs = order_quantities[:, 0] <= supply_quantities
+    quantity_distribution = np.where(is_fcfs[:, None], fcfs_quantities, base_quantities + extra_quantities)
+    remain_supplies = np.where(quantity_sums[:, -1] <= supply_quantities, supply_quantities - quantity_sums[:, -1], 0)
+    return quantity_distribution, remain_supplies
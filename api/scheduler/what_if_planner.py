@@ -0,0 +1,166 @@
+import concurrent.futures
+import multiprocessing
+import multiprocessing.connection
+import os
+import tempfile
+import threading
+
+from scheduler.model.what_if_scenario import WhatIfScenario
+from scheduler.order_scheduler import OrderScheduler
+
+
+def plan_what_if_scenarios(order_scheduler, scenarios, end_date, max_workers=None):
+    """ Plan what-if scenarios from a common scheduler and compare their KPIs.
+
+    Each scenario, and a `baseline` without changes, runs on its own branch of
+    `order_scheduler` until `end_date`. Where the `fork` start method is
+    available, the branches are planned in forked worker processes, one per
+    scenario, which share the memory of the common scheduler copy-on-write, so
+    only the pages that a scenario changes are copied. Otherwise, or if
+    `max_workers` is 1, the branches are `OrderScheduler.fork` copies planned
+    in this process. A process with other threads, such as a threaded web
+    server, is never forked, since the locks that the other threads hold would
+    stay locked in the forked processes: the scheduler is checkpointed to a
+    snapshot instead, and a single-threaded worker process started by the
+    `forkserver` restores it and forks the branches. The common scheduler is
+    never changed.
+
+    Args:
+        order_scheduler: The common `OrderScheduler`.
+        scenarios: A list of `WhatIfScenario` objects.
+        end_date: The last date to plan, inclusive.
+        max_workers: The number of worker processes. If `None`, the number of
+            CPUs is used.
+
+    Returns:
+        A list of dictionaries of the `baseline` and the scenarios in the given
+        order, with the `name`, the `kpis` of `fulfillment_kpis` and the
+        `kpi_deltas` against the baseline.
+    """
+    assert end_date >= order_scheduler.current_date, 'you cannot plan the past'
+    scenarios = [WhatIfScenario('baseline'), *scenarios]
+    max_workers = max_workers if max_workers is not None else os.cpu_count()
+    if max_workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        kpis = [_plan_scenario(order_scheduler.fork(), scenario, end_date) for scenario in scenarios]
+    elif threading.active_count() == 1:
+        kpis = _plan_forked_scenarios(order_scheduler, scenarios, end_date, max_workers)
+    else:
+        kpis = _plan_scenarios_in_worker(order_scheduler, scenarios, end_date, max_workers)
+    return [{
+        'name': scenario.name,
+        'kpis': scenario_kpis,
+        'kpi_deltas': {key: value - kpis[0][key] for key, value in scenario_kpis.items()}
+    } for scenario, scenario_kpis in zip(scenarios, kpis)]
+
+
+def fulfillment_kpis(order_scheduler, daily_plans):
+    """ Summarize the fulfillment plans of a scheduler.
+
+    Args:
+        order_scheduler: The `OrderScheduler` after planning.
+        daily_plans: A list of `(date, fulfillment_plans)` tuples, see also
+            `OrderScheduler.run_until`.
+
+    Returns:
+        A dictionary of the number of planned days and fulfillment plans, the
+        fulfilled quantity, the average days between the order date and the
+        fulfillment date weighted by quantity, and the number and quantity of
+        the orders that are still queued.
+    """
+    plans = [plan for _, fulfillment_plans in daily_plans for plan in fulfillment_plans]
+    fulfilled_quantity = sum(plan[-1] for plan in plans)
+    waiting_days = sum((plan[4] - plan[2]).days * plan[-1] for plan in plans)
+    queued_orders = order_scheduler.order_queue_manager.queued_orders.values()
+    return {
+        'planned_day_count': len(daily_plans),
+        'fulfillment_plan_count': len(plans),
+        'fulfilled_quantity': fulfilled_quantity,
+        'average_waiting_days': waiting_days / fulfilled_quantity if fulfilled_quantity != 0 else 0,
+        'backlog_order_count': len(queued_orders),
+        'backlog_quantity': sum(order.quantity for order in queued_orders)
+    }
+
+
+def _plan_scenario(order_scheduler, scenario, end_date):
+    """ Apply a scenario to a branch of the scheduler and plan it.
+
+    Returns:
+        The `fulfillment_kpis` of the scenario.
+    """
+    scenario.apply(order_scheduler)
+    return fulfillment_kpis(order_scheduler, order_scheduler.run_until(end_date))
+
+
+def _plan_scenarios_in_worker(order_scheduler, scenarios, end_date, max_workers):
+    """ Plan the scenarios from a snapshot of the scheduler in a worker
+        process started by the `forkserver`, which forks the scenarios.
+
+    Returns:
+        A list of the `fulfillment_kpis` of the scenarios.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'scheduler.snapshot')
+        order_scheduler.save_snapshot(path)
+        context = multiprocessing.get_context('forkserver')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(_plan_snapshot_scenarios, path, scenarios, end_date, max_workers).result()
+
+
+def _plan_snapshot_scenarios(path, scenarios, end_date, max_workers):
+    """ Restore a scheduler from a snapshot in the single-threaded worker
+        process and plan each scenario in a forked process.
+
+    Returns:
+        A list of the `fulfillment_kpis` of the scenarios.
+    """
+    return _plan_forked_scenarios(OrderScheduler.load_snapshot(path, mmap_mode=None), scenarios, end_date, max_workers)
+
+
+def _plan_forked_scenarios(order_scheduler, scenarios, end_date, max_workers):
+    """ Plan each scenario in a forked process, at most `max_workers` at a
+        time.
+
+    The scheduler is inherited by forking rather than pickled, and a process
+    serves a single scenario, so that it could change the inherited scheduler
+    in place.
+
+    Returns:
+        A list of the `fulfillment_kpis` of the scenarios.
+    """
+    context = multiprocessing.get_context('fork')
+    pending_indices, running, kpis, error = [*range(len(scenarios))][::-1], {}, [None] * len(scenarios), None
+    while len(running) != 0 or (len(pending_indices) != 0 and error is None):
+        while len(pending_indices) != 0 and len(running) < max_workers and error is None:
+            index = pending_indices.pop()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_plan_forked_scenario, args=(order_scheduler, scenarios[index], end_date, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[receiver] = (index, process)
+        for receiver in multiprocessing.connection.wait([*running.keys()]):
+            index, process = running.pop(receiver)
+            try:
+                succeeded, result = receiver.recv()
+            except EOFError:
+                succeeded, result = False, RuntimeError('the process of scenario {} exited with code {}'.format(scenarios[index].name, process.exitcode))
+            receiver.close()
+            process.join()
+            if succeeded:
+                kpis[index] = result
+            elif error is None:
+                error = result
+    if error is not None:
+        raise error
+    return kpis
+
+
+def _plan_forked_scenario(order_scheduler, scenario, end_date, sender):
+    """ Plan a scenario on the inherited scheduler of a forked process, and
+        send back whether it succeeded with the KPIs or the exception.
+    """
+    try:
+        result = (True, _plan_scenario(order_scheduler, scenario, end_date))
+    except Exception as exception:
+        result = (False, exception)
+    sender.send(result)
+    sender.close()
@@ -13,20 +13,31 @@ class TestFulfillmentOriginManager(unittest.TestCase):
     def test_add_origin(self):
         sut = FulfillmentOriginManager()
         sut.add_origin('site_1', 'product_1', 'id_1')
-        self.assertEqual(sut.origin_lookup['id_1'].site_name, 'site_1')
+        self.assertEqual(sut.origin_lookup['id_1'].site_id, 'site_1')
         self.assertEqual(sut.site_product_lookup['site_1']['product_1'], 'id_1')
         sut.add_origin('site_1', 'product_1', 'id_2')
         self.assertEqual(len(sut.origin_lookup), 1)
         self.assertEqual(len(sut.site_product_lookup), 1)
         self.assertEqual(sut.get_origin_id('site_1', 'product_1'), 'id_1')
         sut.add_origin('site_1', 'product_2', 'id_2')
-        self.assertEqual(sut.origin_lookup['id_2'].site_name, 'site_1')
+        self.assertEqual(sut.origin_lookup['id_2'].site_id, 'site_1')
         self.assertEqual(sut.site_product_lookup['site_1']['product_2'], 'id_2')
         sut.add_origin('site_2', 'product_1', 'id_3')
-        self.assertEqual(sut.origin_lookup['id_3'].product_name, 'product_1')
+        self.assertEqual(sut.origin_lookup['id_3'].product_id, 'product_1')
         self.assertEqual(sut.site_product_lookup['site_2']['product_1'], 'id_3')
         sut.add_origin('site_3', 'product_1')
-        self.assertEqual(sut.origin_lookup[sut.get_origin_id('site_3', 'product_1')].site_name, 'site_3')
+        self.assertEqual(sut.origin_lookup[sut.get_origin_id('site_3', 'product_1')].site_id, 'site_3')
+        with self.assertRaisesRegex(AssertionError, 'duplicate origin id'):
+            sut.add_origin('site_4', 'product_1', 'id_1')
+
+    def test_add_origin_dense_id(self):
+        sut = FulfillmentOriginManager()
+        sut.add_origin(0, 0)
+        sut.add_origin(0, 1)
+        sut.add_origin(0, 0)
+        sut.add_origin(1, 0)
+        self.assertEqual([*sut.origin_lookup.keys()], [0, 1, 2])
+        self.assertEqual(sut.get_origin_id(1, 0), 2)
 
     def test_get_origin_id(self):
         sut = FulfillmentOriginManager()
@@ -43,7 +54,7 @@ class TestFulfillmentOriginManager(unittest.TestCase):
         sut.add_origin('site_1', 'product_1', 'id_1')
         with self.assertRaisesRegex(AssertionError, 'unknown origin'):
             sut.get_origin('id_2')
-        self.assertEqual(sut.get_origin('id_1').site_name, 'site_1')
+        self.assertEqual(sut.get_origin('id_1').site_id, 'site_1')
 
     def test_get_available_origin_id(self):
         sut = FulfillmentOriginManager()
@@ -70,6 +81,21 @@ class TestFulfillmentOriginManager(unittest.TestCase):
             sut.add_supply('site_1', 'product_1', quantity, date)
             mock_method.assert_called_once_with(quantity, date)
 
+    def test_index_future_supply(self):
+        sut = FulfillmentOriginManager()
+        sut.add_origin('site_1', 'product_1', 'id_1')
+        sut.add_origin('site_2', 'product_1', 'id_2')
+        date_1, date_2 = datetime.datetime(2020, 1, 2), datetime.datetime(2020, 1, 1)
+        sut.index_future_supply({
+            date_1: {('site_1', 'product_1'): 10, ('site_3', 'product_1'): 5},
+            date_2: {('site_1', 'product_1'): 20}
+        })
+        self.assertEqual(sut.get_origin('id_1').future_supply_dates, [date_2, date_1])
+        self.assertEqual(sut.get_origin_future_supply_quantity('id_1', date_2, date_1), 10)
+        self.assertEqual(sut.get_origin_future_supply_quantity('id_2', date_2, date_1), 0)
+        with self.assertRaisesRegex(AssertionError, 'unknown origin'):
+            sut.get_origin_future_supply_quantity('id_3', date_2, date_1)
+
     def test_consume_supply(self):
         sut = FulfillmentOriginManager()
         sut.add_origin('site_1', 'product_1', 'id_1')
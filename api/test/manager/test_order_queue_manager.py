@@ -54,6 +54,38 @@ class TestOrderQueueManager(unittest.TestCase):
         self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_b'))], ['order_b', 'order_c'])
         sut.claim_fulfillment('origin_c', 'order_c', 20)
         self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_a'))], [])
+        self.assertIsNone(sut.origin_queue_tail_lookup['origin_a'])
+        self.assertEqual(sut.origin_queue_tail_lookup['origin_b'].order_id, 'order_b')
+
+    def test_claim_origin_fulfillment(self):
+        sut = self._sut_with_orders()
+        with self.assertRaisesRegex(AssertionError, 'fulfill for unknown order'):
+            sut.claim_origin_fulfillment('origina', ['order_a'], [1])
+        with self.assertRaisesRegex(AssertionError, 'fulfill for unknown order'):
+            sut.claim_origin_fulfillment('origin_b', ['order_b', 'order_b'], [5, 0])
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_c'))], ['order_c'])
+        sut = self._sut_with_orders()
+        sut.claim_origin_fulfillment('origin_b', ['order_b', 'order_a', 'order_c'], [5, 4, 20])
+        self.assertEqual([*sut.queued_orders.keys()], ['order_a'])
+        self.assertEqual([*sut.order_lookup.keys()], ['order_a'])
+        self.assertEqual(sut.queued_orders['order_a'].quantity, 6)
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_a'))], ['order_a'])
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_b'))], ['order_a'])
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_c'))], [])
+        self.assertIsNone(sut.origin_queue_tail_lookup['origin_c'])
+        self.assertEqual(sut.origin_due_quantity_sums, {'origin_a': {2: 6}, 'origin_b': {2: 6}, 'origin_c': {}})
+        self.assertEqual(sut.get_origin_average_due_quantity('origin_a'), 3)
+        self.assertEqual(sut.backlog_summary()['quantity'], 6)
+
+    def test_claim_fulfillment_reuse_tail(self):
+        sut = self._sut_with_orders()
+        sut.claim_fulfillment('origin_a', 'order_c', 20)
+        self.assertEqual(sut.origin_queue_tail_lookup['origin_b'].order_id, 'order_a')
+        order_4 = CustomerOrder('c2', 'p1', 5, datetime.datetime(2020, 1, 3), 'order_d')
+        order_4.fulfillment_origin_ids = ['origin_a', 'origin_b']
+        sut.enqueue_daily_order([order_4])
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_a'))], ['order_a', 'order_d'])
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_b'))], ['order_b', 'order_a', 'order_d'])
 
     def test_peek_order_queue_content(self):
         sut = self._sut_with_orders()
@@ -84,7 +116,25 @@ class TestOrderQueueManager(unittest.TestCase):
         self.assertAlmostEqual(sut.get_origin_average_due_quantity('origin_b'), 5 / 2 + 20 / 3)
         sut.claim_fulfillment('origin_b', 'order_a', 5)
         sut.claim_fulfillment('origin_b', 'order_c', 20)
-        self.assertAlmostEqual(sut.get_origin_average_due_quantity('origin_b'), 0)
+        self.assertEqual(sut.get_origin_average_due_quantity('origin_b'), 0)
+        self.assertEqual(sut.origin_due_quantity_sums['origin_b'], {})
+
+    def test_backlog(self):
+        sut = self._default_sut()
+        self.assertEqual(sut.backlog_orders(), [])
+        self.assertEqual(sut.backlog_summary(), {'order_count': 0, 'quantity': 0, 'customer_quantities': {}, 'product_quantities': {}})
+        sut = self._sut_with_orders()
+        sut.claim_fulfillment('origin_b', 'order_a', 4)
+        sut.claim_fulfillment('origin_c', 'order_b', 5)
+        self.assertEqual(sut.backlog_orders(), [
+            ('order_a', 'c0', 'p1', datetime.datetime(2020, 1, 1), 6),
+            ('order_c', 'c0', 'p1', datetime.datetime(2020, 1, 2), 20)
+        ])
+        self.assertEqual(sut.backlog_summary(), {'order_count': 2, 'quantity': 26, 'customer_quantities': {'c0': 26}, 'product_quantities': {'p1': 26}})
+        self.assertEqual(sut.fork().backlog_summary(), sut.backlog_summary())
+        sut.claim_fulfillment('origin_a', 'order_a', 6)
+        sut.claim_fulfillment('origin_a', 'order_c', 20)
+        self.assertEqual(sut.backlog_summary(), {'order_count': 0, 'quantity': 0, 'customer_quantities': {}, 'product_quantities': {}})
 
     def test__euqueue_order(self):
         sut = self._default_sut()
@@ -92,7 +142,7 @@ class TestOrderQueueManager(unittest.TestCase):
         sut._enqueue_order(order_1)
         self.assertEqual(len(sut.order_lookup['order_a']), 0)
         self.assertEqual(len(sut.queued_orders), 1)
-        self.assertEqual(sut.queued_orders['order_a'].customer_name, 'c0')
+        self.assertEqual(sut.queued_orders['order_a'].customer_id, 'c0')
         order_2 = CustomerOrder('c1', 'p1', 20, datetime.datetime(2020, 1, 2), 'order_b')
         order_2.fulfillment_origin_ids = set(['origin_a', 'origin_b'])
         sut._enqueue_order(order_2)
@@ -105,9 +155,55 @@ class TestOrderQueueManager(unittest.TestCase):
         sut._enqueue_order(order_3)
         self.assertEqual(sut.origin_queue_lookup['origin_b'].next.order_id, 'order_c')
         self.assertEqual(sut.origin_queue_lookup['origin_b'].next.prev.order_id, 'order_b')
+        self.assertEqual(sut.origin_queue_tail_lookup['origin_b'].order_id, 'order_c')
+        self.assertEqual(sut.origin_queue_tail_lookup['origin_a'].order_id, 'order_b')
         with self.assertRaisesRegex(Exception, 'one order can only be added once'):
             sut._enqueue_order(order_1)
 
+    def test_fork(self):
+        sut = self._sut_with_orders()
+        sut.claim_fulfillment('origin_b', 'order_b', 5)
+        forked_manager = sut.fork()
+        self.assertIs(forked_manager.queued_orders['order_a'], sut.queued_orders['order_a'])
+        self.assertEqual(forked_manager.current_date, sut.current_date)
+        self.assertEqual(forked_manager.origin_due_quantity_sums, sut.origin_due_quantity_sums)
+        for origin_id in ['origin_a', 'origin_b', 'origin_c']:
+            self.assertListEqual(
+                [*map(lambda x: x.order_id, forked_manager.order_queue_content(origin_id))],
+                [*map(lambda x: x.order_id, sut.order_queue_content(origin_id))]
+            )
+        forked_manager.claim_fulfillment('origin_a', 'order_a', 10)
+        self.assertEqual(sut.queued_orders['order_a'].quantity, 10)
+        self.assertListEqual([*map(lambda x: x.order_id, sut.order_queue_content('origin_a'))], ['order_a', 'order_c'])
+        self.assertListEqual([*map(lambda x: x.order_id, forked_manager.order_queue_content('origin_b'))], ['order_c'])
+        self.assertEqual(forked_manager.origin_queue_tail_lookup['origin_b'].order_id, 'order_c')
+        self.assertEqual(sut.origin_queue_lookup['origin_a'].next.order_id, 'order_c')
+        with self.assertRaisesRegex(AssertionError, 'please restore to an empty queue'):
+            forked_manager.restore_queued_orders([], {})
+
+    def test_fork_copy_on_write(self):
+        sut = self._sut_with_orders()
+        forked_manager = sut.fork()
+        order_4 = CustomerOrder('c1', 'p1', 7, datetime.datetime(2020, 1, 3), 'order_d')
+        order_4.fulfillment_origin_ids = ['origin_a', 'origin_c']
+        forked_manager.enqueue_daily_order([order_4])
+        forked_manager.claim_fulfillment('origin_c', 'order_c', 20)
+        self.assertIsNone(sut.origin_queue_tail_lookup['origin_c'].next)
+        self.assertListEqual([*map(lambda x: x.order_id, forked_manager.order_queue_content('origin_c'))], ['order_b', 'order_d'])
+        self.assertListEqual([*map(lambda x: x.order_id, forked_manager.peek_order_queue_content('origin_a', 1, 1))], ['order_a'])
+        forked_manager.claim_fulfillment('origin_a', 'order_a', 10)
+        self.assertListEqual([*map(lambda x: x.order_id, forked_manager.peek_order_queue_content('origin_a', 100, 1))], ['order_d'])
+        nested_manager = forked_manager.fork()
+        forked_manager.claim_fulfillment('origin_a', 'order_d', 7)
+        self.assertEqual(len(forked_manager.order_queue_content('origin_c')), 1)
+        self.assertListEqual([*map(lambda x: x.order_id, nested_manager.order_queue_content('origin_c'))], ['order_b', 'order_d'])
+        for origin_id in ['origin_a', 'origin_b', 'origin_c']:
+            self.assertListEqual(
+                [*map(lambda x: x.order_id, sut.order_queue_content(origin_id))],
+                [*map(lambda x: x.order_id, self._sut_with_orders().order_queue_content(origin_id))]
+            )
+        self.assertEqual(sut.queued_orders['order_a'].quantity, 10)
+
     def _default_sut(self):
         sut = OrderQueueManager()
         sut.add_origin('origin_a')
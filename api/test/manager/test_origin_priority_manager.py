@@ -0,0 +1,37 @@
+import unittest
+
+from scheduler.manager.origin_priority_manager import OriginPriorityManager
+
+
+class TestOriginPriorityManager(unittest.TestCase):
+    def test_constructor(self):
+        self.assertIsNotNone(OriginPriorityManager())
+
+    def test_add_origin(self):
+        sut = OriginPriorityManager()
+        sut.add_origin('origin_a')
+        sut.add_origin('origin_b')
+        sut.add_origin('origin_a')
+        self.assertEqual(sut.origin_rank_lookup, {'origin_a': 0, 'origin_b': 1})
+
+    def test_touch_origin(self):
+        sut = OriginPriorityManager()
+        sut.add_origin('origin_a')
+        with self.assertRaisesRegex(AssertionError, 'unknown origin'):
+            sut.touch_origin('origin_b')
+        sut.touch_origin('origin_a')
+        sut.touch_origin('origin_a')
+        self.assertEqual(sut.touched_origin_ids, set(['origin_a']))
+
+    def test_pop_prioritized_origin_ids(self):
+        sut = OriginPriorityManager()
+        for origin_id in ['origin_a', 'origin_b', 'origin_c', 'origin_d']:
+            sut.add_origin(origin_id)
+            sut.touch_origin(origin_id)
+        waiting_times = {'origin_a': 2, 'origin_b': 1, 'origin_c': 2, 'origin_d': 0}
+        self.assertListEqual(
+            sut.pop_prioritized_origin_ids(waiting_times.get, lambda x: x != 'origin_d'),
+            ['origin_b', 'origin_a', 'origin_c']
+        )
+        self.assertEqual(len(sut.touched_origin_ids), 0)
+        self.assertListEqual(sut.pop_prioritized_origin_ids(waiting_times.get, lambda x: True), [])
@@ -13,10 +13,38 @@ class TestSourcingRuleManager(unittest.TestCase):
         sut.add_sourcing_rule('customer_1', 'site_2', 'product_1')
         sut.add_sourcing_rule('customer_2', 'site_1', 'product_1')
         sut.add_sourcing_rule('customer_2', 'site_1', 'product_1')
-        self.assertEqual(len(sut.rule_lookup['customer_2']), 1)
+        self.assertEqual(len(sut.rule_lookup[('customer_2', 'product_1')]), 1)
         with self.assertRaisesRegex(AssertionError, 'no available fulfillment origin'):
             sut.get_fulfillment_sites('customer_3', 'product_1')
         with self.assertRaisesRegex(AssertionError, 'no available fulfillment origin'):
             sut.get_fulfillment_sites('customer_1', 'product_2')
-        self.assertEqual(sut.get_fulfillment_sites('customer_1', 'product_1'), set(['site_1', 'site_2']))
-        self.assertEqual(sut.get_fulfillment_sites('customer_2', 'product_1'), set(['site_1']))
+        self.assertEqual(sut.get_fulfillment_sites('customer_1', 'product_1'), ('site_1', 'site_2'))
+        self.assertEqual(sut.get_fulfillment_sites('customer_2', 'product_1'), ('site_1',))
+
+    def test_get_fulfillment_origin_ids(self):
+        sut = SourcingRuleManager()
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1', 0)
+        sut.add_sourcing_rule('customer_1', 'site_2', 'product_1', 1)
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1', 0)
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_2', 2)
+        with self.assertRaisesRegex(AssertionError, 'no available fulfillment origin'):
+            sut.get_fulfillment_origin_ids('customer_2', 'product_1')
+        self.assertEqual(sut.get_fulfillment_origin_ids('customer_1', 'product_1'), (0, 1))
+        self.assertEqual(sut.get_fulfillment_origin_ids('customer_1', 'product_2'), (2,))
+        self.assertIs(sut.get_fulfillment_origin_ids('customer_1', 'product_1'), sut.get_fulfillment_origin_ids('customer_1', 'product_1'))
+        with self.assertRaisesRegex(AssertionError, 'pass the origin ids for all rules or for none of them'):
+            sut.add_sourcing_rule('customer_2', 'site_1', 'product_1')
+        sut = SourcingRuleManager()
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+        with self.assertRaisesRegex(AssertionError, 'pass the origin ids for all rules or for none of them'):
+            sut.add_sourcing_rule('customer_1', 'site_2', 'product_1', 1)
+        with self.assertRaisesRegex(AssertionError, 'the sourcing rules were added without origin ids'):
+            sut.get_fulfillment_origin_ids('customer_1', 'product_1')
+
+    def test_fork(self):
+        sut = SourcingRuleManager()
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1', 0)
+        forked_manager = sut.fork()
+        forked_manager.add_sourcing_rule('customer_1', 'site_2', 'product_1', 1)
+        self.assertEqual(sut.get_fulfillment_origin_ids('customer_1', 'product_1'), (0,))
+        self.assertEqual(forked_manager.get_fulfillment_origin_ids('customer_1', 'product_1'), (0, 1))
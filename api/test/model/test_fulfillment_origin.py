@@ -15,6 +15,13 @@ class TestFulfillmentOrigin(unittest.TestCase):
         self.assertEqual(sut.cached_supply_quantity, quantity)
         self.assertEqual(sut.history_supply_dates, [date])
         self.assertEqual(sut.history_supply_quantities, [quantity])
+        self.assertEqual(sut.total_supply_quantity, quantity)
+        self.assertEqual(sut.first_supply_date, date)
+        sut.add_supply(quantity, date + datetime.timedelta(days=1))
+        self.assertEqual(sut.history_supply_prefix_sums, [0, quantity, quantity * 2])
+        self.assertEqual(sut.first_supply_date, date)
+        with self.assertRaisesRegex(AssertionError, 'please add the supplies in an ascending manner'):
+            sut.add_supply(quantity, date)
 
     def test_consume_supply(self):
         sut = FulfillmentOrigin('site', 'product')
@@ -34,3 +41,50 @@ class TestFulfillmentOrigin(unittest.TestCase):
         sut.add_supply(quantity, date)
         self.assertAlmostEqual(sut.average_daily_supply_quantity(date), quantity)
         self.assertAlmostEqual(sut.average_daily_supply_quantity(date + datetime.timedelta(days=day_shift)), quantity / day_shift)
+
+    def test_average_daily_supply_quantity_window(self):
+        sut = FulfillmentOrigin('site', 'product')
+        date = datetime.datetime(2020, 1, 1)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(date, 2), 1e-5)
+        sut.add_supply(100, date)
+        sut.add_supply(10, date + datetime.timedelta(days=5))
+        sut.add_supply(20, date + datetime.timedelta(days=8))
+        today = date + datetime.timedelta(days=10)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today), 130 / 10)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 20), 130 / 10)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 10), 130 / 10)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 5), 30 / 5)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 2), 20 / 2)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 1), 1e-5)
+        self.assertAlmostEqual(sut.average_daily_supply_quantity(today, 0), 1e-5)
+
+    def test_trim_supply_history(self):
+        sut = FulfillmentOrigin('site', 'product')
+        date = datetime.datetime(2020, 1, 1)
+        for day in range(10):
+            sut.add_supply(day + 1, date + datetime.timedelta(days=day))
+        today = date + datetime.timedelta(days=10)
+        average_quantities = [sut.average_daily_supply_quantity(today, window_days) for window_days in [None, 3, 4]]
+        sut.trim_supply_history(date + datetime.timedelta(days=4))
+        self.assertEqual(len(sut.history_supply_dates), 10)
+        sut.trim_supply_history(date + datetime.timedelta(days=6))
+        self.assertEqual(sut.history_supply_quantities, [7, 8, 9, 10])
+        self.assertEqual(sut.history_supply_prefix_sums, [21, 28, 36, 45, 55])
+        self.assertEqual(sut.first_supply_date, date)
+        self.assertEqual([sut.average_daily_supply_quantity(today, window_days) for window_days in [None, 3, 4]], average_quantities)
+        self.assertEqual(sut.fork().history_supply_prefix_sums, [21, 28, 36, 45, 55])
+
+    def test_future_supply_quantity(self):
+        sut = FulfillmentOrigin('site', 'product')
+        date = datetime.datetime(2020, 1, 1)
+        self.assertEqual(sut.future_supply_quantity(date, date + datetime.timedelta(days=7)), 0)
+        sut.index_future_supply([date + datetime.timedelta(days=day) for day in [1, 3, 8]], [10, 20, 40])
+        self.assertEqual(sut.future_supply_prefix_sums, [0, 10, 30, 70])
+        self.assertEqual(sut.future_supply_quantity(date, date + datetime.timedelta(days=7)), 30)
+        self.assertEqual(sut.future_supply_quantity(date, date + datetime.timedelta(days=8)), 70)
+        self.assertEqual(sut.future_supply_quantity(date + datetime.timedelta(days=1), date + datetime.timedelta(days=3)), 20)
+        self.assertEqual(sut.future_supply_quantity(date + datetime.timedelta(days=8), date + datetime.timedelta(days=9)), 0)
+        forked_origin = sut.fork()
+        sut.index_future_supply([], [])
+        self.assertEqual(forked_origin.future_supply_quantity(date, date + datetime.timedelta(days=7)), 30)
+        self.assertEqual(sut.future_supply_quantity(date, date + datetime.timedelta(days=7)), 0)
@@ -0,0 +1,45 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from scheduler.model.fulfillment_plan_buffer import FulfillmentPlanBuffer
+from scheduler.utils.interner import Interner
+
+
+class TestFulfillmentPlanBuffer(unittest.TestCase):
+    def test_constructor(self):
+        sut = FulfillmentPlanBuffer()
+        self.assertEqual(len(sut), 0)
+        self.assertEqual([*sut.rows()], [])
+        self.assertEqual(sut.columns()['order_date'].dtype, np.dtype('datetime64[us]'))
+
+    def test_append_rows(self):
+        customer_interner = Interner()
+        customer_interner.intern('customer_1')
+        sut = FulfillmentPlanBuffer(customer_interner=customer_interner)
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        sut.append(0, sut.product_interner.intern('product_1'), date_1, sut.site_interner.intern('site_1'), date_2, 5)
+        sut.extend([('customer_2', 'product_1', date_2, 'site_1', date_2, 2.5)])
+        self.assertEqual(len(sut), 2)
+        self.assertEqual(sut.dates, [date_1, date_2])
+        self.assertEqual([*sut.rows()], [
+            ('customer_1', 'product_1', date_1, 'site_1', date_2, 5),
+            ('customer_2', 'product_1', date_2, 'site_1', date_2, 2.5)
+        ])
+        self.assertEqual([*sut.rows(1)], [('customer_2', 'product_1', date_2, 'site_1', date_2, 2.5)])
+
+    def test_columns(self):
+        sut = FulfillmentPlanBuffer()
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        sut.extend([('customer_1', 'product_1', date_1, 'site_1', date_2, 5), ('customer_2', 'product_1', date_2, 'site_2', date_2, 3)])
+        columns = sut.columns()
+        self.assertEqual(columns['customer'].tolist(), [0, 1])
+        self.assertEqual(columns['product'].tolist(), [0, 0])
+        self.assertEqual(columns['site'].tolist(), [0, 1])
+        self.assertEqual(columns['order_date'].tolist(), [date_1, date_2])
+        self.assertEqual(columns['fulfillment_date'].tolist(), [date_2, date_2])
+        self.assertEqual(columns['quantity'].tolist(), [5, 3])
+        self.assertEqual(sut.dictionaries(), {'customer': ['customer_1', 'customer_2'], 'product': ['product_1'], 'site': ['site_1', 'site_2']})
+        sut.extend([('customer_1', 'product_1', date_1, 'site_1', date_2, 1)])
+        self.assertEqual(len(sut.columns()['customer']), 3)
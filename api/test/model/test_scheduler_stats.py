@@ -0,0 +1,25 @@
+import datetime
+import unittest
+
+from scheduler.model.scheduler_stats import PHASES, SchedulerStats
+
+
+class TestSchedulerStats(unittest.TestCase):
+    def test_constructor(self):
+        sut = SchedulerStats()
+        self.assertEqual(set(sut.phase_seconds.keys()), set(PHASES))
+        self.assertEqual(sut.day_count, 0)
+
+    def test_record_day(self):
+        daily_stats = []
+        sut = SchedulerStats(daily_stats.append)
+        date = datetime.datetime(2020, 1, 1)
+        sut.record_day(date, {'import_order_supply': 1.0, 'rank_origins': 0.5}, 10, 2, 3)
+        sut.record_day(date + datetime.timedelta(days=1), {'import_order_supply': 2.0}, 5, 1, 4)
+        self.assertEqual(sut.phase_seconds['import_order_supply'], 3.0)
+        self.assertEqual(sut.phase_seconds['rank_origins'], 0.5)
+        self.assertEqual(sut.phase_seconds['claim_fulfillment'], 0.0)
+        self.assertEqual((sut.day_count, sut.origin_count, sut.plan_row_count), (2, 3, 7))
+        self.assertEqual(daily_stats, sut.daily_stats)
+        self.assertEqual(daily_stats[0]['queue_depth'], 10)
+        self.assertEqual(sut.to_dict()['daily_stats'][1]['date'], date + datetime.timedelta(days=1))
@@ -0,0 +1,32 @@
+import datetime
+import unittest
+
+from scheduler.model.what_if_scenario import WhatIfScenario
+from scheduler.order_scheduler import OrderScheduler
+
+
+class TestWhatIfScenario(unittest.TestCase):
+    def test_apply(self):
+        order_scheduler = OrderScheduler()
+        order_scheduler.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+        order_scheduler.add_sourcing_rule('customer_1', 'site_1', 'product_2')
+        order_scheduler.add_sourcing_rule('customer_1', 'site_2', 'product_1')
+        date_1, date_2, date_3 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2), datetime.datetime(2020, 1, 3)
+        for date in [date_1, date_2, date_3]:
+            order_scheduler.claim_supply_plan('site_1', 'product_1', 10, date)
+            order_scheduler.claim_supply_plan('site_1', 'product_2', 5.0, date)
+            order_scheduler.claim_supply_plan('site_2', 'product_1', 10, date)
+        sut = WhatIfScenario(
+            'drop',
+            supply_factors=[('site_1', None, date_2, date_3, 0.75), ('site_2', 'product_1', date_1, date_1, 0)],
+            orders=[('customer_1', 'product_2', 3, date_2)],
+            supply_plans=[('site_2', 'product_1', 4, date_2)]
+        )
+        sut.apply(order_scheduler)
+        site_1, site_2 = order_scheduler.site_interner.get_id('site_1'), order_scheduler.site_interner.get_id('site_2')
+        product_1, product_2 = order_scheduler.product_interner.get_id('product_1'), order_scheduler.product_interner.get_id('product_2')
+        self.assertEqual(order_scheduler.supply_plan_pool[date_1], {(site_1, product_1): 10, (site_1, product_2): 5.0, (site_2, product_1): 0})
+        self.assertEqual(order_scheduler.supply_plan_pool[date_2], {(site_1, product_1): 7, (site_1, product_2): 3.75, (site_2, product_1): 14})
+        self.assertEqual(order_scheduler.order_pool[date_2], {(order_scheduler.customer_interner.get_id('customer_1'), product_2): 3})
+        WhatIfScenario('unknown', supply_factors=[('site_3', None, date_1, date_3, 0), ('site_1', 'product_3', date_1, date_3, 0)]).apply(order_scheduler)
+        self.assertEqual(order_scheduler.supply_plan_pool[date_3][(site_1, product_1)], 7)
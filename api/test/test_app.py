@@ -0,0 +1,185 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import app
+from benchmark.workload import generate_workload
+from job_manager import JobManager
+from result_cache import ResultCache
+
+
+def _wait_until_released(progress, path):
+    while os.path.exists(path):
+        time.sleep(0.01)
+
+
+class TestApp(unittest.TestCase):
+    def setUp(self):
+        self.sut = app.app.test_client()
+        order_df, sourcing_rule_df, supply_plan_df = generate_workload(customer_count=6, site_count=3, product_count=3, day_count=12, seed=0)
+        self.uploads = {
+            'orders': order_df.sort_values(by=['date'], kind='stable').to_csv(index=False).encode(),
+            'sourcing_rules': sourcing_rule_df.to_csv(index=False).encode(),
+            'supply_plans': supply_plan_df.sort_values(by=['date'], kind='stable').to_csv(index=False).encode()
+        }
+
+    def test_empty_upload(self):
+        for path in ['/batchfulfillmentplan', '/jobs', '/streamfulfillmentplan']:
+            response = self.sut.post(path, data={
+                'orders': (io.BytesIO(b''), 'orders.csv'),
+                'sourcing_rules': (io.BytesIO(b'customer,site,product\ncustomer_1,site_1,product_1\n'), 'sourcing_rules.csv'),
+                'supply_plans': (io.BytesIO(b'site,product,date,quantity\n'), 'supply_plans.csv')
+            }, content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json['upload'], 'orders')
+            self.assertEqual([error['column'] for error in response.json['errors']], ['customer', 'product', 'date', 'quantity'])
+
+    def test_streamed_fulfillment_plan(self):
+        expected_plans = json.loads(self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data').data)['fulfillment_plans']
+        self.assertGreater(len(expected_plans), 0)
+        with mock.patch.object(app, 'STREAM_CHUNK_SIZE', 2):
+            response = self.sut.post('/streamfulfillmentplan', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([json.loads(line) for line in response.data.decode().splitlines()], expected_plans)
+            response = self.sut.post('/streamfulfillmentplan?format=csv', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(len(response.data.decode().splitlines()), len(expected_plans) + 1)
+
+    def test_streamed_fulfillment_plan_errors(self):
+        header, *rows = self.uploads['orders'].decode().splitlines()
+        unsorted_orders = '\n'.join([header, *rows[:10], rows[-1], *rows[10:-1]]) + '\n'
+        invalid_orders = '\n'.join([header, *rows[:9], rows[9].rsplit(',', 1)[0] + ',x', *rows[10:]]) + '\n'
+        with mock.patch.object(app, 'STREAM_CHUNK_SIZE', 2):
+            response = self.sut.post('/streamfulfillmentplan', data=self._files(orders=unsorted_orders), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(len(response.data.decode().splitlines()), 1)
+            self.assertEqual(json.loads(response.data.decode().splitlines()[-1]), {'error': {'message': 'please sort the uploads by date'}})
+            response = self.sut.post('/streamfulfillmentplan', data=self._files(orders=invalid_orders), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data.decode().splitlines()[-1]), {'error': {
+                'message': 'Unexpected file format',
+                'upload': 'orders',
+                'errors': [{'row': 10, 'column': 'quantity', 'message': 'is not a non-negative integer'}],
+                'error_count': 1
+            }})
+            response = self.sut.post('/streamfulfillmentplan?format=csv', data=self._files(orders=invalid_orders), content_type='multipart/form-data')
+            last_line = response.data.decode().splitlines()[-1]
+            self.assertTrue(last_line.startswith('# error: '))
+            self.assertEqual(json.loads(last_line[len('# error: '):])['upload'], 'orders')
+            response = self.sut.post('/streamfulfillmentplan', data=self._files(orders=header + '\n' + rows[0].rsplit(',', 1)[0] + ',x\n'), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 400)
+
+    def test_partitioned_fulfillment_plan(self):
+        for output_format in app.plan_output.OUTPUT_MIMETYPES:
+            with mock.patch.object(app, 'result_cache', ResultCache(max_memory_bytes=0)):
+                expected_response = self.sut.post('/batchfulfillmentplan?format=' + output_format, data=self._files(), content_type='multipart/form-data')
+                response = self.sut.post('/batchfulfillmentplan?workers=2&format=' + output_format, data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, expected_response.data, output_format)
+
+    def test_output_format_negotiation(self):
+        response = self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data', headers={'Accept': 'image/png'})
+        self.assertEqual(response.status_code, 406)
+        response = self.sut.post('/batchfulfillmentplan?format=png', data=self._files(), content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        response = self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data', headers={'Accept': 'text/csv'})
+        self.assertEqual(response.mimetype, 'text/csv')
+
+    def test_cached_fulfillment_plan(self):
+        with mock.patch.object(app, 'result_cache', ResultCache()):
+            response = self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.sut.get('/resultcache').json['miss_count'], 1)
+            cached_response = self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(cached_response.data, response.data)
+            self.assertEqual(self.sut.get('/resultcache').json['hit_count'], 1)
+            response = self.sut.post('/batchfulfillmentplan?stats=true', data=self._files(), content_type='multipart/form-data')
+            self.assertIn('stats', json.loads(response.data))
+            self.assertEqual({key: value for key, value in self.sut.get('/resultcache').json.items() if key.endswith('_count')}, {
+                'hit_count': 1, 'memory_hit_count': 1, 'disk_hit_count': 0, 'miss_count': 1,
+                'memory_entry_count': 1, 'disk_entry_count': 0
+            })
+            with mock.patch.object(app, 'RESULT_CACHE_VERSION', app.RESULT_CACHE_VERSION + 1):
+                self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(self.sut.get('/resultcache').json['miss_count'], 2)
+
+    def test_fulfillment_plan_job(self):
+        job_manager = JobManager(max_workers=1, max_queued_jobs=1)
+        self.addCleanup(job_manager.shutdown)
+        with mock.patch.object(app, 'job_manager', job_manager):
+            with tempfile.NamedTemporaryFile() as lock_file:
+                job_manager.submit_job(_wait_until_released, lock_file.name)
+                response = self.sut.post('/jobs?format=json', data=self._files(), content_type='multipart/form-data')
+                self.assertEqual(response.status_code, 202)
+                job_id = response.json['job_id']
+                self.assertEqual(response.headers['Location'], '/jobs/' + job_id)
+                self.assertEqual(response.json, {'job_id': job_id, 'status': 'queued', 'planned_day_count': 0, 'total_day_count': None, 'error': None})
+                self.assertEqual(self.sut.get('/jobs/' + job_id + '/result').status_code, 409)
+                self.assertEqual(self.sut.post('/jobs', data=self._files(), content_type='multipart/form-data').status_code, 429)
+            while self.sut.get('/jobs/' + job_id).json['status'] != 'succeeded':
+                time.sleep(0.01)
+            response = self.sut.get('/jobs/' + job_id)
+            self.assertGreater(response.json['total_day_count'], 0)
+            self.assertEqual(response.json['planned_day_count'], response.json['total_day_count'])
+            response = self.sut.get('/jobs/' + job_id + '/result')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/json')
+            expected_response = self.sut.post('/batchfulfillmentplan', data=self._files(), content_type='multipart/form-data')
+            self.assertEqual(json.loads(response.data), json.loads(expected_response.data))
+            self.assertEqual(self.sut.delete('/jobs/' + job_id).status_code, 204)
+            for response in [self.sut.get('/jobs/' + job_id), self.sut.get('/jobs/' + job_id + '/result'), self.sut.delete('/jobs/' + job_id)]:
+                self.assertEqual(response.status_code, 404)
+
+    def test_cached_partitioned_fulfillment_plan(self):
+        for output_format in app.plan_output.OUTPUT_MIMETYPES:
+            with mock.patch.object(app, 'result_cache', ResultCache(max_memory_bytes=0)):
+                expected_response = self.sut.post('/batchfulfillmentplan?format=' + output_format, data=self._files(), content_type='multipart/form-data')
+            for paths in [['?workers=2&', '?'], ['?', '?workers=2&']]:
+                with mock.patch.object(app, 'result_cache', ResultCache()):
+                    for path in paths:
+                        response = self.sut.post('/batchfulfillmentplan' + path + 'format=' + output_format, data=self._files(), content_type='multipart/form-data')
+                        self.assertEqual(response.data, expected_response.data, output_format)
+                    self.assertEqual(self.sut.get('/resultcache').json['hit_count'], 1)
+
+    def test_what_if_scenario_errors(self):
+        scenario_id = self.sut.post('/scenarios', data={'sourcing_rules': (io.BytesIO(self.uploads['sourcing_rules']), 'sourcing_rules.csv')}, content_type='multipart/form-data').json['scenario_id']
+        response = self.sut.post('/scenarios/{}/claims'.format(scenario_id), json={'orders': {'customer': 'customer_1'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'Unexpected orders rows', response.data)
+        response = self.sut.post('/scenarios/{}/claims?until=2020-01-02'.format(scenario_id), json={'orders': [{'customer': 'customer_0', 'product': 'product_1', 'date': '2020-01-01', 'quantity': 5}]})
+        self.assertEqual(response.status_code, 200)
+        path = '/scenarios/{}/whatif?until=2020-01-05&workers=1'.format(scenario_id)
+        supply_factor = {'site': 'site_0', 'start_date': '2020-01-03', 'end_date': '2020-01-04', 'factor': 0.5}
+        self.assertEqual(self.sut.post(path, json={'scenarios': [{'name': 'drop', 'supply_factors': [supply_factor]}]}).status_code, 200)
+        response = self.sut.post(path, json={'scenarios': [{'name': 'drop', 'supply_factors': [
+            {**supply_factor, 'factor': -1}, {'start_date': 'x', 'end_date': '2020-01-04', 'factor': float('nan')}, {**supply_factor, 'factor': float('inf')}
+        ]}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['upload'], 'scenarios[0].supply_factors')
+        self.assertEqual([(error['row'], error['column'], error['message']) for error in response.json['errors']], [
+            (1, 'factor', 'is not a finite non-negative number'),
+            (2, 'site', 'is missing'),
+            (2, 'start_date', 'is not a date'),
+            (2, 'factor', 'is not a finite non-negative number'),
+            (3, 'factor', 'is not a finite non-negative number')
+        ])
+        response = self.sut.post(path, json={'scenarios': [{'name': 'rush'}, {'name': 'rush', 'orders': [{'customer': 'customer_0', 'product': 'product_1', 'date': '2020-01-04', 'quantity': -1}]}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['upload'], 'scenarios[1].orders')
+        self.assertEqual(response.json['errors'], [{'row': 1, 'column': 'quantity', 'message': 'is not a non-negative integer'}])
+        for body in [{'scenarios': [{'supply_factors': []}]}, {'scenarios': ['drop']}]:
+            response = self.sut.post(path, json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(b'Unexpected scenario name', response.data)
+        self.assertEqual(self.sut.post(path, json={'scenarios': {'name': 'drop'}}).status_code, 400)
+        self.assertEqual(self.sut.post(path, json={'scenarios': [{'name': 'drop', 'supply_plans': 'x'}]}).status_code, 400)
+        self.sut.delete('/scenarios/{}'.format(scenario_id))
+
+    def _files(self, **uploads):
+        return {
+            key: (io.BytesIO(uploads[key].encode() if key in uploads else content), key + '.csv')
+            for key, content in self.uploads.items()
+        }
@@ -0,0 +1,95 @@
+import datetime
+import io
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import ingestion
+from ingestion import UploadError, iter_upload_chunks, normalize_upload, read_upload
+
+
+class TestIngestion(unittest.TestCase):
+    def test_read_upload(self):
+        content = b'quantity,site,product,date\n2000,1206,P001,1-Jul-19\n10,1207,P002,2019-07-02\n5,1206,P002,2019-07-03 00:00:00\n'
+        for pyarrow in [ingestion.pyarrow, None]:
+            with mock.patch.object(ingestion, 'pyarrow', pyarrow):
+                sut = read_upload(io.BytesIO(content), 'supply_plans')
+            self.assertEqual([*sut.columns], ['site', 'product', 'date', 'quantity'])
+            self.assertIsInstance(sut['site'].dtype, pd.CategoricalDtype)
+            self.assertEqual(sut['site'].tolist(), ['1206', '1207', '1206'])
+            self.assertEqual(sut['date'].tolist(), [datetime.datetime(2019, 7, 1), datetime.datetime(2019, 7, 2), datetime.datetime(2019, 7, 3)])
+            self.assertEqual(str(sut['date'].dtype), 'datetime64[ns]')
+            self.assertEqual(sut['quantity'].tolist(), [2000, 10, 5])
+            self.assertEqual(str(sut['quantity'].dtype), 'int64')
+
+    def test_read_upload_errors(self):
+        content = b'site,product,date,quantity\n1206,,1-Jul-19,20.5\n1207,P002,2019-13-02,x\n,P003,2019-01-01,-1\n1208,P004,2019-01-01,3.0\n'
+        for pyarrow in [ingestion.pyarrow, None]:
+            with mock.patch.object(ingestion, 'pyarrow', pyarrow):
+                with self.assertRaises(UploadError) as context:
+                    read_upload(io.BytesIO(content), 'supply_plans')
+            self.assertEqual(context.exception.to_dict(), {'upload': 'supply_plans', 'error_count': 6, 'errors': [
+                {'row': 1, 'column': 'product', 'message': 'is missing'},
+                {'row': 1, 'column': 'quantity', 'message': 'is not a non-negative integer'},
+                {'row': 2, 'column': 'date', 'message': 'is not a date in a known format'},
+                {'row': 2, 'column': 'quantity', 'message': 'is not a non-negative integer'},
+                {'row': 3, 'column': 'site', 'message': 'is missing'},
+                {'row': 3, 'column': 'quantity', 'message': 'is not a non-negative integer'}
+            ]})
+        with self.assertRaises(UploadError) as context:
+            read_upload(io.BytesIO(b'customer,site,region\na,b,c\n'), 'sourcing_rules')
+        self.assertEqual(context.exception.errors, [
+            {'row': None, 'column': 'product', 'message': 'is missing'},
+            {'row': None, 'column': 'region', 'message': 'is unexpected'}
+        ])
+
+    def test_read_upload_empty(self):
+        missing_errors = [{'row': None, 'column': column, 'message': 'is missing'} for column in ['customer', 'site', 'product']]
+        for pyarrow in [ingestion.pyarrow, None]:
+            with mock.patch.object(ingestion, 'pyarrow', pyarrow):
+                for content in [b'', b'\n']:
+                    with self.assertRaises(UploadError) as context:
+                        read_upload(io.BytesIO(content), 'sourcing_rules')
+                    self.assertEqual(context.exception.errors, missing_errors)
+                for content in [b'customer,site,product\na,b,c,d\n', b'customer,site,product\na,b,c\nd,e,f,g\n']:
+                    with self.assertRaises(UploadError) as context:
+                        read_upload(io.BytesIO(content), 'sourcing_rules')
+                    self.assertEqual(context.exception.errors[0]['column'], None)
+                    self.assertRegex(context.exception.errors[0]['message'], '^is not valid CSV')
+        with self.assertRaises(UploadError) as context:
+            [*iter_upload_chunks(io.BytesIO(b''), 'sourcing_rules', 2)]
+        self.assertEqual(context.exception.errors, missing_errors)
+
+    def test_read_upload_overflow(self):
+        content = b'site,product,date,quantity\ns,p,2020-01-01,9223372036854775807\ns,p,2020-01-01,99999999999999999999\ns,p,2020-01-01,9007199254740993\n'
+        for pyarrow in [ingestion.pyarrow, None]:
+            with mock.patch.object(ingestion, 'pyarrow', pyarrow):
+                with self.assertRaises(UploadError) as context:
+                    read_upload(io.BytesIO(content), 'supply_plans')
+                self.assertEqual(context.exception.errors, [{'row': 2, 'column': 'quantity', 'message': 'is not a non-negative integer'}])
+                sut = read_upload(io.BytesIO(content.replace(b'99999999999999999999', b'1')), 'supply_plans')
+            self.assertEqual(sut['quantity'].tolist(), [2 ** 63 - 1, 1, 2 ** 53 + 1])
+        df = pd.DataFrame({'site': ['s'] * 3, 'product': ['p'] * 3, 'date': ['2020-01-01'] * 3, 'quantity': [2 ** 53 + 1, 10 ** 20, '9223372036854775808']})
+        with self.assertRaises(UploadError) as context:
+            normalize_upload(df, 'supply_plans')
+        self.assertEqual([error['row'] for error in context.exception.errors], [2, 3])
+        self.assertEqual(normalize_upload(df.iloc[:1], 'supply_plans')['quantity'].tolist(), [2 ** 53 + 1])
+
+    def test_normalize_upload(self):
+        sut = normalize_upload(pd.DataFrame({'customer': [1, 2], 'site': ['s', 's'], 'product': ['p', 'q']}), 'sourcing_rules')
+        self.assertEqual(sut['customer'].tolist(), ['1', '2'])
+        self.assertIs(normalize_upload(sut, 'sourcing_rules')['customer'].dtype, sut['customer'].dtype)
+        sut = normalize_upload(pd.DataFrame(columns=['customer', 'product', 'date', 'quantity']), 'orders')
+        self.assertEqual(len(sut), 0)
+        self.assertEqual(str(sut['quantity'].dtype), 'int64')
+
+    def test_iter_upload_chunks(self):
+        content = b'customer,product,date,quantity\na,p,2020-01-01,1\nb,p,2020-01-02,2\nc,p,2020-01-03,3\n'
+        self.assertEqual(
+            [chunk['customer'].tolist() for chunk in iter_upload_chunks(io.BytesIO(content), 'orders', 2)],
+            [['a', 'b'], ['c']]
+        )
+        with self.assertRaises(UploadError) as context:
+            [*iter_upload_chunks(io.BytesIO(content.replace(b'c,p,2020-01-03', b'c,p,2020-01-32')), 'orders', 2)]
+        self.assertEqual(context.exception.errors, [{'row': 3, 'column': 'date', 'message': 'is not a date in a known format'}])
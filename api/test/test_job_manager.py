@@ -0,0 +1,113 @@
+import os
+import tempfile
+import time
+import unittest
+
+from job_manager import JobManager
+
+
+def _plan_days(progress, day_count):
+    progress.start(day_count)
+    for _ in range(day_count):
+        progress.advance()
+    return day_count * 2
+
+
+def _plan_until_released(progress, path):
+    progress.start(1000)
+    while os.path.exists(path):
+        progress.advance()
+        time.sleep(0.01)
+    return 'released'
+
+
+def _echo(progress, text):
+    return text.encode()
+
+
+def _fail(progress):
+    raise ValueError('unexpected uploads')
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.sut = JobManager(max_workers=1, max_queued_jobs=1, max_finished_jobs=2)
+        self.addCleanup(self.sut.shutdown)
+
+    def test_submit_job(self):
+        job = self.sut.submit_job(_plan_days, 5)
+        self.assertEqual(job.future.result(timeout=60), 10)
+        self._wait_for_finish(job)
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(self.sut.get_progress(job), (5, 5))
+        self.assertIs(self.sut.get_job(job.job_id), job)
+        self.assertIsNone(self.sut.get_job('unknown'))
+
+    def test_failed_job(self):
+        job = self.sut.submit_job(_fail)
+        self._wait_for_finish(job)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(str(job.future.exception()), 'unexpected uploads')
+        self.assertEqual(self.sut.get_progress(job), (0, None))
+
+    def test_job_limit_and_cancel(self):
+        with tempfile.NamedTemporaryFile() as lock_file:
+            running_job = self.sut.submit_job(_plan_until_released, lock_file.name)
+            queued_job = self.sut.submit_job(_plan_days, 5)
+            self.assertIsNone(self.sut.submit_job(_plan_days, 5))
+            while self.sut.get_progress(running_job)[0] == 0:
+                time.sleep(0.01)
+            self.assertEqual(running_job.status, 'running')
+            self.assertEqual(queued_job.status, 'queued')
+            self.assertEqual(self.sut.get_progress(queued_job), (0, None))
+            self.assertTrue(self.sut.cancel_job(queued_job.job_id))
+            self.assertTrue(self.sut.cancel_job(running_job.job_id))
+            self._wait_for_finish(running_job)
+            self._wait_for_finish(queued_job)
+            self.assertEqual(running_job.status, 'cancelled')
+            self.assertEqual(queued_job.status, 'cancelled')
+            planned_day_count, total_day_count = self.sut.get_progress(running_job)
+            self.assertGreater(planned_day_count, 0)
+            self.assertEqual(total_day_count, 1000)
+        self.assertFalse(self.sut.cancel_job('unknown'))
+        job = self.sut.submit_job(_plan_days, 3)
+        self.assertEqual(job.future.result(timeout=60), 6)
+
+    def test_remove_job(self):
+        jobs = [self.sut.submit_job(_plan_days, day_count) for day_count in range(2)]
+        for job in jobs:
+            self._wait_for_finish(job)
+        job = self.sut.submit_job(_plan_days, 2)
+        self._wait_for_finish(job)
+        self.assertEqual(len(self.sut), 2)
+        self.assertIsNone(self.sut.get_job(jobs[0].job_id))
+        self.assertTrue(self.sut.remove_job(job.job_id))
+        self.assertFalse(self.sut.remove_job(job.job_id))
+        self.assertEqual(len(self.sut), 1)
+
+    def test_finished_bytes(self):
+        sut = JobManager(max_workers=1, max_queued_jobs=1, max_finished_jobs=4, max_finished_bytes=10)
+        self.addCleanup(sut.shutdown)
+        jobs = []
+        for text in ['abcd', 'efgh', 'ijklmn']:
+            jobs.append(sut.submit_job(_echo, text))
+            self._wait_for_finish(jobs[-1])
+        self.assertEqual(jobs[1].result_bytes, 4)
+        self.assertIsNone(sut.get_job(jobs[0].job_id))
+        self.assertEqual(len(sut), 2)
+        self.assertEqual(sut.finished_bytes, 10)
+        failed_job = sut.submit_job(_fail)
+        self._wait_for_finish(failed_job)
+        self.assertEqual(failed_job.result_bytes, 0)
+        self.assertEqual(len(sut), 3)
+        large_job = sut.submit_job(_echo, 'x' * 20)
+        self._wait_for_finish(large_job)
+        self.assertEqual([*sut.job_lookup], [large_job.job_id])
+        self.assertEqual(sut.finished_bytes, 20)
+        self.assertTrue(sut.remove_job(large_job.job_id))
+        self.assertEqual(sut.finished_bytes, 0)
+
+    def _wait_for_finish(self, job):
+        job.future.exception(timeout=60)
+        while job.slot is not None:
+            time.sleep(0.01)
@@ -4,6 +4,7 @@ from scheduler.manager.fulfillment_origin_manager import FulfillmentOriginManage
 import unittest
 from unittest.mock import patch
 
+from scheduler import config
 from scheduler.order_scheduler import OrderScheduler
 from scheduler.manager.sourcing_rule_manager import SourcingRuleManager
 
@@ -19,10 +20,27 @@ class TestOrderScheduler(unittest.TestCase):
             patch.object(SourcingRuleManager, 'add_sourcing_rule') as mock_srm_add_sourcing_rule,\
             patch.object(OrderQueueManager, 'add_origin') as mock_oqm_add_origin:
             sut.add_sourcing_rule('customer', 'site', 'product')
-            mock_fom_add_origin.assert_called_once_with('site', 'product')
-            mock_srm_add_sourcing_rule.assert_called_once_with('customer', 'site', 'product')
-            mock_fom_get_origin_id.assert_called_once_with('site', 'product')
+            mock_fom_add_origin.assert_called_once_with(0, 0)
+            mock_srm_add_sourcing_rule.assert_called_once_with(0, 0, 0, 'origin_id')
+            mock_fom_get_origin_id.assert_called_once_with(0, 0)
             mock_oqm_add_origin.assert_called_once_with('origin_id')
+        sut.add_sourcing_rule('customer', 'site_2', 'product')
+        self.assertEqual(sut.site_interner.names, ['site', 'site_2'])
+        self.assertEqual(sut.customer_interner.names, ['customer'])
+        self.assertEqual(sut.get_origin_id('site_2', 'product'), 0)
+
+    def test_get_origin_id(self):
+        sut = self._default_sut()
+        self.assertEqual(sut.get_origin_id('site_1', 'product_1'), 0)
+        self.assertEqual(sut.get_origin_id('site_3', 'product_1'), 2)
+        with self.assertRaisesRegex(AssertionError, 'unknown name'):
+            sut.get_origin_id('site_4', 'product_1')
+
+    def test_get_origin_names(self):
+        sut = self._default_sut()
+        self.assertEqual(sut.get_origin_names(sut.get_origin_id('site_2', 'product_1')), ('site_2', 'product_1'))
+        with self.assertRaisesRegex(AssertionError, 'unknown origin'):
+            sut.get_origin_names(10)
 
     def test_claim_supply_plan(self):
         sut = OrderScheduler()
@@ -32,7 +50,8 @@ class TestOrderScheduler(unittest.TestCase):
         date = datetime.datetime(2020, 1, 3)
         sut.claim_supply_plan('site_1', 'product_1', 100, date)
         sut.claim_supply_plan('site_1', 'product_1', 100, date)
-        self.assertEqual(sut.supply_plan_pool[date], [('site_1', 'product_1', date, 100)] * 2)
+        self.assertEqual(sut.supply_plan_pool[date], {(0, 0): 200})
+        self.assertEqual(sut.site_interner.names, ['site_1'])
 
     def test_claim_order(self):
         sut = OrderScheduler()
@@ -42,7 +61,32 @@ class TestOrderScheduler(unittest.TestCase):
         date = datetime.datetime(2020, 1, 3)
         sut.claim_order('customer_1', 'product_1', 100, date)
         sut.claim_order('customer_1', 'product_1', 100, date)
-        self.assertEqual(sut.order_pool[date], [('customer_1', 'product_1', date, 100)] * 2)
+        self.assertEqual(sut.order_pool[date], {(0, 0): 200})
+        self.assertEqual(sut.customer_interner.names, ['customer_1'])
+
+    def test_claim_daily_supply_plans(self):
+        sut = OrderScheduler()
+        sut.current_date = datetime.datetime(2020, 1, 2)
+        with self.assertRaisesRegex(AssertionError, 'you cannot add plan for the past'):
+            sut.claim_daily_supply_plans(datetime.datetime(2020, 1, 1), ['site'], ['product'], [1])
+        date = datetime.datetime(2020, 1, 3)
+        with self.assertRaisesRegex(AssertionError, 'column length mismatch'):
+            sut.claim_daily_supply_plans(date, ['site'], ['product'], [1, 2])
+        sut.claim_daily_supply_plans(date, ['site_1', 'site_2'], ['product_1', 'product_1'], [100, 50])
+        sut.claim_supply_plan('site_1', 'product_1', 100, date)
+        self.assertEqual(sut.supply_plan_pool[date], {(0, 0): 200, (1, 0): 50})
+
+    def test_claim_daily_orders(self):
+        sut = OrderScheduler()
+        sut.current_date = datetime.datetime(2020, 1, 2)
+        with self.assertRaisesRegex(AssertionError, 'you cannot add order in the past'):
+            sut.claim_daily_orders(datetime.datetime(2020, 1, 1), ['customer'], ['product'], [1])
+        date = datetime.datetime(2020, 1, 3)
+        with self.assertRaisesRegex(AssertionError, 'column length mismatch'):
+            sut.claim_daily_orders(date, ['customer'], [], [1])
+        sut.claim_daily_orders(date, ['customer_1', 'customer_2'], ['product_1', 'product_2'], [100, 50])
+        sut.claim_daily_orders(date, ['customer_2'], ['product_2'], [25])
+        self.assertEqual(sut.order_pool[date], {(0, 0): 100, (1, 1): 75})
 
     def test_plan_fulfillment(self):
         sut = OrderScheduler()
@@ -66,6 +110,149 @@ class TestOrderScheduler(unittest.TestCase):
         self.assertIn(('customer_2', 'product_1', datetime.datetime(2020, 1, 1), 'site_3', fulfill_date, 5), plans)
         self.assertNotIn(('customer_3', 'product_1', datetime.datetime(2020, 1, 2), 'site_3', fulfill_date, 20), plans)
 
+    def test_plan_fulfillment_plan_buffer(self):
+        expected_sut, sut = self._default_sut(), self._default_sut()
+        for order_scheduler in [expected_sut, sut]:
+            order_scheduler.claim_supply_plan('site_1', 'product_1', 10, datetime.datetime(2020, 1, 2))
+            order_scheduler.claim_supply_plan('site_2', 'product_1', 7, datetime.datetime(2020, 1, 3))
+        expected_plans = expected_sut.run_until(datetime.datetime(2020, 1, 3))
+        plan_buffer = sut.create_plan_buffer()
+        self.assertIs(plan_buffer.customer_interner, sut.customer_interner)
+        daily_plans = sut.run_until(datetime.datetime(2020, 1, 3), plan_buffer)
+        self.assertEqual([date for date, _ in daily_plans], [date for date, _ in expected_plans])
+        self.assertEqual([rows for _, rows in daily_plans], [range(0, 0), range(0, 1), range(1, 3)])
+        for (_, plans), (_, rows) in zip(expected_plans, daily_plans):
+            self.assertEqual([*plan_buffer.rows(rows.start, rows.stop)], plans)
+
+    def test_backlog(self):
+        sut = self._default_sut()
+        self.assertEqual(sut.backlog_orders(), [])
+        sut.claim_supply_plan('site_1', 'product_1', 12, datetime.datetime(2020, 1, 2))
+        sut.run_until(datetime.datetime(2020, 1, 2))
+        self.assertEqual(sut.backlog_orders(), [
+            ('customer_2', 'product_1', datetime.datetime(2020, 1, 1), 5),
+            ('customer_3', 'product_1', datetime.datetime(2020, 1, 2), 18)
+        ])
+        self.assertEqual(sut.backlog_summary(), {
+            'order_count': 2,
+            'quantity': 23,
+            'customer_quantities': {'customer_2': 5, 'customer_3': 18},
+            'product_quantities': {'product_1': 23}
+        })
+
+    def test_plan_fulfillment_lookahead(self):
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        with self.assertRaisesRegex(AssertionError, 'lookahead horizon must be positive'):
+            OrderScheduler(0)
+        fulfillment_plans = []
+        for lookahead_days in [None, 3]:
+            sut = OrderScheduler(lookahead_days)
+            sut.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+            sut.add_sourcing_rule('customer_1', 'site_2', 'product_1')
+            sut.claim_order('customer_1', 'product_1', 10, date_1)
+            sut.claim_supply_plan('site_1', 'product_1', 10, date_1)
+            sut.claim_supply_plan('site_2', 'product_1', 10, date_1)
+            sut.claim_supply_plan('site_2', 'product_1', 60, date_2)
+            fulfillment_plans.append(sut.plan_fulfillment(date_1))
+            self.assertEqual(sut.future_supply_index_stale, lookahead_days is None)
+            sut.claim_supply_plan('site_1', 'product_1', 60, date_2)
+            self.assertTrue(sut.future_supply_index_stale)
+            self.assertEqual(sut.fork().lookahead_days, lookahead_days)
+        self.assertEqual(fulfillment_plans[0], [('customer_1', 'product_1', date_1, 'site_1', date_1, 10)])
+        self.assertEqual(fulfillment_plans[1], [('customer_1', 'product_1', date_1, 'site_2', date_1, 10)])
+
+    def test_plan_fulfillment_touched_origins(self):
+        sut = self._default_sut()
+        fulfill_date = datetime.datetime(2020, 1, 2)
+        sut.claim_supply_plan('site_1', 'product_1', 10, fulfill_date)
+        sut.claim_supply_plan('site_3', 'product_1', 100, fulfill_date)
+        sut.plan_fulfillment(fulfill_date)
+        self.assertEqual(len(sut.origin_priority_manager.touched_origin_ids), 0)
+        self.assertGreater(sut.fulfillment_origin_manager.get_origin_cache_quantity(sut.get_origin_id('site_3', 'product_1')), 0)
+        fulfill_date = datetime.datetime(2020, 1, 3)
+        sut.claim_order('customer_2', 'product_1', 5, fulfill_date)
+        self.assertIn(('customer_2', 'product_1', fulfill_date, 'site_3', fulfill_date, 5), sut.plan_fulfillment(fulfill_date))
+
+    def test_next_claim_date(self):
+        sut = OrderScheduler()
+        self.assertIsNone(sut.next_claim_date())
+        sut.claim_supply_plan('site_1', 'product_1', 10, datetime.datetime(2020, 1, 5))
+        sut.claim_order('customer_1', 'product_1', 10, datetime.datetime(2020, 1, 7))
+        sut.claim_order('customer_1', 'product_1', 10, datetime.datetime(2020, 1, 3))
+        self.assertEqual(sut.next_claim_date(), datetime.datetime(2020, 1, 3))
+        self.assertEqual(sut.order_dates, [datetime.datetime(2020, 1, 3), datetime.datetime(2020, 1, 7)])
+
+    def test_run_until(self):
+        sut = self._default_sut()
+        sut.claim_supply_plan('site_1', 'product_1', 10, datetime.datetime(2020, 1, 2))
+        sut.claim_supply_plan('site_3', 'product_1', 10, datetime.datetime(2020, 3, 1))
+        sut.claim_supply_plan('site_2', 'product_1', 10, datetime.datetime(2020, 6, 1))
+        daily_plans = sut.run_until(datetime.datetime(2020, 4, 1))
+        self.assertEqual([date for date, _ in daily_plans], [
+            datetime.datetime(2020, 1, 1),
+            datetime.datetime(2020, 1, 2),
+            datetime.datetime(2020, 3, 1)
+        ])
+        self.assertEqual(daily_plans[0][1], [])
+        self.assertEqual(len(daily_plans[1][1]), 1)
+        self.assertEqual(sut.current_date, datetime.datetime(2020, 4, 1))
+        self.assertEqual(sut.next_claim_date(), datetime.datetime(2020, 6, 1))
+        with self.assertRaisesRegex(AssertionError, 'you cannot add order in the past'):
+            sut.claim_order('customer_1', 'product_1', 10, datetime.datetime(2020, 4, 1))
+        self.assertEqual(sut.run_until(datetime.datetime(2020, 5, 1)), [])
+        self.assertEqual([date for date, _ in sut.run_until(datetime.datetime(2020, 6, 1))], [datetime.datetime(2020, 6, 1)])
+        self.assertIsNone(sut.next_claim_date())
+
+    def test_fork(self):
+        sut = self._default_sut()
+        sut.claim_supply_plan('site_1', 'product_1', 8, datetime.datetime(2020, 1, 2))
+        sut.run_until(datetime.datetime(2020, 1, 2))
+        sut.claim_supply_plan('site_2', 'product_1', 12, datetime.datetime(2020, 1, 3))
+        forked_scheduler = sut.fork()
+        self.assertEqual(forked_scheduler.current_date, sut.current_date)
+        self.assertIs(forked_scheduler.order_queue_manager.queued_orders[0], sut.order_queue_manager.queued_orders[0])
+        forked_scheduler.claim_supply_plan('site_3', 'product_1', 30, datetime.datetime(2020, 1, 3))
+        forked_plans = forked_scheduler.run_until(datetime.datetime(2020, 1, 3))
+        self.assertEqual(sut.supply_plan_pool[datetime.datetime(2020, 1, 3)], {(sut.site_interner.get_id('site_2'), sut.product_interner.get_id('product_1')): 12})
+        self.assertEqual(sut.order_queue_manager.queued_orders[0].quantity, 3)
+        self.assertNotEqual(sut.fork().run_until(datetime.datetime(2020, 1, 3)), forked_plans)
+        self.assertEqual(len(forked_scheduler.order_queue_manager.queued_orders), 0)
+        self.assertEqual(sut.run_until(datetime.datetime(2020, 1, 3)), [(datetime.datetime(2020, 1, 3), [
+            ('customer_2', 'product_1', datetime.datetime(2020, 1, 1), 'site_2', datetime.datetime(2020, 1, 3), 5),
+            ('customer_1', 'product_1', datetime.datetime(2020, 1, 1), 'site_2', datetime.datetime(2020, 1, 3), 3),
+            ('customer_3', 'product_1', datetime.datetime(2020, 1, 2), 'site_2', datetime.datetime(2020, 1, 3), 4)
+        ])])
+
+    def test_plan_origin_fulfillment(self):
+        sut = self._default_sut()
+        fulfill_date = datetime.datetime(2020, 1, 2)
+        sut.claim_supply_plan('site_1', 'product_1', 10, fulfill_date)
+        sut.claim_supply_plan('site_3', 'product_1', 10, fulfill_date)
+        origin_plans = sut.plan_origin_fulfillment(fulfill_date)
+        self.assertEqual([origin_id for origin_id, _, _ in origin_plans], [sut.get_origin_id('site_3', 'product_1'), sut.get_origin_id('site_1', 'product_1')])
+        self.assertLessEqual(origin_plans[0][1], origin_plans[1][1])
+        self.assertEqual(origin_plans[0][2], [
+            ('customer_2', 'product_1', datetime.datetime(2020, 1, 1), 'site_3', fulfill_date, 5),
+            ('customer_3', 'product_1', datetime.datetime(2020, 1, 2), 'site_3', fulfill_date, 5)
+        ])
+
+    def test_enable_stats(self):
+        sut = self._default_sut()
+        self.assertIsNone(sut.stats)
+        daily_stats = []
+        stats = sut.enable_stats(daily_stats.append)
+        fulfill_date = datetime.datetime(2020, 1, 2)
+        sut.claim_supply_plan('site_1', 'product_1', 10, fulfill_date)
+        sut.plan_fulfillment(fulfill_date)
+        self.assertEqual((stats.day_count, stats.origin_count, stats.plan_row_count), (1, 1, 1))
+        self.assertEqual(daily_stats[0]['date'], fulfill_date)
+        self.assertEqual(daily_stats[0]['queue_depth'], 2)
+        self.assertGreater(stats.phase_seconds['import_order_supply'], 0)
+        sut.disable_stats()
+        sut.plan_fulfillment(datetime.datetime(2020, 1, 3))
+        self.assertIsNone(sut.stats)
+        self.assertEqual(stats.day_count, 1)
+
     def test__distribute_supply(self):
         sut = OrderScheduler()
         with self.assertRaisesRegex(AssertionError, 'supply quantity must be greater than 0'):
@@ -81,6 +268,36 @@ class TestOrderScheduler(unittest.TestCase):
         self.assertEqual(sut._distribute_supply([10, 10, 10, 10], 9), ([8, 1, 0, 0], 0))
         self.assertEqual(sut._distribute_supply([15, 1, 1, 1], 10), ([8, 1, 1, 0], 0))
 
+    def test__distribute_supply_batch(self):
+        sut = OrderScheduler()
+        order_quantity_lists, supply_quantities = [[], [11, 3, 2], [5, 10], [1.5, 1]], [1, 10, 5, 2]
+        expected = [([], 1), ([7, 2, 1], 0), ([5, 0], 0), ([1.5, 0.5], 0)]
+        self.assertEqual(sut._distribute_supply_batch(order_quantity_lists, supply_quantities), expected)
+        with patch.object(config, 'BATCH_DISTRIBUTION_MIN_ORIGINS', 1):
+            self.assertEqual(sut._distribute_supply_batch(order_quantity_lists, supply_quantities), expected)
+            self.assertEqual(sut._distribute_supply_batch(order_quantity_lists[:3], supply_quantities[:3]), expected[:3])
+
+    def test_plan_fulfillment_batch_distribution(self):
+        daily_plans = []
+        for min_origin_count in [1, 1000]:
+            sut = OrderScheduler()
+            for customer_name in ['customer_1', 'customer_2', 'customer_3']:
+                sut.add_sourcing_rule(customer_name, 'site_1', 'product_1')
+                sut.add_sourcing_rule(customer_name, 'site_2', 'product_1')
+                sut.add_sourcing_rule(customer_name, 'site_2', 'product_2')
+            for day in range(1, 4):
+                date = datetime.datetime(2020, 1, day)
+                sut.claim_order('customer_1', 'product_1', 30, date)
+                sut.claim_order('customer_2', 'product_1', 7, date)
+                sut.claim_order('customer_3', 'product_2', 12, date)
+                sut.claim_supply_plan('site_1', 'product_1', 20, date)
+                sut.claim_supply_plan('site_2', 'product_1', 9, date)
+                sut.claim_supply_plan('site_2', 'product_2', 5, date)
+            with patch.object(config, 'BATCH_DISTRIBUTION_MIN_ORIGINS', min_origin_count):
+                daily_plans.append(sut.run_until(datetime.datetime(2020, 1, 5)))
+        self.assertEqual(daily_plans[0], daily_plans[1])
+        self.assertNotEqual(daily_plans[0], [])
+
     def test__import_order_supply(self):
         sut = OrderScheduler()
         sut.add_sourcing_rule('customer_1', 'site_1', 'product_1')
@@ -102,11 +319,13 @@ class TestOrderScheduler(unittest.TestCase):
         sut._import_order_supply()
         self.assertNotIn(date_1, sut.supply_plan_pool)
         self.assertNotIn(date_1, sut.order_pool)
-        self.assertEqual(sut.order_pool[date_2], [('customer_2', 'product_2', date_2, 50)])
-        self.assertEqual(sut.supply_plan_pool[date_2], [('site_2', 'product_2', date_2, 50)])
+        self.assertEqual(sut.supply_plan_dates, [date_2])
+        self.assertEqual(sut.order_dates, [date_2])
+        self.assertEqual(sut.order_pool[date_2], {(1, 1): 50})
+        self.assertEqual(sut.supply_plan_pool[date_2], {(1, 1): 50})
         self.assertEqual([*map(
             lambda x: x.quantity,
-            sut.order_queue_manager.order_queue_content(sut.fulfillment_origin_manager.get_origin_id('site_1', 'product_1'))
+            sut.order_queue_manager.order_queue_content(sut.get_origin_id('site_1', 'product_1'))
         )], [50, 300])
 
     def _default_sut(self):
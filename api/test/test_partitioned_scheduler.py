@@ -0,0 +1,91 @@
+import datetime
+import random
+import unittest
+
+from scheduler.order_scheduler import OrderScheduler
+from scheduler.partitioned_scheduler import partition_sourcing_rules, plan_partitioned_fulfillment
+
+
+class TestPartitionedScheduler(unittest.TestCase):
+    def test_partition_sourcing_rules(self):
+        self.assertEqual(partition_sourcing_rules([]), [])
+        rules = [
+            ('customer_1', 'site_1', 'product_1'),
+            ('customer_2', 'site_2', 'product_1'),
+            ('customer_1', 'site_1', 'product_2'),
+            ('customer_2', 'site_1', 'product_1'),
+            ('customer_3', 'site_3', 'product_2')
+        ]
+        self.assertEqual(partition_sourcing_rules(rules), [
+            [rules[0], rules[1], rules[3]],
+            [rules[2]],
+            [rules[4]]
+        ])
+
+    def test_plan_partitioned_fulfillment(self):
+        sourcing_rules, daily_orders, daily_supply_plans = self._random_workload(random.Random(0))
+        expected_plans = self._serial_plans(sourcing_rules, daily_orders, daily_supply_plans)
+        self.assertEqual(plan_partitioned_fulfillment(sourcing_rules, daily_orders, daily_supply_plans, 1), expected_plans)
+        self.assertEqual(plan_partitioned_fulfillment(sourcing_rules, daily_orders, daily_supply_plans, 2), expected_plans)
+
+    def test_plan_partitioned_fulfillment_backlog(self):
+        sourcing_rules, daily_orders, daily_supply_plans = self._random_workload(random.Random(1))
+        order_scheduler = OrderScheduler()
+        expected_plans = self._serial_plans(sourcing_rules, daily_orders, daily_supply_plans, order_scheduler)
+        daily_plans, backlog_summary = plan_partitioned_fulfillment(sourcing_rules, daily_orders, daily_supply_plans, 2, with_backlog=True)
+        self.assertEqual(daily_plans, expected_plans)
+        self.assertEqual(backlog_summary, order_scheduler.backlog_summary())
+        self.assertGreater(backlog_summary['order_count'], 0)
+
+    def test_plan_partitioned_fulfillment_lookahead(self):
+        sourcing_rules, daily_orders, daily_supply_plans = self._random_workload(random.Random(2))
+        order_scheduler = OrderScheduler(lookahead_days=3)
+        for rule in sourcing_rules:
+            order_scheduler.add_sourcing_rule(*rule)
+        for date, columns in daily_orders:
+            order_scheduler.claim_daily_orders(date, *columns)
+        for date, columns in daily_supply_plans:
+            order_scheduler.claim_daily_supply_plans(date, *columns)
+        expected_plans = order_scheduler.run_until(max(date for date, _ in [*daily_orders, *daily_supply_plans]))
+        self.assertEqual(plan_partitioned_fulfillment(sourcing_rules, daily_orders, daily_supply_plans, 2, lookahead_days=3), expected_plans)
+
+    def test_plan_partitioned_fulfillment_unknown_demand(self):
+        date = datetime.datetime(2020, 1, 1)
+        with self.assertRaisesRegex(AssertionError, 'no available fulfillment origin'):
+            plan_partitioned_fulfillment([('customer_1', 'site_1', 'product_1')], [(date, (['customer_2'], ['product_1'], [1]))], [], 1)
+        with self.assertRaisesRegex(AssertionError, 'add supply for unknown origin'):
+            plan_partitioned_fulfillment([('customer_1', 'site_1', 'product_1')], [], [(date, (['site_2'], ['product_1'], [1]))], 1)
+
+    def _random_workload(self, rng):
+        sourcing_rules = set()
+        for customer in range(8):
+            for product in range(6):
+                for site in rng.sample(range(5), rng.randint(0, 3)):
+                    sourcing_rules.add(('customer_{}'.format(customer), 'site_{}'.format(site), 'product_{}'.format(product)))
+        sourcing_rules = sorted(sourcing_rules)
+        demands = sorted(set((c, p) for c, _, p in sourcing_rules))
+        origins = sorted(set((s, p) for _, s, p in sourcing_rules))
+        daily_orders, daily_supply_plans = [], []
+        for day in range(30):
+            date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=day)
+            orders = [(*rng.choice(demands), rng.randint(1, 50)) for _ in range(rng.randint(0, 10))]
+            supply_plans = [(*rng.choice(origins), rng.randint(1, 80)) for _ in range(rng.randint(0, 4))]
+            if len(orders) != 0:
+                daily_orders.append((date, tuple(map(list, zip(*orders)))))
+            if len(supply_plans) != 0:
+                daily_supply_plans.append((date, tuple(map(list, zip(*supply_plans)))))
+        return sourcing_rules, daily_orders, daily_supply_plans
+
+    def _serial_plans(self, sourcing_rules, daily_orders, daily_supply_plans, order_scheduler=None):
+        order_scheduler = order_scheduler if order_scheduler is not None else OrderScheduler()
+        for rule in sourcing_rules:
+            order_scheduler.add_sourcing_rule(*rule)
+        order_lookup, supply_plan_lookup = dict(daily_orders), dict(daily_supply_plans)
+        daily_plans = []
+        for date in sorted(set(order_lookup.keys()).union(set(supply_plan_lookup.keys()))):
+            if date in order_lookup:
+                order_scheduler.claim_daily_orders(date, *order_lookup[date])
+            if date in supply_plan_lookup:
+                order_scheduler.claim_daily_supply_plans(date, *supply_plan_lookup[date])
+            daily_plans.append((date, order_scheduler.plan_fulfillment(date)))
+        return daily_plans
@@ -0,0 +1,95 @@
+import datetime
+import gzip
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from werkzeug.datastructures import MIMEAccept
+
+import plan_output
+from scheduler.model.fulfillment_plan_buffer import FulfillmentPlanBuffer
+
+
+class TestPlanOutput(unittest.TestCase):
+    def test_negotiate_output_format(self):
+        self.assertEqual(plan_output.negotiate_output_format('compact-json', MIMEAccept()), 'compact-json')
+        self.assertIsNone(plan_output.negotiate_output_format('xml', MIMEAccept()))
+        self.assertEqual(plan_output.negotiate_output_format(None, MIMEAccept()), 'json')
+        self.assertEqual(plan_output.negotiate_output_format(None, MIMEAccept([('*/*', 1)])), 'json')
+        self.assertEqual(plan_output.negotiate_output_format(None, MIMEAccept([('text/csv', 1), ('application/json', 0.5)])), 'csv')
+        self.assertEqual(plan_output.negotiate_output_format(None, MIMEAccept([('application/vnd.apache.parquet', 1)])), 'parquet')
+        self.assertEqual(plan_output.negotiate_output_format(None, MIMEAccept([('image/png', 1), ('application/json', 0.1)])), 'json')
+        self.assertIsNone(plan_output.negotiate_output_format(None, MIMEAccept([('image/png', 1)])))
+
+    def test_output_format_available(self):
+        self.assertTrue(plan_output.output_format_available('csv'))
+        with patch.object(plan_output, 'pyarrow', None):
+            self.assertTrue(plan_output.output_format_available('compact-json'))
+            self.assertFalse(plan_output.output_format_available('parquet'))
+            with self.assertRaisesRegex(AssertionError, 'pyarrow is required for arrow output'):
+                plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'arrow')
+
+    def test_serialize_json(self):
+        document = json.loads(plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'json', {'stats': {'day_count': 1}}))
+        self.assertEqual(document['stats'], {'day_count': 1})
+        self.assertEqual(document['fulfillment_plans'][1], {
+            'customer': 'customer_2', 'product': 'product_1', 'order_date': '2020-01-02 00:00:00',
+            'site': 'site_2', 'fulfillment_date': '2020-01-02 00:00:00', 'quantity': 3
+        })
+
+    def test_serialize_compact_json(self):
+        content = plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'compact-json', {'stats': {'date': datetime.datetime(2020, 1, 2, 6)}})
+        self.assertNotIn(' ', content)
+        document = json.loads(content)
+        self.assertEqual(document['stats'], {'date': '2020-01-02T06:00:00'})
+        self.assertEqual(document['fulfillment_plans'], {
+            'row_count': 2,
+            'dictionaries': {'customer': ['customer_1', 'customer_2'], 'product': ['product_1'], 'site': ['site_1', 'site_2']},
+            'columns': {
+                'customer': [0, 1], 'product': [0, 0], 'order_date': ['2020-01-01', '2020-01-02'],
+                'site': [0, 1], 'fulfillment_date': ['2020-01-02', '2020-01-02'], 'quantity': [5, 3]
+            }
+        })
+
+    def test_serialize_csv(self):
+        for compress in [True, False]:
+            content = plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'csv', compress=compress)
+            df = pd.read_csv(io.BytesIO(gzip.decompress(content) if compress else content))
+            self.assertEqual([*df.columns], plan_output.FULFILLMENT_PLAN_COLUMNS)
+            self.assertEqual(df['customer'].tolist(), ['customer_1', 'customer_2'])
+            self.assertEqual(df['order_date'].tolist(), ['2020-01-01', '2020-01-02'])
+            self.assertEqual(df['quantity'].tolist(), [5, 3])
+        self.assertEqual(pd.read_csv(io.BytesIO(plan_output.serialize_fulfillment_plans(FulfillmentPlanBuffer(), 'csv', compress=False))).shape, (0, 6))
+
+    @unittest.skipIf(plan_output.pyarrow is None, 'pyarrow is not installed')
+    def test_serialize_arrow(self):
+        import pyarrow.parquet
+        parquet_table = pyarrow.parquet.read_table(io.BytesIO(plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'parquet', {'stats': {'day_count': 1}})))
+        arrow_table = pyarrow.ipc.open_stream(plan_output.serialize_fulfillment_plans(self._plan_buffer(), 'arrow', {'stats': {'day_count': 1}})).read_all()
+        for table in [parquet_table, arrow_table]:
+            self.assertEqual(table.column_names, plan_output.FULFILLMENT_PLAN_COLUMNS)
+            self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('site').type))
+            self.assertEqual(table.column('site').to_pylist(), ['site_1', 'site_2'])
+            self.assertEqual(table.column('order_date').to_pylist(), [datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)])
+            self.assertEqual(table.column('quantity').to_pylist(), [5, 3])
+            self.assertEqual(json.loads(table.schema.metadata[b'stats']), {'day_count': 1})
+
+    def test_serialize_metadata_order(self):
+        backlog = {'order_count': 2, 'quantity': 3, 'customer_quantities': {'customer_2': 1, 'customer_1': 2}, 'product_quantities': {'product_1': 3}}
+        reordered_backlog = {**backlog, 'customer_quantities': {'customer_1': 2, 'customer_2': 1}}
+        for output_format in plan_output.OUTPUT_MIMETYPES:
+            if not plan_output.output_format_available(output_format):
+                continue
+            self.assertEqual(
+                plan_output.serialize_fulfillment_plans(self._plan_buffer(), output_format, {'backlog': backlog, 'stats': {}}),
+                plan_output.serialize_fulfillment_plans(self._plan_buffer(), output_format, {'stats': {}, 'backlog': reordered_backlog}),
+                output_format
+            )
+
+    def _plan_buffer(self):
+        plan_buffer = FulfillmentPlanBuffer()
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        plan_buffer.extend([('customer_1', 'product_1', date_1, 'site_1', date_2, 5), ('customer_2', 'product_1', date_2, 'site_2', date_2, 3)])
+        return plan_buffer
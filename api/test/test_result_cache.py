@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from result_cache import ResultCache, cache_key
+
+
+class TestResultCache(unittest.TestCase):
+    def test_cache_key(self):
+        df = pd.DataFrame({'customer': ['customer_1', 'customer_2'], 'quantity': [10, 20]})
+        key = cache_key([df], {'output_format': 'json'})
+        self.assertEqual(cache_key([df.copy()], {'output_format': 'json'}), key)
+        self.assertNotEqual(cache_key([df], {'output_format': 'csv'}), key)
+        self.assertNotEqual(cache_key([df.iloc[::-1]], {'output_format': 'json'}), key)
+        self.assertNotEqual(cache_key([df.assign(quantity=[10, 21])], {'output_format': 'json'}), key)
+        self.assertNotEqual(cache_key([df.assign(quantity=[10.0, 20.0])], {'output_format': 'json'}), key)
+        self.assertNotEqual(cache_key([df.iloc[:1], df.iloc[1:]], {'output_format': 'json'}), cache_key([df, df.iloc[:0]], {'output_format': 'json'}))
+
+    def test_memory_lru(self):
+        sut = ResultCache(max_memory_bytes=10)
+        self.assertIsNone(sut.get('a'))
+        sut.put('a', b'1234')
+        sut.put('b', b'5678')
+        self.assertEqual(sut.get('a'), b'1234')
+        sut.put('c', b'901')
+        sut.put('d', b'12345678901')
+        self.assertIsNone(sut.get('b'))
+        self.assertEqual(sut.get('c'), b'901')
+        self.assertIsNone(sut.get('d'))
+        self.assertEqual(len(sut), 2)
+        self.assertEqual(sut.stats(), {
+            'hit_count': 2, 'memory_hit_count': 2, 'disk_hit_count': 0, 'miss_count': 3,
+            'memory_entry_count': 2, 'memory_bytes': 7, 'disk_entry_count': 0, 'disk_bytes': 0
+        })
+
+    def test_disk_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sut = ResultCache(max_memory_bytes=4, directory=directory, max_disk_bytes=10)
+            sut.put('a', b'1234')
+            sut.put('b', b'5678')
+            self.assertEqual(sut.get('a'), b'1234')
+            self.assertEqual(sut.stats()['disk_hit_count'], 1)
+            sut.put('c', b'90ab')
+            self.assertEqual(sorted(os.listdir(directory)), ['a', 'c'])
+            self.assertIsNone(sut.get('b'))
+            sut = ResultCache(max_memory_bytes=4, directory=directory, max_disk_bytes=10)
+            self.assertEqual(sut.get('c'), b'90ab')
+            self.assertEqual(sut.stats()['disk_bytes'], 8)
+            os.remove(os.path.join(directory, 'a'))
+            self.assertIsNone(sut.get('a'))
+            self.assertEqual(sut.stats()['disk_bytes'], 4)
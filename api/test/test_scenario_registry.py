@@ -0,0 +1,64 @@
+import datetime
+import unittest
+
+from scenario_registry import ScenarioRegistry
+
+
+class TestScenarioRegistry(unittest.TestCase):
+    def test_create_scenario(self):
+        sut = ScenarioRegistry()
+        scenario = sut.create_scenario([('customer_1', 'site_1', 'product_1')])
+        self.assertEqual(len(sut), 1)
+        self.assertIs(sut.get_scenario(scenario.scenario_id), scenario)
+        self.assertEqual(scenario.order_scheduler.get_origin_id('site_1', 'product_1'), 0)
+        self.assertNotEqual(sut.create_scenario([]).scenario_id, scenario.scenario_id)
+
+    def test_remove_scenario(self):
+        sut = ScenarioRegistry()
+        scenario = sut.create_scenario([])
+        self.assertTrue(sut.remove_scenario(scenario.scenario_id))
+        self.assertFalse(sut.remove_scenario(scenario.scenario_id))
+        self.assertIsNone(sut.get_scenario(scenario.scenario_id))
+
+    def test_claim_and_plan(self):
+        sut = ScenarioRegistry().create_scenario([('customer_1', 'site_1', 'product_1')])
+        date_1, date_2, date_3 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2), datetime.datetime(2020, 1, 3)
+        self.assertEqual(sut.claim_and_plan([], {date_1: (['customer_1'], ['product_1'], [10])}, {}), [(date_1, [])])
+        daily_plans = sut.claim_and_plan(
+            [('customer_2', 'site_1', 'product_1')],
+            {date_2: (['customer_2'], ['product_1'], [5])},
+            {date_2: (['site_1'], ['product_1'], [12]), date_3: (['site_1'], ['product_1'], [3])}
+        )
+        self.assertEqual(daily_plans, [(date_2, [
+            ('customer_1', 'product_1', date_1, 'site_1', date_2, 10),
+            ('customer_2', 'product_1', date_2, 'site_1', date_2, 2)
+        ]), (date_3, [
+            ('customer_2', 'product_1', date_2, 'site_1', date_3, 3)
+        ])])
+        self.assertEqual(sut.order_scheduler.current_date, date_3)
+        self.assertEqual(sut.claim_and_plan([], {}, {}), [])
+
+    def test_claim_and_plan_until(self):
+        sut = ScenarioRegistry().create_scenario([('customer_1', 'site_1', 'product_1')])
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        self.assertEqual(sut.claim_and_plan([], {date_2: (['customer_1'], ['product_1'], [10])}, {}, until_date=date_1), [])
+        self.assertEqual(sut.order_scheduler.next_claim_date(), date_2)
+        self.assertEqual(sut.claim_and_plan([], {}, {}, until_date=date_2), [(date_2, [])])
+        with self.assertRaisesRegex(AssertionError, 'you cannot plan the past'):
+            sut.claim_and_plan([], {}, {}, until_date=date_1)
+
+    def test_claim_and_plan_rejected(self):
+        sut = ScenarioRegistry().create_scenario([('customer_1', 'site_1', 'product_1')])
+        date_1, date_2 = datetime.datetime(2020, 1, 1), datetime.datetime(2020, 1, 2)
+        sut.claim_and_plan([], {date_2: (['customer_1'], ['product_1'], [10])}, {})
+        with self.assertRaisesRegex(AssertionError, 'you cannot add claims for the past'):
+            sut.claim_and_plan([], {date_1: (['customer_1'], ['product_1'], [10])}, {})
+        with self.assertRaisesRegex(AssertionError, 'unknown name'):
+            sut.claim_and_plan(
+                [('customer_2', 'site_2', 'product_1')],
+                {datetime.datetime(2020, 1, 3): (['customer_2'], ['product_1'], [10])},
+                {datetime.datetime(2020, 1, 3): (['site_3'], ['product_1'], [10])}
+            )
+        self.assertNotIn('customer_2', sut.order_scheduler.customer_interner.id_lookup)
+        self.assertIsNone(sut.order_scheduler.next_claim_date())
+        self.assertEqual(sut.order_scheduler.current_date, date_2)
@@ -0,0 +1,118 @@
+import datetime
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from scheduler import snapshot
+from scheduler.order_scheduler import OrderScheduler
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        snapshot_file, self.path = tempfile.mkstemp()
+        os.close(snapshot_file)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_save_load_snapshot(self):
+        sut, expected_scheduler = self._random_scheduler(random.Random(0)), self._random_scheduler(random.Random(0))
+        end_date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=40)
+        middle_date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=20)
+        sut.run_until(middle_date)
+        expected_scheduler.run_until(middle_date)
+        sut.save_snapshot(self.path)
+        for mmap_mode in ['r', None]:
+            restored_scheduler = OrderScheduler.load_snapshot(self.path, mmap_mode)
+            self.assertEqual(restored_scheduler.current_date, middle_date)
+            self.assertEqual(restored_scheduler.next_order_id, sut.next_order_id)
+            self.assertEqual(restored_scheduler.order_pool, sut.order_pool)
+            self.assertEqual(restored_scheduler.supply_plan_pool, sut.supply_plan_pool)
+            self.assertEqual(restored_scheduler.backlog_summary(), sut.backlog_summary())
+            for origin_id in sut.order_queue_manager.origin_queue_lookup:
+                self.assertEqual(
+                    [order.order_id for order in restored_scheduler.order_queue_manager.order_queue_content(origin_id)],
+                    [order.order_id for order in sut.order_queue_manager.order_queue_content(origin_id)]
+                )
+        self.assertEqual(restored_scheduler.run_until(end_date), expected_scheduler.run_until(end_date))
+
+    def test_save_load_snapshot_bounded_memory(self):
+        sut, expected_scheduler = self._random_scheduler(random.Random(1), True), self._random_scheduler(random.Random(1))
+        end_date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=40)
+        middle_date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=20)
+        self.assertEqual(sut.run_until(middle_date), expected_scheduler.run_until(middle_date))
+        self.assertLess(
+            sum(len(origin.history_supply_dates) for origin in sut.fulfillment_origin_manager.origin_lookup.values()),
+            sum(len(origin.history_supply_dates) for origin in expected_scheduler.fulfillment_origin_manager.origin_lookup.values())
+        )
+        sut.save_snapshot(self.path)
+        restored_scheduler = OrderScheduler.load_snapshot(self.path)
+        self.assertTrue(restored_scheduler.bounded_memory)
+        for origin_id, origin in sut.fulfillment_origin_manager.origin_lookup.items():
+            restored_origin = restored_scheduler.fulfillment_origin_manager.get_origin(origin_id)
+            self.assertEqual(restored_origin.history_supply_prefix_sums, origin.history_supply_prefix_sums)
+            self.assertEqual(restored_origin.total_supply_quantity, origin.total_supply_quantity)
+            self.assertEqual(restored_origin.first_supply_date, origin.first_supply_date)
+        self.assertEqual(restored_scheduler.run_until(end_date), expected_scheduler.run_until(end_date))
+
+    def test_load_snapshot_float_quantity(self):
+        sut = OrderScheduler(lookahead_days=7)
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+        sut.claim_order('customer_1', 'product_1', 2.5, datetime.datetime(2020, 1, 1))
+        sut.claim_supply_plan('site_1', 'product_1', 1, datetime.datetime(2020, 1, 1))
+        sut.run_until(datetime.datetime(2020, 1, 1))
+        sut.save_snapshot(self.path)
+        restored_scheduler = OrderScheduler.load_snapshot(self.path)
+        self.assertEqual(restored_scheduler.order_queue_manager.queued_orders[0].quantity, 1.5)
+        self.assertEqual(restored_scheduler.fulfillment_origin_manager.get_origin(0).history_supply_quantities, [1])
+        self.assertEqual(restored_scheduler.lookahead_days, 7)
+
+    def test_read_snapshot_not_empty(self):
+        OrderScheduler().save_snapshot(self.path)
+        sut = OrderScheduler()
+        sut.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+        with self.assertRaisesRegex(AssertionError, 'please restore to an empty scheduler'):
+            snapshot.read_snapshot(sut, self.path)
+
+    def test_read_snapshot_arrays(self):
+        with open(self.path, 'wb') as snapshot_file:
+            snapshot_file.write(b'not a snapshot')
+        with self.assertRaisesRegex(AssertionError, 'not a scheduler snapshot'):
+            snapshot.read_snapshot_arrays(self.path)
+        OrderScheduler().save_snapshot(self.path)
+        metadata, arrays = snapshot.read_snapshot_arrays(self.path)
+        self.assertEqual(metadata['next_order_id'], 0)
+        self.assertEqual(len(arrays['order_ids']), 0)
+
+    def test_write_snapshot_atomic(self):
+        sut = self._random_scheduler(random.Random(0))
+        sut.run_until(datetime.datetime(2020, 1, 20))
+        self.assertGreater(sut.next_order_id, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'scheduler.snapshot')
+            OrderScheduler().save_snapshot(path)
+            with mock.patch.object(snapshot.np, 'ascontiguousarray', side_effect=OSError('disk full')):
+                with self.assertRaisesRegex(OSError, 'disk full'):
+                    sut.save_snapshot(path)
+            self.assertEqual(os.listdir(directory), ['scheduler.snapshot'])
+            self.assertEqual(OrderScheduler.load_snapshot(path).next_order_id, 0)
+            sut.save_snapshot(path)
+            self.assertEqual(os.listdir(directory), ['scheduler.snapshot'])
+            self.assertEqual(OrderScheduler.load_snapshot(path).next_order_id, sut.next_order_id)
+
+    def _random_scheduler(self, rng, bounded_memory=False):
+        order_scheduler, origins = OrderScheduler(bounded_memory=bounded_memory), []
+        for customer in range(6):
+            for site in rng.sample(range(4), 2):
+                order_scheduler.add_sourcing_rule('customer_{}'.format(customer), 'site_{}'.format(site), 'product_{}'.format(customer % 2))
+                origins.append(('site_{}'.format(site), 'product_{}'.format(customer % 2)))
+        for day in range(40):
+            date = datetime.datetime(2020, 1, 1) + datetime.timedelta(days=day)
+            for _ in range(rng.randrange(4)):
+                customer = rng.randrange(6)
+                order_scheduler.claim_order('customer_{}'.format(customer), 'product_{}'.format(customer % 2), rng.randrange(1, 30), date)
+            for _ in range(rng.randrange(3)):
+                order_scheduler.claim_supply_plan(*rng.choice(origins), rng.randrange(1, 40), date)
+        return order_scheduler
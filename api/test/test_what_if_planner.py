@@ -0,0 +1,75 @@
+import datetime
+import threading
+import unittest
+
+from scheduler.model.what_if_scenario import WhatIfScenario
+from scheduler.order_scheduler import OrderScheduler
+from scheduler.what_if_planner import fulfillment_kpis, plan_what_if_scenarios
+
+
+class TestWhatIfPlanner(unittest.TestCase):
+    def test_plan_what_if_scenarios(self):
+        order_scheduler = self._default_scheduler()
+        scenarios = [
+            WhatIfScenario('drop', supply_factors=[('site_1', 'product_1', datetime.datetime(2020, 1, 3), datetime.datetime(2020, 1, 3), 0.5)]),
+            WhatIfScenario('rush', orders=[('customer_1', 'product_1', 30, datetime.datetime(2020, 1, 3))])
+        ]
+        end_date = datetime.datetime(2020, 1, 4)
+        results = plan_what_if_scenarios(order_scheduler, scenarios, end_date, 1)
+        self.assertEqual([result['name'] for result in results], ['baseline', 'drop', 'rush'])
+        forked_scheduler = order_scheduler.fork()
+        self.assertEqual(results[0]['kpis'], fulfillment_kpis(forked_scheduler, forked_scheduler.run_until(end_date)))
+        self.assertEqual(set(results[0]['kpi_deltas'].values()), set([0]))
+        self.assertEqual(results[1]['kpi_deltas']['fulfilled_quantity'], -5)
+        self.assertEqual(results[1]['kpi_deltas']['backlog_quantity'], 5)
+        self.assertEqual(results[2]['kpi_deltas']['backlog_quantity'], 30)
+        self.assertEqual(plan_what_if_scenarios(order_scheduler, scenarios, end_date, 2), results)
+        self.assertEqual(order_scheduler.current_date, datetime.datetime(2020, 1, 2))
+        self.assertEqual(order_scheduler.next_claim_date(), datetime.datetime(2020, 1, 3))
+
+    def test_plan_what_if_scenarios_error(self):
+        order_scheduler = self._default_scheduler()
+        scenarios = [WhatIfScenario('past', orders=[('customer_1', 'product_1', 30, datetime.datetime(2020, 1, 1))])]
+        for max_workers in [1, 2]:
+            with self.assertRaisesRegex(AssertionError, 'you cannot add order in the past'):
+                plan_what_if_scenarios(order_scheduler, scenarios, datetime.datetime(2020, 1, 4), max_workers)
+        with self.assertRaisesRegex(AssertionError, 'you cannot plan the past'):
+            plan_what_if_scenarios(order_scheduler, [], datetime.datetime(2020, 1, 1))
+
+    def test_plan_what_if_scenarios_threaded(self):
+        order_scheduler = self._default_scheduler()
+        scenarios = [WhatIfScenario('rush', orders=[('customer_1', 'product_1', 30, datetime.datetime(2020, 1, 3))])]
+        end_date = datetime.datetime(2020, 1, 4)
+        results = plan_what_if_scenarios(order_scheduler, scenarios, end_date, 1)
+        released = threading.Event()
+        thread = threading.Thread(target=released.wait)
+        thread.start()
+        try:
+            self.assertEqual(plan_what_if_scenarios(order_scheduler, scenarios, end_date, 2), results)
+            with self.assertRaisesRegex(AssertionError, 'you cannot add order in the past'):
+                plan_what_if_scenarios(order_scheduler, [WhatIfScenario('past', orders=[('customer_1', 'product_1', 30, datetime.datetime(2020, 1, 1))])], end_date, 2)
+        finally:
+            released.set()
+            thread.join()
+        self.assertEqual(order_scheduler.current_date, datetime.datetime(2020, 1, 2))
+
+    def test_fulfillment_kpis(self):
+        order_scheduler = self._default_scheduler()
+        daily_plans = order_scheduler.run_until(datetime.datetime(2020, 1, 4))
+        self.assertEqual(fulfillment_kpis(order_scheduler, daily_plans), {
+            'planned_day_count': 1,
+            'fulfillment_plan_count': 1,
+            'fulfilled_quantity': 10,
+            'average_waiting_days': 2.0,
+            'backlog_order_count': 0,
+            'backlog_quantity': 0
+        })
+
+    def _default_scheduler(self):
+        order_scheduler = OrderScheduler()
+        order_scheduler.add_sourcing_rule('customer_1', 'site_1', 'product_1')
+        order_scheduler.claim_order('customer_1', 'product_1', 20, datetime.datetime(2020, 1, 1))
+        order_scheduler.claim_supply_plan('site_1', 'product_1', 10, datetime.datetime(2020, 1, 2))
+        order_scheduler.claim_supply_plan('site_1', 'product_1', 10, datetime.datetime(2020, 1, 3))
+        order_scheduler.run_until(datetime.datetime(2020, 1, 2))
+        return order_scheduler
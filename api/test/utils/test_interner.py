@@ -0,0 +1,25 @@
+import unittest
+
+from scheduler.utils.interner import Interner
+
+
+class TestInterner(unittest.TestCase):
+    def test_constructor(self):
+        self.assertIsNotNone(Interner())
+
+    def test_intern(self):
+        sut = Interner()
+        self.assertEqual(sut.intern('a'), 0)
+        self.assertEqual(sut.intern('b'), 1)
+        self.assertEqual(sut.intern('a'), 0)
+        self.assertEqual(len(sut), 2)
+        self.assertEqual(sut.names, ['a', 'b'])
+
+    def test_get_id_get_name(self):
+        sut = Interner()
+        sut.intern('a')
+        sut.intern('b')
+        with self.assertRaisesRegex(AssertionError, 'unknown name'):
+            sut.get_id('c')
+        self.assertEqual(sut.get_id('b'), 1)
+        self.assertEqual(sut.get_name(1), 'b')
@@ -0,0 +1,46 @@
+import random
+import unittest
+
+import numpy as np
+
+from scheduler import config
+from scheduler.order_scheduler import OrderScheduler
+from scheduler.utils.supply_distribution import distribute_supply_batch
+
+
+class TestSupplyDistribution(unittest.TestCase):
+    def test_distribute_supply_batch(self):
+        with self.assertRaisesRegex(AssertionError, 'supply quantity must be greater than 0'):
+            distribute_supply_batch([[1, 1, 1]], [0], config.SUPPLY_DISTRIBUTION_RATES)
+        with self.assertRaisesRegex(AssertionError, 'shape mismatch'):
+            distribute_supply_batch([[1, 1, 1]], [1, 2], config.SUPPLY_DISTRIBUTION_RATES)
+        quantity_distribution, remain_quantities = distribute_supply_batch(
+            [[1, 1, 1, 0], [5, 10, 5, 5], [11, 3, 2, 0], [10, 10, 10, 10], [15, 1, 1, 1], [0, 0, 0, 0]],
+            [5, 18, 10, 9, 10, 3],
+            config.SUPPLY_DISTRIBUTION_RATES
+        )
+        self.assertEqual(quantity_distribution.tolist(), [[1, 1, 1, 0], [5, 10, 3, 0], [7, 2, 1, 0], [8, 1, 0, 0], [8, 1, 1, 0], [0, 0, 0, 0]])
+        self.assertEqual(remain_quantities.tolist(), [2, 0, 0, 0, 0, 3])
+        quantity_distribution, remain_quantities = distribute_supply_batch(np.zeros((2, 0), dtype=np.int64), [1, 2], config.SUPPLY_DISTRIBUTION_RATES)
+        self.assertEqual(quantity_distribution.shape, (2, 0))
+        self.assertEqual(remain_quantities.tolist(), [1, 2])
+
+    def test_distribute_supply_batch_equivalence(self):
+        order_scheduler = OrderScheduler()
+        generator = random.Random(0)
+        for _ in range(200):
+            column_count = generator.randint(1, 6)
+            order_quantity_lists = [
+                [generator.choice([0, 1, generator.randint(1, 200), 10 ** 7]) for _ in range(generator.randint(0, column_count))]
+                for _ in range(generator.randint(1, 20))
+            ]
+            supply_quantities = [generator.choice([1, 3, 10, generator.randint(1, 500), 10 ** 6]) for _ in order_quantity_lists]
+            quantity_distribution, remain_quantities = distribute_supply_batch(
+                [[*quantities, *[0] * (column_count - len(quantities))] for quantities in order_quantity_lists],
+                supply_quantities,
+                config.SUPPLY_DISTRIBUTION_RATES
+            )
+            for index, (order_quantities, supply_quantity) in enumerate(zip(order_quantity_lists, supply_quantities)):
+                expected_distribution, expected_remain_quantity = order_scheduler._distribute_supply(order_quantities, supply_quantity)
+                self.assertEqual(quantity_distribution[index, :len(order_quantities)].tolist(), list(expected_distribution))
+                self.assertEqual(remain_quantities[index], expected_remain_quantity)